@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Asyncio execution engine for multi-record operations.
+Runs many independent API calls (create/update/upsert/describe functions
+from the other scripts) with a bounded number in flight per org, keeps the
+results in input order, and records errors per call instead of aborting
+the whole run.
+
+The calls themselves stay synchronous: they go through the shared pooled
+requests.Session on worker threads, driven by an asyncio event loop with
+one semaphore per org.
+
+Usage (from another script in this directory):
+    from functools import partial
+    from sf_async import run_all
+
+    calls = [partial(update_opportunity, opp_id, {"StageName": "Passed"}) for opp_id in ids]
+    for outcome in run_all(calls, concurrency=20):
+        print(outcome["index"], outcome["ok"], outcome.get("result") or outcome.get("error"))
+"""
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_CONCURRENCY = 10
+
+# Failures that belong to one record rather than the whole run.
+RECORD_ERRORS = (RuntimeError, ValueError, KeyError, requests.RequestException)
+
+
+def default_concurrency() -> int:
+    return int(os.getenv("SF_CONCURRENCY", DEFAULT_CONCURRENCY))
+
+
+async def _run_one(index: int, call, semaphore: asyncio.Semaphore, executor) -> dict:
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(executor, call)
+        except RECORD_ERRORS as e:
+            return {"index": index, "ok": False, "error": str(e)}
+    return {"index": index, "ok": True, "result": result}
+
+
+async def run_all_async(calls: list, concurrency: int = None, orgs: list = None) -> list:
+    """Await every call with at most ``concurrency`` in flight per org.
+
+    ``orgs`` optionally names the org of each call (parallel to ``calls``);
+    each org gets its own limit. Returns one outcome dict per call, in input order.
+    """
+    concurrency = concurrency or default_concurrency()
+    orgs = orgs or [None] * len(calls)
+    semaphores = {org: asyncio.Semaphore(concurrency) for org in set(orgs)}
+    workers = max(1, min(len(calls), concurrency * len(semaphores)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tasks = [
+            _run_one(i, call, semaphores[org], executor)
+            for i, (call, org) in enumerate(zip(calls, orgs))
+        ]
+        return list(await asyncio.gather(*tasks))
+
+
+def run_all(calls: list, concurrency: int = None, orgs: list = None) -> list:
+    """Synchronous entry point for run_all_async (starts and closes its own event loop)."""
+    if not calls:
+        return []
+    return asyncio.run(run_all_async(calls, concurrency, orgs))
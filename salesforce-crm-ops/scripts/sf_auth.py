@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+OAuth token provider with a persistent, file-locked on-disk cache.
+Tokens are cached per org and client ID with their expiry, so parallel
+scripts share one token instead of each requesting their own. Refreshes are
+single-flight: one thread (and one process, via the file lock) refreshes
+while the others wait and reuse the result.
+
+Usage (from another script in this directory):
+    from sf_auth import TokenProvider
+
+    provider = TokenProvider.from_env()
+    token = provider.token()
+    # After a 401 with that token:
+    token = provider.refresh(stale=token)
+"""
+
+import os
+import sys
+import time
+import threading
+
+import requests
+
+from sf_cache import cache_key, cache_path, file_lock, read_json, write_json
+from sf_trace import NO_SPAN, active_tracer
+
+# Client credentials responses carry no expires_in; assume the default 2h session
+# timeout unless SF_TOKEN_TTL says otherwise, and refresh a minute early.
+DEFAULT_TOKEN_TTL = 7200
+REFRESH_MARGIN = 60
+
+
+def request_token(base: str, client_id: str, client_secret: str, token_url: str = None,
+                  session: requests.Session = None, request_timeout: float = 30) -> dict:
+    """Request an access token with the OAuth client credentials flow."""
+    token_url = token_url or f"{base.rstrip('/')}/services/oauth2/token"
+    data = {
+        "grant_type": "client_credentials",
+        "client_id": client_id,
+        "client_secret": client_secret,
+    }
+    tracer = active_tracer()
+    span = tracer.span("POST", token_url, {}) if tracer else NO_SPAN
+    begun = span.begin()
+    try:
+        r = (session or requests).post(token_url, data=data, timeout=request_timeout)
+        span.attempt(begun, r)
+    finally:
+        span.finish()
+    if r.status_code >= 400:
+        raise RuntimeError(f"Token request failed ({r.status_code}): {r.text}")
+    return r.json()
+
+
+def token_ttl() -> float:
+    return float(os.getenv("SF_TOKEN_TTL", DEFAULT_TOKEN_TTL))
+
+
+class TokenProvider:
+    """Hands out a valid access token, refreshing through the shared cache when needed.
+
+    With client credentials the token is cached on disk and refreshed on expiry
+    or 401. With only a static ``SF_ACCESS_TOKEN`` there is nothing to refresh.
+    """
+
+    def __init__(self, base: str, client_id: str = None, client_secret: str = None, token_url: str = None,
+                 static_token: str = None, session: requests.Session = None, request_timeout: float = 30,
+                 use_cache: bool = True):
+        self.base_url = base.rstrip("/")
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.session = session
+        self.request_timeout = request_timeout
+        self.use_cache = use_cache
+        self._payload = {"access_token": static_token, "expires_at": None} if static_token else None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, session: requests.Session = None, request_timeout: float = 30) -> "TokenProvider":
+        base = os.getenv("SF_BASE_URL")
+        static = os.getenv("SF_ACCESS_TOKEN")
+        client_id = os.getenv("SF_CLIENT_ID")
+        client_secret = os.getenv("SF_CLIENT_SECRET")
+        if not base:
+            print("Missing SF_BASE_URL", file=sys.stderr)
+            sys.exit(2)
+        if not static and not (client_id and client_secret):
+            print("Missing SF_ACCESS_TOKEN (set it, or set SF_CLIENT_ID and SF_CLIENT_SECRET "
+                  "so a token can be fetched and cached).", file=sys.stderr)
+            sys.exit(2)
+        return cls(base, client_id, client_secret, static_token=static, session=session,
+                   request_timeout=request_timeout)
+
+    @property
+    def can_refresh(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    @property
+    def cache_file(self):
+        return cache_path("tokens", cache_key(self.base_url, self.client_id or "") + ".json")
+
+    @staticmethod
+    def _valid(payload: dict) -> bool:
+        if not payload or not payload.get("access_token"):
+            return False
+        expires_at = payload.get("expires_at")
+        return expires_at is None or expires_at - REFRESH_MARGIN > time.time()
+
+    def payload(self) -> dict:
+        """Return the current token payload (access_token, instance_url, expires_at, ...)."""
+        if self._valid(self._payload):
+            return self._payload
+        if not self.can_refresh:
+            return self._payload or {}
+        return self._refresh(stale=None)
+
+    def token(self) -> str:
+        return self.payload().get("access_token")
+
+    def refresh(self, stale: str = None) -> str:
+        """Get a new token unless another caller already replaced ``stale``."""
+        if not self.can_refresh:
+            return self.token()
+        return self._refresh(stale)["access_token"]
+
+    def _refresh(self, stale: str = None) -> dict:
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._valid(self._payload) and self._payload["access_token"] != stale:
+                return self._payload
+            if not self.use_cache:
+                self._payload = self._fetch()
+                return self._payload
+            with file_lock(self.cache_file):
+                cached = read_json(self.cache_file)
+                # ...or another process, in which case the cache already holds a fresh token
+                if self._valid(cached) and cached["access_token"] != stale:
+                    self._payload = cached
+                    return cached
+                self._payload = self._fetch()
+                write_json(self.cache_file, self._payload, private=True)
+            return self._payload
+
+    def _fetch(self) -> dict:
+        payload = request_token(self.base_url, self.client_id, self.client_secret, self.token_url,
+                                self.session, self.request_timeout)
+        if payload.get("expires_in"):
+            payload["expires_at"] = time.time() + float(payload["expires_in"])
+        elif payload.get("issued_at"):
+            payload["expires_at"] = int(payload["issued_at"]) / 1000 + token_ttl()
+        else:
+            payload["expires_at"] = time.time() + token_ttl()
+        return payload
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Batch helpers shared by the multi-record modes of the CRM scripts.
+Reads CSV/JSONL input files, splits records into API-sized chunks, sends
+them through the sObject Collections endpoints (up to 200 records per call)
+and resolves many lookup values with chunked ``WHERE field IN (...)`` queries.
+
+Usage (from another script in this directory):
+    from sf_batch import read_rows, collection_upsert, lookup_ids
+
+    rows = read_rows("leads.csv")
+    results = collection_upsert(client, "Lead", "External_ID__c", records)
+    ids = lookup_ids(client, "Lead", "Email", ["ada@example.ai", "grace@example.ai"])
+    changed, unchanged = diff_updates(current_records(client, "Lead", ids, ["Title"]), updates)
+"""
+
+import re
+import csv
+import json
+import datetime
+from pathlib import Path
+from itertools import islice
+
+from sf_client import SalesforceClient
+from sf_soql import format_soql, query_in
+
+# sObject Collections accept at most 200 records per request.
+COLLECTION_LIMIT = 200
+
+
+def read_rows(path: str) -> list:
+    """Read input rows from a .csv (header row required) or .jsonl/.ndjson file."""
+    suffix = Path(path).suffix.lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if suffix == ".csv":
+            return [dict(row) for row in csv.DictReader(f)]
+        if suffix in (".jsonl", ".ndjson"):
+            return [json.loads(line) for line in f if line.strip()]
+    raise ValueError(f"Unsupported input format: {path} (expected .csv or .jsonl)")
+
+
+def chunked(items, size: int):
+    """Yield lists of at most ``size`` items."""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _with_type(sobject: str, records: list) -> list:
+    return [{"attributes": {"type": sobject}, **r} for r in records]
+
+
+def _collection_call(client: SalesforceClient, method: str, path: str, sobject: str,
+                     records: list, all_or_none: bool) -> list:
+    from sf_retry import outcome_unknown
+
+    results = []
+    for chunk in chunked(records, COLLECTION_LIMIT):
+        body = {"allOrNone": all_or_none, "records": _with_type(sobject, chunk)}
+        r = client.request(method, path, json=body)
+        if outcome_unknown(r.status_code):
+            # The chunk may or may not have been applied: report it per record and go on
+            error = {"statusCode": f"HTTP_{r.status_code}",
+                     "message": f"{sobject} collection {method} failed ({r.status_code}): {r.text[:200]}"}
+            results.extend({"success": False, "errors": [error]} for _ in chunk)
+            continue
+        if r.status_code >= 400:
+            raise RuntimeError(f"{sobject} collection {method} failed ({r.status_code}): {r.text}")
+        results.extend(r.json())
+    return results
+
+
+def collection_upsert(client: SalesforceClient, sobject: str, external_id_field: str,
+                      records: list, all_or_none: bool = False) -> list:
+    """Upsert records by external ID, 200 per call. Returns one result per record, in order."""
+    path = f"composite/sobjects/{sobject}/{external_id_field}"
+    return _collection_call(client, "PATCH", path, sobject, records, all_or_none)
+
+
+def collection_create(client: SalesforceClient, sobject: str, records: list,
+                      all_or_none: bool = False) -> list:
+    """Create records, 200 per call. Returns one result per record, in order."""
+    return _collection_call(client, "POST", "composite/sobjects", sobject, records, all_or_none)
+
+
+def collection_update(client: SalesforceClient, sobject: str, records: list,
+                      all_or_none: bool = False) -> list:
+    """Update records (each must carry ``Id``), 200 per call. Returns one result per record."""
+    return _collection_call(client, "PATCH", "composite/sobjects", sobject, records, all_or_none)
+
+
+def subrequest(version: str, method: str, path: str, reference_id: str, body: dict = None) -> dict:
+    """Build one Composite API subrequest for a data-API relative path."""
+    req = {"method": method, "url": f"/services/data/{version}/{path}", "referenceId": reference_id}
+    if body is not None:
+        req["body"] = body
+    return req
+
+
+def composite(client: SalesforceClient, subrequests: list, all_or_none: bool = True) -> list:
+    """Send up to 25 linked subrequests in one Composite call (``@{ref.id}`` references allowed).
+
+    Returns the compositeResponse list; with ``all_or_none`` a failure rolls back every subrequest.
+    """
+    body = {"allOrNone": all_or_none, "compositeRequest": subrequests}
+    r = client.post("composite", json=body)
+    if r.status_code >= 400:
+        raise RuntimeError(f"Composite request failed ({r.status_code}): {r.text}")
+    return r.json().get("compositeResponse", [])
+
+
+def lookup_records(client: SalesforceClient, sobject: str, field: str, values, fields=()) -> dict:
+    """Map each value (lower-cased) to the first matching record, with ``fields`` selected too.
+
+    Values are deduplicated and sent as chunked ``WHERE field IN (...)`` queries
+    run concurrently, so thousands of lookups cost a handful of parallel round trips.
+    """
+    unique = list(dict.fromkeys(str(v).lower() for v in values if v))
+    select = list(dict.fromkeys(["Id", field, *fields]))
+    prefix = format_soql("SELECT {:field} FROM {:field} WHERE {:field}", select, sobject, field)
+    found = {}
+    for rec in query_in(client, prefix, unique):
+        found.setdefault(str(rec.get(field) or "").lower(), rec)
+    return found
+
+
+def lookup_ids(client: SalesforceClient, sobject: str, field: str, values) -> dict:
+    """Map each value (lower-cased) to the Id of the first matching record."""
+    return {key: rec["Id"] for key, rec in lookup_records(client, sobject, field, values).items()}
+
+
+def current_records(client: SalesforceClient, sobject: str, ids, fields) -> dict:
+    """Current values of ``fields`` for records by Id, keyed by the 15-character Id (case-sensitive)."""
+    unique = list(dict.fromkeys(str(i) for i in ids if i))
+    select = list(dict.fromkeys(["Id", *fields]))
+    found = {}
+    for rec in query_in(client, format_soql("SELECT {:field} FROM {:field} WHERE Id", select, sobject), unique):
+        found[rec["Id"][:15]] = rec
+    return found
+
+
+_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}T")
+
+
+def same_value(current, new) -> bool:
+    """Whether writing ``new`` would leave the stored value ``current`` (as a query returns it) unchanged.
+
+    Input values are often strings ("2000000", "true"); the stored value's JSON
+    type decides how they compare. Blank and null are the same, 15- and
+    18-character forms of an Id are the same, datetimes compare as instants.
+    """
+    if current in (None, "") or new in (None, ""):
+        return current in (None, "") and new in (None, "")
+    if isinstance(current, bool):
+        return str(new).strip().lower() == str(current).lower()
+    if isinstance(current, (int, float)):
+        try:
+            return float(new) == float(current)
+        except (TypeError, ValueError):
+            return False
+    current, new = str(current), str(new)
+    if len(current) == 18 and len(new) == 15 and current.isalnum():
+        return current[:15] == new
+    if _DATETIME.match(current) and _DATETIME.match(new):
+        try:
+            return _instant(current) == _instant(new)
+        except ValueError:
+            return False
+    return current == new
+
+
+def _instant(value: str) -> datetime.datetime:
+    # Salesforce returns 2026-01-05T09:30:00.000+0000; inputs are usually ISO 8601 with Z or +00:00
+    value = re.sub(r"([+-]\d{2})(\d{2})$", r"\1:\2", value.replace("Z", "+00:00"))
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def changed_fields(current: dict, fields: dict) -> dict:
+    """The subset of ``fields`` whose values differ from the ``current`` record."""
+    return {k: v for k, v in fields.items() if k != "Id" and not same_value(current.get(k), v)}
+
+
+def diff_updates(current: dict, updates: list) -> tuple:
+    """Reduce (row index, record with ``Id``) updates to the fields that would change.
+
+    ``current`` is ``current_records`` output. Returns (changed, unchanged):
+    changed holds (row index, ``{"Id", changed fields}``), unchanged holds
+    (row index, Id) for records already holding every value. Records missing
+    from ``current`` are kept whole, so the update reports the error.
+    """
+    changed, unchanged = [], []
+    for i, record in updates:
+        rec = current.get(str(record["Id"])[:15])
+        if rec is None:
+            changed.append((i, record))
+            continue
+        diff = changed_fields(rec, record)
+        if diff:
+            changed.append((i, {"Id": record["Id"], **diff}))
+        else:
+            unchanged.append((i, record["Id"]))
+    return changed, unchanged
+
+
+def error_text(result: dict) -> str:
+    """Flatten the errors of one collection result into a single message."""
+    return "; ".join(
+        f"{e.get('statusCode', 'ERROR')}: {e.get('message', '')}" for e in result.get("errors", [])
+    )
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for the CRM scripts, run against the local mock
+org (sf_mock_server.py). Each scenario runs a script in a fresh process with
+SF_BASE_URL pointed at the mock and reports wall time, the number of API
+requests it made (per endpoint) and its peak memory.
+
+The request counts are the regression gate: every scenario has a budget
+(e.g. 1000 leads matched by email must stay within 11 requests: at most 5
+email lookups plus the update and create collection calls), and the suite
+exits 1 if any scenario exceeds its budget or fails. Wall times depend on
+the machine and the simulated latency, so they are reported and compared
+against a saved baseline, but only gate with --max-slowdown.
+
+Usage:
+    python3 sf_bench.py                            # all scenarios, no added latency
+    python3 sf_bench.py --latency-ms 40            # closer to a real org round trip
+    python3 sf_bench.py --only lead-batch-email opportunity-batch
+    python3 sf_bench.py --rows 5000 --json > bench.json
+    python3 sf_bench.py --baseline bench.json --max-slowdown 1.5
+
+Exit status: 0 all scenarios within budget, 1 a scenario failed or regressed.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+CONFIG_DIR = SCRIPTS_DIR.parent / "config"
+
+DEFAULT_ROWS = 1000
+SEED = {"leads": 5000, "accounts": 500, "opportunities": 1000, "tasks": 2000}
+
+
+def write_csv(path: Path, rows: list) -> Path:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def scenarios(rows: int, work: Path, mock) -> list:
+    """(name, script args, request budget, extra env) for each scenario.
+
+    Budgets are derived from ``rows``: collections calls take 200 records,
+    email lookups chunk at 200 values per IN query, Id lookups at 400, query
+    pages hold 2000. query-long-in is too long for a GET URL and goes through
+    one Composite call. The -diff and -repeat scenarios resend a file the previous scenario
+    already applied, so every record is unchanged (or an open duplicate) and
+    only lookups are sent.
+    """
+    chunks = -(-rows // 200)
+    config = ["--config", str(CONFIG_DIR)]
+    existing = [r["Email"] for r in mock.org.query(f"SELECT Email FROM Lead LIMIT {rows // 2}")["records"]]
+    leads = [{"email": email, "first_name": "Bench", "last_name": "Bench", "company": "Bench Co", "title": "Updated"}
+             for email in existing]
+    leads += [{"email": f"new{i}@bench{i}.example.com", "first_name": "New", "last_name": f"Lead {i}",
+               "company": f"Bench New {i}"} for i in range(rows - len(leads))]
+    by_email = write_csv(work / "leads_email.csv", leads)
+    by_external = write_csv(work / "leads_external.csv", [dict(r, External_ID__c=f"ext-{i}")
+                                                          for i, r in enumerate(leads)])
+    opp_ids = [r["Id"] for r in mock.org.query(f"SELECT Id FROM Opportunity LIMIT {rows}")["records"]]
+    opps = write_csv(work / "opportunities.csv", [{"id": oid, "stage": "diligence", "next_step": "Bench"}
+                                                  for oid in opp_ids])
+    tasks = write_csv(work / "tasks.csv", [{"subject": "Bench next step", "due_date": "2026-11-01", "what_id": oid}
+                                           for oid in opp_ids])
+    id_chunks = -(-len(opp_ids) // 400)
+    account_id = next(iter(mock.org.records["Account"]))
+    total_leads = len(mock.org.records["Lead"])
+    no_overlap = {"SF_SYNC_OVERLAP": "0"}
+    from sf_soql import format_soql
+
+    return [
+        ("query-paged", ["sf_query.py", "SELECT Id, Email, Company FROM Lead"], -(-total_leads // 2000), {}),
+        ("query-cache-fill", ["sf_query.py", "SELECT Id, Email, Company FROM Lead", "--cache"],
+         -(-total_leads // 2000), {}),
+        ("query-cache-hit", ["sf_query.py", "select Id, Email, Company from Lead", "--cache"], 0, {}),
+        ("query-long-in", ["sf_query.py", format_soql("SELECT Id, Name FROM Opportunity WHERE Id IN {}", opp_ids)],
+         1, {}),
+        ("query-relationship", ["sf_query.py", "SELECT Id, Name, Account.Name FROM Opportunity WHERE IsClosed = false"],
+         1, {}),
+        ("describe-cold", ["sf_describe.py", "Lead"], 1, {"SF_CACHE_DIR": str(work / "cold-cache")}),
+        ("describe-warm", ["sf_describe.py", "Lead"], 1, {}),
+        ("lead-single", ["sf_upsert_lead.py", "--email", "single@bench.example.com", "--last", "Single",
+                         "--company", "Bench"] + config, 2, {}),
+        ("lead-batch-email", ["sf_upsert_lead.py", "--input", str(by_email)] + config, chunks * 2 + 1, {}),
+        ("lead-batch-email-diff", ["sf_upsert_lead.py", "--input", str(by_email), "--diff", "--no-journal"] + config,
+         chunks, {}),
+        ("lead-batch-external-id", ["sf_upsert_lead.py", "--input", str(by_external), "--external-id",
+                                    "External_ID__c"] + config, chunks, {}),
+        ("opportunity-batch", ["sf_create_opportunity.py", "--input", str(opps), "--concurrency", "20"] + config,
+         len(opp_ids), {}),
+        ("opportunity-batch-diff", ["sf_create_opportunity.py", "--input", str(opps), "--diff", "--no-journal"]
+         + config, id_chunks, {}),
+        ("task-single", ["sf_create_task.py", "--subject", "Bench follow-up", "--due", "2026-11-01",
+                         "--what-id", opp_ids[0]] + config, 1, {}),
+        ("task-batch", ["sf_create_task.py", "--input", str(tasks)] + config, id_chunks + -(-len(opp_ids) // 200), {}),
+        ("task-batch-repeat", ["sf_create_task.py", "--input", str(tasks), "--no-journal"] + config, id_chunks, {}),
+        ("deal-intake", ["sf_deal_intake.py", "--account-id", account_id, "--name", "Bench Deal", "--stage",
+                         "sourced", "--close-date", "2026-12-31", "--task-subject", "Intro call",
+                         "--task-due", "2026-11-01"] + config, 1, {}),
+        ("sync-full", ["sf_sync.py", "--db", str(work / "mirror.sqlite"), "--full"] + config, 0, no_overlap),
+        ("sync-incremental", ["sf_sync.py", "--db", str(work / "mirror.sqlite")] + config, 8, no_overlap),
+        ("token", ["sf_oauth_client_credentials.py", "--base-url", mock.url, "--client-id", "bench",
+                   "--client-secret", "bench", "--no-cache"], 1, {}),
+    ]
+
+
+def sync_budget(mock) -> int:
+    """Full sync: one query per object, paged at 2000 rows (getDeleted is only called incrementally)."""
+    return sum(-(-max(len(mock.org.records[o]), 1) // 2000) for o in ("Lead", "Account", "Opportunity", "Task"))
+
+
+def run_scenario(args: list, env: dict) -> dict:
+    """Run one script to completion; wall time in ms, exit code, peak RSS in MB, stderr tail."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable] + [str(SCRIPTS_DIR / args[0])] + args[1:], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    # Read stderr before reaping, so a chatty script cannot block on a full pipe
+    stderr = proc.stderr.read()
+    proc.stderr.close()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"wall_ms": round(elapsed, 1), "exit": proc.returncode, "peak_mb": round(peak_mb, 1),
+            "stderr": stderr.decode("utf-8", "replace")[-500:]}
+
+
+def compare(report: list, baseline_file: str, max_slowdown: float) -> list:
+    """Names of scenarios whose wall time grew past ``max_slowdown`` x the baseline."""
+    with open(baseline_file, encoding="utf-8") as f:
+        before = {r["scenario"]: r for r in json.load(f)["results"]}
+    slower = []
+    for r in report:
+        old = before.get(r["scenario"])
+        if old and old["wall_ms"]:
+            r["vs_baseline"] = round(r["wall_ms"] / old["wall_ms"], 2)
+            if max_slowdown and r["vs_baseline"] > max_slowdown:
+                slower.append(r["scenario"])
+    return slower
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Benchmark the CRM scripts end to end against a local mock org.")
+    p.add_argument("--rows", type=int, default=DEFAULT_ROWS, help=f"Rows per batch scenario (default {DEFAULT_ROWS})")
+    p.add_argument("--latency-ms", type=float, default=0, help="Simulated latency per API request")
+    p.add_argument("--jitter-ms", type=float, default=0, help="Random +/- variation of the latency")
+    p.add_argument("--only", nargs="+", metavar="SCENARIO", help="Run only these scenarios")
+    p.add_argument("--list", action="store_true", help="List scenario names and exit")
+    p.add_argument("--baseline", help="JSON report from an earlier --json run to compare wall times against")
+    p.add_argument("--max-slowdown", type=float, default=0,
+                   help="With --baseline, fail scenarios slower than this factor (0 = report only)")
+    p.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = p.parse_args(argv)
+
+    from sf_mock_server import MockSalesforce
+
+    with tempfile.TemporaryDirectory(prefix="sf-bench-") as tmp, MockSalesforce(
+            latency_ms=args.latency_ms, jitter_ms=args.jitter_ms) as mock:
+        work = Path(tmp)
+        mock.org.seed(**SEED)
+        plan = scenarios(args.rows, work, mock)
+        names = [name for name, *_ in plan]
+        if args.list:
+            print("\n".join(names))
+            return
+        unknown = set(args.only or []) - set(names)
+        if unknown:
+            print(f"Error: unknown scenario(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+            sys.exit(2)
+
+        base_env = {k: v for k, v in os.environ.items() if not k.startswith("SF_")}
+        base_env.update(mock.env(), SF_CACHE_DIR=str(work / "cache"), SF_DAEMON="0", SF_MAX_RETRIES="0")
+        report, failed = [], False
+        for name, cmd, budget, extra in plan:
+            if args.only and name not in args.only:
+                continue
+            if name == "sync-full":
+                budget = sync_budget(mock)
+            mock.reset_stats()
+            result = run_scenario(cmd, {**base_env, **extra})
+            stats = mock.stats()
+            ok = result["exit"] == 0 and stats["requests"] <= budget
+            failed |= not ok
+            entry = {"scenario": name, "ok": ok, "wall_ms": result["wall_ms"], "requests": stats["requests"],
+                     "budget": budget, "peak_mb": result["peak_mb"], "exit": result["exit"],
+                     "by_route": stats["by_route"]}
+            if result["exit"] != 0:
+                entry["stderr"] = result["stderr"]
+            report.append(entry)
+
+    slower = compare(report, args.baseline, args.max_slowdown) if args.baseline else []
+    failed |= bool(slower)
+    if args.json:
+        print(json.dumps({"rows": args.rows, "latency_ms": args.latency_ms, "results": report,
+                          "slower_than_baseline": slower, "ok": not failed}, indent=2))
+    else:
+        print(f"{args.rows} rows per batch; simulated latency {args.latency_ms:.0f} ms")
+        for r in report:
+            flag = "ok" if r["ok"] and r["scenario"] not in slower else "FAIL"
+            vs = f"  x{r['vs_baseline']:.2f}" if "vs_baseline" in r else ""
+            print(f"  {flag:4} {r['scenario']:24} {r['wall_ms']:9.1f} ms  {r['requests']:5} req "
+                  f"(budget {r['budget']:4})  {r['peak_mb']:6.1f} MB{vs}")
+            if r["exit"] != 0:
+                print(f"       exit {r['exit']}: {r['stderr'].strip().splitlines()[-1] if r['stderr'].strip() else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Salesforce Bulk API 2.0 helpers for large extracts and loads.
+Creates query and ingest jobs, polls them with exponential backoff and
+streams CSV to and from disk, so millions of rows move in a few requests
+without ever loading a whole result set into memory.
+
+Usage (from another script in this directory):
+    from sf_bulk import bulk_query, bulk_ingest
+
+    with open("opps.csv", "wb") as out:
+        rows = bulk_query(client, "SELECT Id, Name, StageName FROM Opportunity", out)
+
+    with open("chunk-001.csv", "rb") as data:
+        job = bulk_ingest(client, "Opportunity", "update", data)
+"""
+
+import sys
+import time
+
+from sf_client import SalesforceClient
+
+POLL_INITIAL = 1.0
+POLL_MAX = 30.0
+POLL_BACKOFF = 1.5
+DEFAULT_JOB_TIMEOUT = 3600
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+
+TERMINAL_STATES = {"JobComplete", "Failed", "Aborted"}
+
+INGEST_OPERATIONS = ("insert", "upsert", "update")
+# successfulResults / failedResults / unprocessedrecords, keyed by the file suffix we write.
+INGEST_RESULTS = {"success": "successfulResults", "failed": "failedResults", "unprocessed": "unprocessedrecords"}
+
+
+def _check(r, action: str):
+    if r.status_code >= 400:
+        raise RuntimeError(f"Bulk {action} failed ({r.status_code}): {r.text}")
+    return r
+
+
+def create_query_job(client: SalesforceClient, soql: str, include_deleted: bool = False) -> dict:
+    """Create a Bulk API 2.0 query job (``queryAll`` also returns deleted/archived rows)."""
+    body = {
+        "operation": "queryAll" if include_deleted else "query",
+        "query": soql,
+        "contentType": "CSV",
+        "columnDelimiter": "COMMA",
+        "lineEnding": "LF",
+    }
+    return _check(client.post("jobs/query", json=body), "query job create").json()
+
+
+def wait_for_job(client: SalesforceClient, kind: str, job_id: str, timeout: float = DEFAULT_JOB_TIMEOUT,
+                 verbose: bool = False, raise_on_failure: bool = True) -> dict:
+    """Poll ``jobs/<kind>/<id>`` with exponential backoff until it reaches a terminal state."""
+    delay = POLL_INITIAL
+    deadline = time.monotonic() + timeout
+    while True:
+        job = _check(client.get(f"jobs/{kind}/{job_id}"), f"{kind} job status").json()
+        state = job.get("state")
+        if verbose:
+            print(f"Bulk {kind} job {job_id}: {state}", file=sys.stderr)
+        if state in TERMINAL_STATES:
+            if state != "JobComplete" and raise_on_failure:
+                raise RuntimeError(f"Bulk {kind} job {job_id} {state}: {job.get('errorMessage', '')}")
+            return job
+        if time.monotonic() + delay > deadline:
+            raise RuntimeError(f"Bulk {kind} job {job_id} still {state} after {timeout}s")
+        time.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX)
+
+
+def download_query_results(client: SalesforceClient, job_id: str, out, max_records: int = None) -> int:
+    """Stream every result locator of a finished query job into binary file ``out``.
+
+    Each locator returns its own CSV header; only the first one is written.
+    Returns the number of records written.
+    """
+    locator = None
+    total = 0
+    first = True
+    while True:
+        params = {}
+        if locator:
+            params["locator"] = locator
+        if max_records:
+            params["maxRecords"] = max_records
+        r = _check(
+            client.get(f"jobs/query/{job_id}/results", params=params, headers={"Accept": "text/csv"}, stream=True),
+            "query results",
+        )
+        with r:
+            skip_header = not first
+            for chunk in r.iter_content(DOWNLOAD_CHUNK_BYTES):
+                if skip_header:
+                    newline = chunk.find(b"\n")
+                    if newline < 0:
+                        continue
+                    chunk = chunk[newline + 1:]
+                    skip_header = False
+                out.write(chunk)
+        first = False
+        total += int(r.headers.get("Sforce-NumberOfRecords", 0))
+        locator = r.headers.get("Sforce-Locator")
+        if not locator or locator == "null":
+            return total
+
+
+def bulk_query(client: SalesforceClient, soql: str, out, include_deleted: bool = False,
+               max_records: int = None, timeout: float = DEFAULT_JOB_TIMEOUT, verbose: bool = False) -> int:
+    """Run a query as a Bulk API 2.0 job and stream its CSV result into ``out``.
+
+    ``max_records`` sets the rows per result locator (Salesforce picks if omitted).
+    """
+    job = create_query_job(client, soql, include_deleted)
+    wait_for_job(client, "query", job["id"], timeout, verbose)
+    return download_query_results(client, job["id"], out, max_records)
+
+
+def create_ingest_job(client: SalesforceClient, sobject: str, operation: str,
+                      external_id_field: str = None) -> dict:
+    """Create a Bulk API 2.0 ingest job for insert, upsert (by external ID) or update."""
+    if operation not in INGEST_OPERATIONS:
+        raise ValueError(f"Unsupported ingest operation: {operation}")
+    body = {"object": sobject, "operation": operation, "contentType": "CSV", "lineEnding": "LF"}
+    if operation == "upsert":
+        body["externalIdFieldName"] = external_id_field
+    return _check(client.post("jobs/ingest", json=body), "ingest job create").json()
+
+
+def upload_job_data(client: SalesforceClient, job_id: str, data) -> None:
+    """Upload the job's CSV (bytes or a binary file object, streamed) and mark it UploadComplete."""
+    _check(client.request("PUT", f"jobs/ingest/{job_id}/batches", data=data,
+                          headers={"Content-Type": "text/csv"}), "ingest upload")
+    _check(client.patch(f"jobs/ingest/{job_id}", json={"state": "UploadComplete"}), "ingest close")
+
+
+def download_ingest_results(client: SalesforceClient, job_id: str, kind: str, out) -> None:
+    """Stream one ingest result file (success, failed or unprocessed) into binary file ``out``."""
+    r = _check(
+        client.get(f"jobs/ingest/{job_id}/{INGEST_RESULTS[kind]}", headers={"Accept": "text/csv"}, stream=True),
+        f"ingest {kind} results",
+    )
+    with r:
+        for chunk in r.iter_content(DOWNLOAD_CHUNK_BYTES):
+            out.write(chunk)
+
+
+def bulk_ingest(client: SalesforceClient, sobject: str, operation: str, data, external_id_field: str = None,
+                timeout: float = DEFAULT_JOB_TIMEOUT, verbose: bool = False) -> dict:
+    """Create an ingest job, upload ``data``, and wait for it. Returns the final job info.
+
+    Failed jobs are returned rather than raised so their result files can still be fetched.
+    """
+    job = create_ingest_job(client, sobject, operation, external_id_field)
+    upload_job_data(client, job["id"], data)
+    return wait_for_job(client, "ingest", job["id"], timeout, verbose, raise_on_failure=False)
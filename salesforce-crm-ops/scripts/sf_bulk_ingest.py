@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Load Leads, Opportunities or Tasks through Bulk API 2.0 ingest jobs.
+Maps rows with the same config/field_map.yaml logic and required-field checks
+as the create/upsert scripts, writes them to CSV in upload-sized chunks,
+submits one ingest job per chunk, and downloads the success, failure and
+unprocessed results of every job.
+
+Usage:
+    # Validate and write the upload chunks without submitting anything
+    python3 sf_bulk_ingest.py --object lead --operation insert --input leads.csv --dry-run
+
+    # Insert leads
+    python3 sf_bulk_ingest.py --object lead --operation insert --input leads.csv --output-dir runs/leads
+
+    # Upsert by external ID
+    python3 sf_bulk_ingest.py --object lead --operation upsert --external-id External_ID__c --input leads.jsonl
+
+    # Re-tag opportunities (rows carry Id plus the fields to change, e.g. Id,thesis_tag)
+    python3 sf_bulk_ingest.py --object opportunity --operation update --input retag.csv
+"""
+
+import sys
+import csv
+import json
+import argparse
+from pathlib import Path
+
+from sf_bulk import INGEST_OPERATIONS, INGEST_RESULTS, bulk_ingest, download_ingest_results
+from sf_batch import read_rows
+from sf_client import get_client
+from sf_config import load_config, missing_required, record_mapper
+from sf_validate import record_errors, schema_validator
+
+# Bulk API 2.0 accepts up to 150 MB per upload after base64 encoding; stay well below.
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+
+SOBJECTS = {"lead": "Lead", "opportunity": "Opportunity", "task": "Task"}
+
+
+def missing_fields(config: dict, obj: str, fields: dict, operation: str, external_id: str = None) -> list:
+    """Required-field check: create rules for inserts, the record key for upserts and updates."""
+    if operation == "update":
+        return [] if fields.get("Id") else ["Id"]
+    if operation == "upsert":
+        return [] if fields.get(external_id) else [external_id]
+    return missing_required(config, obj, fields)
+
+
+def write_chunks(records: list, out_dir: Path, max_bytes: int = MAX_UPLOAD_BYTES, max_rows: int = None) -> list:
+    """Write records to chunk-NNN.csv files no larger than one upload. Returns the paths."""
+    header = list(dict.fromkeys(k for r in records for k in r))
+    paths = []
+    f = writer = None
+    rows_in_chunk = 0
+    for record in records:
+        if f is None or f.tell() >= max_bytes or (max_rows and rows_in_chunk >= max_rows):
+            if f is not None:
+                f.close()
+            path = out_dir / f"chunk-{len(paths) + 1:03d}.csv"
+            paths.append(path)
+            f = open(path, "w", newline="", encoding="utf-8")
+            writer = csv.DictWriter(f, fieldnames=header, lineterminator="\n")
+            writer.writeheader()
+            rows_in_chunk = 0
+        writer.writerow(record)
+        rows_in_chunk += 1
+    if f is not None:
+        f.close()
+    return paths
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Load records through Salesforce Bulk API 2.0 ingest jobs.")
+    p.add_argument("--object", required=True, choices=sorted(SOBJECTS), help="Object to load")
+    p.add_argument("--operation", required=True, choices=INGEST_OPERATIONS, help="Ingest operation")
+    p.add_argument("--input", required=True, help="CSV or JSONL file of records (logical field names)")
+    p.add_argument("--external-id", help="External ID field for --operation upsert")
+    p.add_argument("--output-dir", default="./bulk_ingest", help="Where chunks and job results are written")
+    p.add_argument("--chunk-rows", type=int, help="Max rows per job (default: split by upload size only)")
+    p.add_argument("--timeout", type=float, default=3600, help="Seconds to wait for each job")
+
+    # Config and modes
+    p.add_argument("--config", default="./config", help="Path to config directory")
+    p.add_argument("--dry-run", action="store_true", help="Validate and write chunks without submitting")
+    p.add_argument("--verbose", action="store_true", help="Show job progress")
+
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
+
+    if args.operation == "upsert" and not args.external_id:
+        print("Error: --external-id is required for --operation upsert", file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    config = load_config(args.config)
+    map_record = record_mapper(config, args.object)
+
+    # Map and validate every row up front; invalid rows are reported and left out
+    validator = schema_validator(SOBJECTS[args.object])
+    operation = {"insert": "create"}.get(args.operation, args.operation)
+    records, invalid = [], 0
+    for i, row in enumerate(rows):
+        # An id column in any case is the record Id (as in the opportunity batch mode)
+        fields = map_record({("Id" if str(k).lower() == "id" else k): v for k, v in row.items()})
+        missing = missing_fields(config, args.object, fields, args.operation, args.external_id)
+        errors = record_errors(validator, missing, fields, operation, args.external_id)
+        if errors:
+            invalid += 1
+            print(json.dumps({"row": i + 1, "action": "error", "error": "; ".join(errors)}), file=sys.stderr)
+        else:
+            records.append(fields)
+
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    chunks = write_chunks(records, out_dir, max_rows=args.chunk_rows)
+
+    if args.dry_run:
+        print("=== DRY RUN MODE ===")
+        print(f"Would {args.operation} {len(records)} {SOBJECTS[args.object]} records in {len(chunks)} ingest job(s):")
+        for path in chunks:
+            print(f"  {path}")
+        print(f"\nValidation: {'FAILED' if invalid else 'PASSED'} ({invalid} invalid rows)")
+        sys.exit(1 if invalid else 0)
+
+    client = get_client()
+    failed = invalid
+    for path in chunks:
+        with open(path, "rb") as data:
+            job = bulk_ingest(client, SOBJECTS[args.object], args.operation, data, args.external_id,
+                              args.timeout, args.verbose)
+        files = {}
+        for kind in INGEST_RESULTS:
+            result_path = out_dir / f"{path.stem}.{job['id']}.{kind}.csv"
+            with open(result_path, "wb") as out:
+                download_ingest_results(client, job["id"], kind, out)
+            files[kind] = str(result_path)
+        failed += int(job.get("numberRecordsFailed") or 0)
+        print(json.dumps({
+            "chunk": str(path),
+            "job_id": job["id"],
+            "state": job.get("state"),
+            "processed": job.get("numberRecordsProcessed"),
+            "failed": job.get("numberRecordsFailed"),
+            "results": files,
+        }))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_bulk_ingest", main)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+On-disk cache primitives shared by the CRM scripts (token cache and friends).
+Everything lives under ``SF_CACHE_DIR`` (default ``~/.cache/salesforce-crm-ops``),
+is written atomically, and can be guarded by an advisory file lock so
+concurrent processes (e.g. parallel cron jobs) cooperate instead of racing.
+
+Usage (from another script in this directory):
+    from sf_cache import cache_path, file_lock, read_json, write_json
+
+    path = cache_path("tokens", "abc123.json")
+    with file_lock(path):
+        data = read_json(path) or refresh()
+        write_json(path, data, private=True)
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+def cache_dir(*parts: str) -> Path:
+    """Return (and create) a directory under the cache root."""
+    root = Path(os.getenv("SF_CACHE_DIR") or Path.home() / ".cache" / "salesforce-crm-ops")
+    path = root.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True, mode=0o700)
+    return path
+
+
+def cache_path(*parts: str) -> Path:
+    """Return a file path under the cache root, creating its parent directory."""
+    return cache_dir(*parts[:-1]) / parts[-1]
+
+
+def cache_key(*values: str) -> str:
+    """Stable short key for a tuple of strings (org URL, client ID, query, ...)."""
+    return hashlib.sha256("\x1f".join(values).encode("utf-8")).hexdigest()[:24]
+
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive advisory lock on ``<path>.lock`` for the duration of the block."""
+    lock_path = Path(f"{path}.lock")
+    with open(lock_path, "a") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path: Path):
+    """Return the parsed JSON file, or None if it is missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: Path, data, private: bool = False) -> None:
+    """Atomically replace ``path`` with ``data``; ``private`` restricts it to the owner."""
+    fd, tmp = tempfile.mkstemp(dir=str(Path(path).parent), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        if private:
+            os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
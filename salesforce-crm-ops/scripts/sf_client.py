@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Shared Salesforce REST client used by every script in this directory.
+Keeps one keep-alive requests.Session (connection pool) per org, with prebuilt
+auth headers and a single place for timeouts, so repeated API calls reuse the
+same TCP/TLS connection instead of paying a fresh handshake each time.
+Tokens come from sf_auth.TokenProvider; a 401 refreshes once and retries.
+Transient failures of idempotent calls are retried and calls are paced by
+daily API usage (see sf_retry). With --trace / SF_TRACE every call is
+recorded as a span (see sf_trace). Writes invalidate the query result cache
+(see sf_query_cache).
+
+``requests`` and the auth/retry modules are imported on first use, so
+scripts that only parse arguments or dry-run never pay for them.
+
+Usage (from another script in this directory):
+    from sf_client import get_client
+
+    client = get_client()
+    r = client.get("query/", params={"q": "SELECT Id FROM Lead LIMIT 5"})
+    r = client.post("sobjects/Lead/", json={"LastName": "Lovelace", "Company": "ExampleAI"})
+"""
+
+import os
+import sys
+import time
+
+DEFAULT_API_VERSION = "v59.0"
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 10
+
+
+def env(name: str, default: str = None, required: bool = True, hint: str = "") -> str:
+    v = os.getenv(name, default)
+    if required and not v:
+        print(f"Missing {name}{hint}", file=sys.stderr)
+        sys.exit(2)
+    return v
+
+
+def api_version() -> str:
+    return os.getenv("SF_API_VERSION", DEFAULT_API_VERSION)
+
+
+def base_url() -> str:
+    return env("SF_BASE_URL").rstrip("/")
+
+
+def timeout() -> float:
+    return float(os.getenv("SF_TIMEOUT", DEFAULT_TIMEOUT))
+
+
+def new_session(pool_size: int = DEFAULT_POOL_SIZE) -> "requests.Session":
+    """Create a keep-alive session with a connection pool sized for concurrent callers."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class SalesforceClient:
+    """Pooled REST client bound to one org and API version.
+
+    ``auth`` is either a fixed access token string or a TokenProvider; with a
+    provider, a 401 response refreshes the token once and replays the request.
+    Idempotent methods (and calls passed ``idempotent=True``) are retried on
+    transient failures; every call first checks the org's API usage limiter.
+    """
+
+    def __init__(self, base: str, auth, version: str = DEFAULT_API_VERSION,
+                 request_timeout: float = DEFAULT_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE):
+        from sf_auth import TokenProvider
+        from sf_retry import RetryPolicy, limiter_for
+
+        self.base_url = base.rstrip("/")
+        self.api_version = version
+        self.timeout = request_timeout
+        self.pool_size = pool_size
+        self.session = new_session(pool_size)
+        self.session.headers.update({"Accept": "application/json"})
+        if isinstance(auth, str):
+            auth = TokenProvider(self.base_url, static_token=auth)
+        self.auth = auth
+        self.retry = RetryPolicy()
+        self.limiter = limiter_for(self.base_url)
+
+    @classmethod
+    def from_env(cls) -> "SalesforceClient":
+        from sf_auth import TokenProvider
+
+        provider = TokenProvider.from_env(request_timeout=timeout())
+        client = cls(base_url(), provider, api_version(), timeout())
+        provider.session = client.session  # token refreshes reuse the same pool
+        return client
+
+    def url(self, path: str) -> str:
+        """Resolve a data-API relative path (e.g. ``sobjects/Lead/``) to a full URL.
+
+        Absolute URLs and server-relative paths such as ``nextRecordsUrl`` are
+        passed through unchanged (the latter prefixed with the instance URL).
+        """
+        if path.startswith(("https://", "http://")):
+            return path
+        if path.startswith("/"):
+            return self.base_url + path
+        return f"{self.base_url}/services/data/{self.api_version}/{path}"
+
+    def request(self, method: str, path: str, idempotent: bool = None, **kwargs) -> "requests.Response":
+        from sf_retry import TRANSIENT_ERRORS
+        from sf_trace import NO_SPAN, active_tracer
+
+        kwargs.setdefault("timeout", self.timeout)
+        headers = kwargs.pop("headers", None) or {}
+        url = self.url(path)
+        retryable = self.retry.is_idempotent(method) if idempotent is None else idempotent
+        data = kwargs.get("data")
+        start = data.tell() if hasattr(data, "seek") else None
+        self.retry.budget.record_call()
+        tracer = active_tracer()
+        span = tracer.span(method, url, kwargs) if tracer else NO_SPAN
+        attempt = 0
+        try:
+            while True:
+                waited = time.perf_counter()
+                self.limiter.before_request()
+                span.add("limiter", waited)
+                if attempt and start is not None:
+                    data.seek(start)
+                begun = span.begin()
+                try:
+                    r = self._send(method, url, headers, kwargs, start, span)
+                except TRANSIENT_ERRORS as e:
+                    span.attempt(begun, error=e)
+                    if not (retryable and self.retry.should_retry(attempt)):
+                        raise
+                    span.retry(type(e).__name__)
+                    slept = time.perf_counter()
+                    time.sleep(self.retry.delay(attempt))
+                    span.add("backoff", slept)
+                    attempt += 1
+                    continue
+                span.attempt(begun, r, stream=kwargs.get("stream", False))
+                self.limiter.observe(r)
+                if retryable and self.retry.retryable_response(r) and self.retry.should_retry(attempt):
+                    delay = self.retry.delay(attempt, r)
+                    span.retry(r.status_code)
+                    r.close()
+                    slept = time.perf_counter()
+                    time.sleep(delay)
+                    span.add("backoff", slept)
+                    attempt += 1
+                    continue
+                return r
+        finally:
+            span.finish()
+            if method not in ("GET", "HEAD"):
+                # Cached query results reading what this call may have written are stale now
+                from sf_query_cache import note_write
+
+                note_write(self.base_url, method, url, kwargs)
+
+    def _send(self, method: str, url: str, headers: dict, kwargs: dict, start: int = None,
+              span=None) -> "requests.Response":
+        """One attempt, with a single token refresh and replay on 401."""
+        began = time.perf_counter()
+        access_token = self.auth.token()
+        if span is not None:
+            span.add("auth", began)
+        r = self.session.request(method, url, headers={"Authorization": f"Bearer {access_token}", **headers}, **kwargs)
+        if r.status_code == 401 and self.auth.can_refresh:
+            # Expired or revoked session: refresh once (shared with concurrent callers) and replay
+            r.close()
+            if start is not None:
+                kwargs["data"].seek(start)
+            began = time.perf_counter()
+            access_token = self.auth.refresh(stale=access_token)
+            if span is not None:
+                span.add("auth", began)
+                span.retry(401)
+            r = self.session.request(method, url, headers={"Authorization": f"Bearer {access_token}", **headers},
+                                     **kwargs)
+        return r
+
+    def resize_pool(self, size: int) -> None:
+        """Grow the connection pool so ``size`` concurrent callers each keep a connection."""
+        if size <= self.pool_size:
+            return
+        from requests.adapters import HTTPAdapter
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool_size = size
+
+    def get(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("PATCH", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client = None
+
+
+def get_client() -> SalesforceClient:
+    """Return the process-wide client, creating it from env vars on first use."""
+    global _client
+    if _client is None:
+        _client = SalesforceClient.from_env()
+    return _client
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Compiled CRM config shared by every script.
+Parses config/field_map.yaml, stages.yaml and required_fields.yaml once,
+validates them, and compiles them into flat lookup tables with the built-in
+defaults already merged in. The compiled form is cached on disk keyed by the
+files' mtimes and sizes, so later runs skip YAML parsing (and the PyYAML
+import) entirely until a config file changes.
+
+Usage (from another script in this directory):
+    from sf_config import load_config, get_field_name, get_stage_value, field_mapper
+
+    config = load_config("./config")
+    get_field_name(config, "lead", "thesis_tag")      # -> "Thesis_Tag__c"
+    get_stage_value(config, "first_meeting")          # -> "First Meeting"
+    lead_field = field_mapper(config, "lead")         # preresolved, for per-row loops
+    lead_field("email")                               # -> "Email"
+    map_opp = record_mapper(config, "opportunity")    # whole rows, picklists translated
+    map_opp({"name": "ExampleAI Seed", "stage": "sourced"})
+
+Set SF_CONFIG_CACHE=0 to skip writing the compiled cache.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from sf_cache import cache_key, cache_path, read_json, write_json
+
+CONFIG_FILES = ("field_map.yaml", "stages.yaml", "required_fields.yaml")
+
+# Bump when the compiled layout changes so stale caches are ignored.
+COMPILED_VERSION = 1
+
+# Built-in logical -> API field names, used when field_map.yaml has no entry.
+DEFAULT_FIELDS = {
+    "lead": {
+        "email": "Email",
+        "first_name": "FirstName",
+        "last_name": "LastName",
+        "company": "Company",
+        "title": "Title",
+        "website": "Website",
+        "status": "Status",
+        "source": "LeadSource",
+        "description": "Description",
+    },
+    "account": {
+        "name": "Name",
+        "website": "Website",
+        "description": "Description",
+    },
+    "opportunity": {
+        "name": "Name",
+        "stage": "StageName",
+        "close_date": "CloseDate",
+        "amount": "Amount",
+        "account_id": "AccountId",
+        "next_step": "NextStep",
+        "probability": "Probability",
+        "description": "Description",
+    },
+    "task": {
+        "subject": "Subject",
+        "due_date": "ActivityDate",
+        "status": "Status",
+        "priority": "Priority",
+        "what_id": "WhatId",
+        "who_id": "WhoId",
+        "description": "Description",
+    },
+}
+
+DEFAULT_REQUIRED = {
+    "lead": ["LastName", "Company", "Status"],
+    "account": ["Name"],
+    "opportunity": ["Name", "StageName", "CloseDate"],
+    "task": ["Subject"],
+}
+
+# Logical fields whose values translate through a stages.yaml section.
+PICKLIST_FIELDS = {
+    ("opportunity", "stage"): "opportunity_stages",
+    ("task", "status"): "task_statuses",
+    ("task", "priority"): "task_priorities",
+}
+CASE_INSENSITIVE_PICKLISTS = {"task_priorities"}
+
+# Compiled configs by directory, reused while the stamp matches (long-lived processes).
+_loaded = {}
+
+
+def _stamp(config_path: Path) -> list:
+    stamp = [COMPILED_VERSION]
+    for name in CONFIG_FILES:
+        try:
+            st = (config_path / name).stat()
+            stamp.append([name, st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamp.append([name, None, None])
+    return stamp
+
+
+def _read_yaml(path: Path):
+    import yaml  # only needed when the compiled cache is stale
+
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _validate(raw: dict) -> None:
+    for obj, mapping in raw["field_map"].items():
+        if not isinstance(mapping, dict) or not all(isinstance(v, str) for v in mapping.values()):
+            raise ValueError(f"field_map.yaml: '{obj}' must map logical names to API field names")
+    for section, mapping in raw["stages"].items():
+        if not isinstance(mapping, dict):
+            raise ValueError(f"stages.yaml: '{section}' must map logical values to picklist values")
+    for obj, fields in raw["required_fields"].items():
+        if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+            raise ValueError(f"required_fields.yaml: '{obj}' must be a list of API field names")
+
+
+def compile_config(raw: dict) -> dict:
+    """Flatten raw YAML sections into lookup tables with the defaults merged in."""
+    _validate(raw)
+    fields = {obj: dict(defaults) for obj, defaults in DEFAULT_FIELDS.items()}
+    for obj, mapping in raw["field_map"].items():
+        fields.setdefault(obj, {}).update(mapping)
+    picklists = {}
+    for section, mapping in raw["stages"].items():
+        fold = section in CASE_INSENSITIVE_PICKLISTS
+        picklists[section] = {(str(k).lower() if fold else str(k)): str(v) for k, v in mapping.items()}
+    required = dict(DEFAULT_REQUIRED)
+    required.update(raw["required_fields"])
+    return {
+        # Raw sections, kept for callers that read them directly
+        "field_map": raw["field_map"],
+        "stages": raw["stages"],
+        "required_fields": raw["required_fields"],
+        # Compiled lookup tables
+        "fields": fields,
+        "picklists": picklists,
+        "required": required,
+    }
+
+
+def load_config(config_dir: str) -> dict:
+    """Load the compiled config, reusing the on-disk compiled copy while the YAML is unchanged.
+
+    Exits with status 2 if a config file is malformed.
+    """
+    config_path = Path(config_dir).resolve()
+    stamp = _stamp(config_path)
+    hit = _loaded.get(config_path)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    have_files = any(entry[1] is not None for entry in stamp[1:])
+    cache_file = cache_path("config", cache_key(str(config_path)) + ".json") if have_files else None
+
+    if cache_file:
+        cached = read_json(cache_file)
+        if cached and cached.get("stamp") == stamp:
+            _loaded[config_path] = (stamp, cached["compiled"])
+            return cached["compiled"]
+
+    raw = {"field_map": {}, "stages": {}, "required_fields": {}}
+    for key, name in zip(raw, CONFIG_FILES):
+        if (config_path / name).exists():
+            raw[key] = _read_yaml(config_path / name)
+    try:
+        compiled = compile_config(raw)
+    except ValueError as e:
+        print(f"Invalid config in {config_dir}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if cache_file and os.getenv("SF_CONFIG_CACHE", "1") != "0":
+        write_json(cache_file, {"stamp": stamp, "compiled": compiled})
+    _loaded[config_path] = (stamp, compiled)
+    return compiled
+
+
+def get_field_name(config: dict, obj: str, logical_name: str) -> str:
+    """Map logical field name to Salesforce API field name."""
+    return config["fields"].get(obj, {}).get(logical_name, logical_name)
+
+
+def field_mapper(config: dict, obj: str):
+    """Return a one-argument mapper for ``obj`` with its lookup table preresolved."""
+    table = config["fields"].get(obj, {})
+    return lambda logical_name: table.get(logical_name, logical_name)
+
+
+def record_mapper(config: dict, obj: str):
+    """Return a function mapping one row of logical names/values to API fields for ``obj``.
+
+    Field names and picklist tables are resolved once, so per-row mapping is
+    plain dict lookups. Empty values and blank keys are dropped.
+    """
+    names = config["fields"].get(obj, {})
+    picklists = {
+        key: (config["picklists"].get(section, {}), section in CASE_INSENSITIVE_PICKLISTS)
+        for (o, key), section in PICKLIST_FIELDS.items() if o == obj
+    }
+
+    def map_record(row: dict) -> dict:
+        fields = {}
+        for key, value in row.items():
+            if not key or value in (None, ""):
+                continue
+            if key in picklists and isinstance(value, str):
+                table, fold = picklists[key]
+                value = table.get(value.lower() if fold else value, value)
+            fields[names.get(key, key)] = value
+        return fields
+
+    return map_record
+
+
+def picklist_value(config: dict, section: str, logical_value: str) -> str:
+    """Map a logical value through one stages.yaml section (unknown values pass through)."""
+    return config["picklists"].get(section, {}).get(logical_value, logical_value)
+
+
+def get_stage_value(config: dict, logical_stage: str) -> str:
+    """Map logical stage to Salesforce picklist value."""
+    return picklist_value(config, "opportunity_stages", logical_stage)
+
+
+def get_status_value(config: dict, logical_status: str) -> str:
+    """Map logical task status to Salesforce picklist value."""
+    return picklist_value(config, "task_statuses", logical_status)
+
+
+def get_priority_value(config: dict, logical_priority: str) -> str:
+    """Map logical task priority (case-insensitive) to Salesforce picklist value."""
+    return config["picklists"].get("task_priorities", {}).get(logical_priority.lower(), logical_priority)
+
+
+def required_fields(config: dict, obj: str) -> list:
+    """Required API fields for creating ``obj``."""
+    return config["required"].get(obj, [])
+
+
+def missing_required(config: dict, obj: str, fields: dict) -> list:
+    """Required fields that are absent or empty in ``fields``."""
+    return [f for f in required_fields(config, obj) if not fields.get(f)]
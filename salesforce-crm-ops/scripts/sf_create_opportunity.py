@@ -18,117 +18,166 @@ Usage:
     # Update existing opportunity
     python3 sf_create_opportunity.py --id 006XXXX --stage "Passed" --pass-reason "Market too small" \
         --what-would-change "If TAM evidence shows >$1B"
+
+    # Weekly re-sync: PATCH only fields whose values changed, skip records that already match
+    python3 sf_create_opportunity.py --input stage_updates.csv --diff
+
+    # Many creates/updates from a file, 20 requests in flight (rows with an id column are updates)
+    python3 sf_create_opportunity.py --input stage_updates.csv --concurrency 20
+
+    # Rerunning after a timeout or crash resumes: creates the interrupted run made are skipped,
+    # creates whose response was lost are looked up before being sent again (see sf_journal.py)
+    python3 sf_create_opportunity.py --input new_deals.csv
+
+    # Resume a run that finished but whose output was lost, without creating its deals twice
+    python3 sf_create_opportunity.py --input new_deals.csv --resume
 """
 
-import os
 import sys
 import json
 import argparse
 import datetime
-from pathlib import Path
 
-import requests
-import yaml
+from sf_batch import changed_fields, current_records, diff_updates, read_rows
+from sf_client import get_client
+from sf_config import get_field_name, get_stage_value, load_config, missing_required, record_mapper
+from sf_journal import entry, journaled, open_journal
+from sf_validate import record_errors, schema_errors, schema_validator
 
 
-def load_config(config_dir: str) -> dict:
-    """Load field mappings and stages from config files."""
-    config = {"field_map": {}, "stages": {}, "required_fields": {}}
-    config_path = Path(config_dir)
-    
-    if (config_path / "field_map.yaml").exists():
-        with open(config_path / "field_map.yaml") as f:
-            config["field_map"] = yaml.safe_load(f) or {}
-    
-    if (config_path / "stages.yaml").exists():
-        with open(config_path / "stages.yaml") as f:
-            config["stages"] = yaml.safe_load(f) or {}
-    
-    if (config_path / "required_fields.yaml").exists():
-        with open(config_path / "required_fields.yaml") as f:
-            config["required_fields"] = yaml.safe_load(f) or {}
-    
-    return config
+def create_opportunity(fields: dict) -> dict:
+    r = get_client().post("sobjects/Opportunity/", json=fields)
+    if r.status_code >= 400:
+        raise RuntimeError(f"Create Opportunity failed ({r.status_code}): {r.text}")
+    return r.json()
 
 
-def get_field_name(config: dict, obj: str, logical_name: str) -> str:
-    """Map logical field name to Salesforce API field name."""
-    if obj in config.get("field_map", {}) and logical_name in config["field_map"][obj]:
-        return config["field_map"][obj][logical_name]
-    defaults = {
-        "name": "Name",
-        "stage": "StageName",
-        "close_date": "CloseDate",
-        "amount": "Amount",
-        "account_id": "AccountId",
-        "next_step": "NextStep",
-        "probability": "Probability",
-        "description": "Description",
-    }
-    return defaults.get(logical_name, logical_name)
+def update_opportunity(opp_id: str, fields: dict) -> None:
+    r = get_client().patch(f"sobjects/Opportunity/{opp_id}", json=fields)
+    if r.status_code >= 400:
+        raise RuntimeError(f"Update Opportunity failed ({r.status_code}): {r.text}")
 
 
-def get_stage_value(config: dict, logical_stage: str) -> str:
-    """Map logical stage to Salesforce picklist value."""
-    stages = config.get("stages", {}).get("opportunity_stages", {})
-    return stages.get(logical_stage, logical_stage)
+def validate_required_fields(config: dict, fields: dict, is_update: bool) -> list:
+    """Check if required fields are present (only for create)."""
+    if is_update:
+        return []
+    return missing_required(config, "opportunity", fields)
 
 
-def env(name: str, default: str = None, required: bool = True) -> str:
-    v = os.getenv(name, default)
-    if required and not v:
-        print(f"Missing {name}", file=sys.stderr)
-        sys.exit(2)
-    return v
+def map_row(map_record, row: dict) -> tuple:
+    """Map one input row (logical field names) to (opportunity id or None, API fields).
 
+    ``map_record`` is ``sf_config.record_mapper(config, "opportunity")``.
+    """
+    opp_id = row.get("id") or row.get("Id") or None
+    fields = map_record({k: v for k, v in row.items() if k not in ("id", "Id")})
+    return opp_id, fields
 
-def api_version() -> str:
-    return os.getenv("SF_API_VERSION", "v59.0")
 
+def journal_entry(opp_id, fields: dict) -> dict:
+    """Journal entry for one write; a create is reconciled on its Name, CloseDate and AccountId."""
+    if opp_id:
+        return entry("Opportunity", "update", {"Id": opp_id, **fields})
+    return entry("Opportunity", "create", fields)
 
-def base_url() -> str:
-    return env("SF_BASE_URL").rstrip("/")
 
+def skip_unchanged(pending: list, results: list) -> list:
+    """--diff for --input: reduce updates to their changed fields, report identical ones as ``unchanged``.
 
-def token() -> str:
-    return env("SF_ACCESS_TOKEN")
+    Current values come from chunked ``Id IN (...)`` queries, selecting every field
+    the updates set. ``pending`` holds (row index, id, fields, journal entry) tuples.
+    """
+    updates = [(n, {"Id": opp_id, **fields}) for n, (_, opp_id, fields, _) in enumerate(pending) if opp_id]
+    if not updates:
+        return pending
+    names = list(dict.fromkeys(k for _, record in updates for k in record if k != "Id"))
+    current = current_records(get_client(), "Opportunity", [record["Id"] for _, record in updates], names)
+    changed, unchanged = diff_updates(current, updates)
+    for n, opp_id in unchanged:
+        i = pending[n][0]
+        results[i] = {"row": i + 1, "action": "unchanged", "id": opp_id}
+    for n, record in changed:
+        i, opp_id, _, e = pending[n]
+        pending[n] = (i, opp_id, {k: v for k, v in record.items() if k != "Id"}, e)
+    return [p for p in pending if results[p[0]] is None]
 
 
-def create_opportunity(fields: dict) -> dict:
-    url = f"{base_url()}/services/data/{api_version()}/sobjects/Opportunity/"
-    r = requests.post(
-        url,
-        headers={"Authorization": f"Bearer {token()}", "Content-Type": "application/json"},
-        data=json.dumps(fields),
-        timeout=30
-    )
-    if r.status_code >= 400:
-        raise RuntimeError(f"Create Opportunity failed ({r.status_code}): {r.text}")
-    return r.json()
+def run_batch(config: dict, args) -> None:
+    """Handle --input mode: fan out creates/updates concurrently, one JSON result per row."""
+    from sf_async import default_concurrency, run_all
 
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
 
-def update_opportunity(opp_id: str, fields: dict) -> None:
-    url = f"{base_url()}/services/data/{api_version()}/sobjects/Opportunity/{opp_id}"
-    r = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {token()}", "Content-Type": "application/json"},
-        data=json.dumps(fields),
-        timeout=30
-    )
-    if r.status_code >= 400:
-        raise RuntimeError(f"Update Opportunity failed ({r.status_code}): {r.text}")
+    results = [None] * len(rows)
+    pending = []
+    map_record = record_mapper(config, "opportunity")
+    validator = schema_validator("Opportunity")
+    for i, row in enumerate(rows):
+        opp_id, fields = map_row(map_record, row)
+        missing = validate_required_fields(config, fields, bool(opp_id))
+        errors = record_errors(validator, missing, {"Id": opp_id, **fields} if opp_id else fields,
+                               "update" if opp_id else "create")
+        if errors:
+            results[i] = {"row": i + 1, "action": "error", "error": "; ".join(errors)}
+        elif args.dry_run:
+            results[i] = {"row": i + 1, "action": "would_update" if opp_id else "would_create",
+                          "id": opp_id, "fields": fields}
+        else:
+            pending.append((i, opp_id, fields, journal_entry(opp_id, fields)))
 
+    if args.dry_run:
+        print("=== DRY RUN MODE ===")
+    journal = open_journal(args) if pending else None
+    if journal:
+        # Rows a previous run already wrote (or whose lost create turns up on lookup) are not sent again
+        settled = journal.resolve(get_client(), [e for *_, e in pending])
+        for i, opp_id, fields, e in pending:
+            if e["key"] in settled:
+                results[i] = {"row": i + 1, **settled[e["key"]]}
+        pending = [p for p in pending if results[p[0]] is None]
+    if args.diff and pending:
+        pending = skip_unchanged(pending, results)
+    if journal:
+        journal.begin([e for *_, e in pending])
+    calls, indexes = [], []
+    for i, opp_id, fields, e in pending:
+        if opp_id:
+            send = lambda opp_id=opp_id, fields=fields: update_opportunity(opp_id, fields) or opp_id
+        else:
+            send = lambda fields=fields: create_opportunity(fields).get("id")
+        if journal:
+            send = lambda key=e["key"], send=send: journal.call(key, send)
+        calls.append(send)
+        indexes.append((i, "updated" if opp_id else "created"))
+    if calls:
+        concurrency = args.concurrency or default_concurrency()
+        get_client().resize_pool(concurrency)
+        for (i, action), outcome in zip(indexes, run_all(calls, concurrency)):
+            if outcome["ok"]:
+                results[i] = {"row": i + 1, "action": action, "id": outcome["result"]}
+            else:
+                results[i] = {"row": i + 1, "action": "error", "error": outcome["error"]}
+    if journal:
+        journal.close()
 
-def validate_required_fields(config: dict, fields: dict, is_update: bool) -> list:
-    """Check if required fields are present (only for create)."""
-    if is_update:
-        return []
-    required = config.get("required_fields", {}).get("opportunity", ["Name", "StageName", "CloseDate"])
-    missing = [f for f in required if f not in fields or not fields[f]]
-    return missing
+    for res in results:
+        print(json.dumps(res))
+    counts = {}
+    for res in results:
+        counts[res["action"]] = counts.get(res["action"], 0) + 1
+    print(json.dumps({"summary": counts}), file=sys.stderr)
+    if args.dry_run:
+        print("\nValidation: " + ("FAILED" if counts.get("error") else "PASSED"))
+    if counts.get("error"):
+        sys.exit(1)
 
 
-def main() -> None:
+def main(argv: list = None) -> None:
     p = argparse.ArgumentParser(description="Create or update a Salesforce Opportunity.")
     
     # Identifier for update
@@ -151,11 +200,31 @@ def main() -> None:
     p.add_argument("--recheck-date", help="Recheck date YYYY-MM-DD (custom field)")
     
     # Config and modes
+    # Batch mode
+    p.add_argument("--input", help="CSV or JSONL file of opportunities (logical field names; rows with id are updates)")
+    p.add_argument("--concurrency", type=int, help="Requests in flight for --input (default: SF_CONCURRENCY or 10)")
+    p.add_argument("--diff", action="store_true",
+                   help="For updates, fetch current values first; send only changed fields, skip unchanged records")
+    
     p.add_argument("--config", default="./config", help="Path to config directory")
     p.add_argument("--dry-run", action="store_true", help="Validate without executing")
+    p.add_argument("--no-journal", action="store_true",
+                   help="Do not record writes in the local journal (an interrupted run cannot be resumed)")
+    p.add_argument("--resume", action="store_true",
+                   help="Skip creates an earlier run of the same input already made "
+                        "(automatic when that run was interrupted)")
     p.add_argument("--verbose", action="store_true", help="Show detailed output")
     
-    args = p.parse_args()
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
+    
+    if args.input:
+        run_batch(load_config(args.config), args)
+        return
     
     is_update = bool(args.id)
     
@@ -225,6 +294,11 @@ def main() -> None:
     if missing:
         print(f"Error: Missing required fields: {missing}", file=sys.stderr)
         sys.exit(2)
+    problems = schema_errors("Opportunity", {"Id": args.id, **fields} if is_update else fields,
+                             "update" if is_update else "create")
+    if problems:
+        print("Error: Schema validation failed:\n  " + "\n  ".join(problems), file=sys.stderr)
+        sys.exit(2)
     
     # Dry run mode
     if args.dry_run:
@@ -237,14 +311,29 @@ def main() -> None:
         print("\nValidation: PASSED")
         return
     
-    # Execute
-    if is_update:
-        update_opportunity(args.id, fields)
-        print(json.dumps({"action": "updated", "id": args.id}, indent=2))
+    # Execute (a create a resumed run already made is reported instead of being sent again)
+    e = journal_entry(args.id, fields)
+    journal = open_journal(args)
+    settled = journal.resolve(get_client(), [e]) if journal else {}
+    if e["key"] in settled:
+        print(json.dumps(settled[e["key"]], indent=2))
+    elif is_update:
+        if args.diff:
+            current = current_records(get_client(), "Opportunity", [args.id], fields).get(args.id[:15])
+            fields = changed_fields(current, fields) if current else fields
+        if args.diff and not fields:
+            print(json.dumps({"action": "unchanged", "id": args.id}, indent=2))
+        else:
+            journaled(journal, e, lambda: update_opportunity(args.id, fields), result_id=lambda _: args.id)
+            print(json.dumps({"action": "updated", "id": args.id}, indent=2))
     else:
-        result = create_opportunity(fields)
+        result = journaled(journal, e, lambda: create_opportunity(fields), result_id=lambda r: r.get("id"))
         print(json.dumps({"action": "created", "id": result.get("id")}, indent=2))
+    if journal:
+        journal.close()
 
 
 if __name__ == "__main__":
-    main()
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_create_opportunity", main)
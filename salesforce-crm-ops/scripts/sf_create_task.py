@@ -15,125 +15,217 @@ Usage:
 
     # High priority task
     python3 sf_create_task.py --subject "IC prep" --due 2026-02-10 --priority High --what-id 006XXXX
+
+    # Many tasks from a file (columns: subject,due_date,what_id,who_id,status,priority,description);
+    # rows matching an open Task with the same subject on the same record are skipped,
+    # the rest are created 200 per API call
+    python3 sf_create_task.py --input next_steps.csv --dry-run
+    python3 sf_create_task.py --input next_steps.csv
 """
 
-import os
 import sys
 import json
 import argparse
 import datetime
-from pathlib import Path
 
-import requests
-import yaml
+from sf_batch import collection_create, error_text, read_rows
+from sf_client import get_client
+from sf_config import (
+    get_field_name, get_priority_value, get_status_value, load_config, missing_required, record_mapper,
+)
+from sf_journal import entry, journaled, open_journal
+from sf_soql import format_soql, query_in
+from sf_validate import record_errors, schema_errors, schema_validator
 
 
-def load_config(config_dir: str) -> dict:
-    """Load field mappings and stages from config files."""
-    config = {"field_map": {}, "stages": {}, "required_fields": {}}
-    config_path = Path(config_dir)
-    
-    if (config_path / "field_map.yaml").exists():
-        with open(config_path / "field_map.yaml") as f:
-            config["field_map"] = yaml.safe_load(f) or {}
-    
-    if (config_path / "stages.yaml").exists():
-        with open(config_path / "stages.yaml") as f:
-            config["stages"] = yaml.safe_load(f) or {}
-    
-    if (config_path / "required_fields.yaml").exists():
-        with open(config_path / "required_fields.yaml") as f:
-            config["required_fields"] = yaml.safe_load(f) or {}
-    
-    return config
+def create_task(fields: dict) -> dict:
+    r = get_client().post("sobjects/Task/", json=fields)
+    if r.status_code >= 400:
+        raise RuntimeError(f"Create Task failed ({r.status_code}): {r.text}")
+    return r.json()
 
 
-def get_field_name(config: dict, obj: str, logical_name: str) -> str:
-    """Map logical field name to Salesforce API field name."""
-    if obj in config.get("field_map", {}) and logical_name in config["field_map"][obj]:
-        return config["field_map"][obj][logical_name]
-    defaults = {
-        "subject": "Subject",
-        "due_date": "ActivityDate",
-        "status": "Status",
-        "priority": "Priority",
-        "what_id": "WhatId",
-        "who_id": "WhoId",
-        "description": "Description",
-    }
-    return defaults.get(logical_name, logical_name)
+def validate_required_fields(config: dict, fields: dict) -> list:
+    """Check if required fields are present."""
+    return missing_required(config, "task", fields)
 
 
-def get_status_value(config: dict, logical_status: str) -> str:
-    """Map logical status to Salesforce picklist value."""
-    statuses = config.get("stages", {}).get("task_statuses", {})
-    return statuses.get(logical_status, logical_status)
+def task_key(config: dict, fields: dict) -> tuple:
+    """What makes two open Tasks the same next step: subject (case-insensitive) and related records."""
+    what = fields.get(get_field_name(config, "task", "what_id"))
+    who = fields.get(get_field_name(config, "task", "who_id"))
+    subject = str(fields.get(get_field_name(config, "task", "subject")) or "").strip().lower()
+    return (str(what)[:15] if what else None, str(who)[:15] if who else None, subject)
 
 
-def get_priority_value(config: dict, logical_priority: str) -> str:
-    """Map logical priority to Salesforce picklist value."""
-    priorities = config.get("stages", {}).get("task_priorities", {})
-    return priorities.get(logical_priority.lower(), logical_priority)
+def open_task_keys(config: dict, pending: list) -> dict:
+    """Map task_key -> Id for open Tasks on the records that ``pending`` rows relate to.
 
+    One chunked ``WhatId IN (...)`` query for rows with a related record and one
+    ``WhoId IN (...)`` query for rows with only a person; subjects are compared locally.
+    """
+    what_field = get_field_name(config, "task", "what_id")
+    who_field = get_field_name(config, "task", "who_id")
+    subject_field = get_field_name(config, "task", "subject")
+    what_ids = [f[what_field] for _, f in pending if f.get(what_field)]
+    who_ids = [f[who_field] for _, f in pending if f.get(who_field) and not f.get(what_field)]
+    client, existing = get_client(), {}
+    select = ["Id", subject_field, what_field, who_field]
+    for field, ids in ((what_field, what_ids), (who_field, who_ids)):
+        prefix = format_soql("SELECT {:field} FROM Task WHERE IsClosed = false AND {:field}", select, field)
+        for rec in query_in(client, prefix, list(dict.fromkeys(ids))):
+            key = task_key(config, rec)
+            existing.setdefault(key, rec["Id"])
+            # A row naming only the related record also matches a Task that names a person too
+            existing.setdefault((key[0], None, key[2]), rec["Id"])
+            existing.setdefault((None, key[1], key[2]), rec["Id"])
+    return existing
 
-def env(name: str, default: str = None, required: bool = True) -> str:
-    v = os.getenv(name, default)
-    if required and not v:
-        print(f"Missing {name}", file=sys.stderr)
-        sys.exit(2)
-    return v
 
+def create_rows(config: dict, rows: list, status: str, priority: str, dry_run: bool = False,
+                journal=None) -> list:
+    """Create many Tasks through sObject Collections. Returns one result per input row.
 
-def api_version() -> str:
-    return os.getenv("SF_API_VERSION", "v59.0")
+    Rows repeating an open Task (same subject on the same WhatId/WhoId) or an
+    earlier row are skipped as ``duplicate``. Rows with neither a WhatId nor a
+    WhoId are not checked. With a ``journal`` Tasks a resumed run already created
+    are reported as ``already_done`` (or ``reconciled``) instead.
+    """
+    results = [None] * len(rows)
+    pending = []  # (row index, fields)
+    map_record = record_mapper(config, "task")
+    defaults = {
+        get_field_name(config, "task", "status"): get_status_value(config, status),
+        get_field_name(config, "task", "priority"): get_priority_value(config, priority),
+    }
+    validator = schema_validator("Task")
+    due_field = get_field_name(config, "task", "due_date")
+    for i, row in enumerate(rows):
+        fields = {**defaults, **map_record(row)}
+        errors = record_errors(validator, validate_required_fields(config, fields), fields, "create")
+        # Checked even without a cached describe (the schema check reports it the same way)
+        if fields.get(due_field) and not any(e.startswith(f"{due_field}:") for e in errors):
+            try:
+                datetime.date.fromisoformat(str(fields[due_field]))
+            except ValueError:
+                errors.append(f"{due_field}: '{fields[due_field]}' is not a YYYY-MM-DD date")
+        if errors:
+            results[i] = {"row": i + 1, "action": "error", "error": "; ".join(errors)}
+        else:
+            pending.append((i, fields))
 
+    if dry_run:
+        for i, fields in pending:
+            results[i] = {"row": i + 1, "action": "would_create", "fields": fields}
+        return results
 
-def base_url() -> str:
-    return env("SF_BASE_URL").rstrip("/")
+    client = get_client()
+    entries = {}
+    if journal is not None:
+        entries = {i: entry("Task", "create", fields) for i, fields in pending}
+        settled = journal.resolve(client, list(entries.values()))
+        for i, _ in pending:
+            if entries[i]["key"] in settled:
+                results[i] = {"row": i + 1, **settled[entries[i]["key"]]}
+        pending = [(i, fields) for i, fields in pending if results[i] is None]
 
+    existing = open_task_keys(config, pending) if pending else {}
+    creates, seen = [], {}
+    for i, fields in pending:
+        key = task_key(config, fields)
+        if key[0] is None and key[1] is None:
+            creates.append((i, fields))
+        elif key in existing:
+            results[i] = {"row": i + 1, "action": "duplicate", "id": existing[key]}
+        elif key in seen:
+            results[i] = {"row": i + 1, "action": "duplicate", "duplicate_of_row": seen[key] + 1}
+        else:
+            seen[key] = i
+            creates.append((i, fields))
 
-def token() -> str:
-    return env("SF_ACCESS_TOKEN")
+    if journal is not None:
+        journal.begin([entries[i] for i, _ in creates])
+    for (i, _), res in zip(creates, collection_create(client, "Task", [f for _, f in creates])):
+        if res.get("success"):
+            results[i] = {"row": i + 1, "action": "created", "id": res.get("id")}
+        else:
+            results[i] = {"row": i + 1, "action": "error", "error": error_text(res)}
+    if journal is not None:
+        journal.settle_results([(entries[i]["key"], results[i]) for i, _ in creates])
+    return results
 
 
-def create_task(fields: dict) -> dict:
-    url = f"{base_url()}/services/data/{api_version()}/sobjects/Task/"
-    r = requests.post(
-        url,
-        headers={"Authorization": f"Bearer {token()}", "Content-Type": "application/json"},
-        data=json.dumps(fields),
-        timeout=30
-    )
-    if r.status_code >= 400:
-        raise RuntimeError(f"Create Task failed ({r.status_code}): {r.text}")
-    return r.json()
+def run_batch(config: dict, args) -> None:
+    """Handle --input mode: print one JSON result per row, then a summary on stderr."""
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
 
+    if args.dry_run:
+        print("=== DRY RUN MODE ===")
+        print(f"Would create {len(rows)} Task rows, skipping open Tasks with the same subject and WhatId/WhoId")
+    journal = None if args.dry_run else open_journal(args)
+    results = create_rows(config, rows, args.status, args.priority, dry_run=args.dry_run, journal=journal)
+    if journal:
+        journal.close()
+    for res in results:
+        print(json.dumps(res))
 
-def validate_required_fields(config: dict, fields: dict) -> list:
-    """Check if required fields are present."""
-    required = config.get("required_fields", {}).get("task", ["Subject"])
-    missing = [f for f in required if f not in fields or not fields[f]]
-    return missing
+    counts = {}
+    for res in results:
+        counts[res["action"]] = counts.get(res["action"], 0) + 1
+    print(json.dumps({"summary": counts}), file=sys.stderr)
+    if args.dry_run:
+        print("\nValidation: " + ("FAILED" if counts.get("error") else "PASSED"))
+    if counts.get("error"):
+        sys.exit(1)
 
 
-def main() -> None:
+def main(argv: list = None) -> None:
     p = argparse.ArgumentParser(description="Create a Salesforce Task for next-step tracking.")
     
     # Core fields
-    p.add_argument("--subject", required=True, help="Task subject (required)")
-    p.add_argument("--due", required=True, help="Due date YYYY-MM-DD (required)")
+    p.add_argument("--subject", help="Task subject (required unless --input)")
+    p.add_argument("--due", help="Due date YYYY-MM-DD (required unless --input)")
     p.add_argument("--status", default="Not Started", help="Task status")
     p.add_argument("--priority", default="Normal", help="Task priority (High/Normal/Low)")
     p.add_argument("--what-id", help="Related record ID (Opportunity/Account)")
     p.add_argument("--who-id", help="Name record ID (Lead/Contact)")
     p.add_argument("--description", help="Task description/comments")
     
+    # Batch mode
+    p.add_argument("--input", help="CSV or JSONL file of tasks (logical field names) to create 200 per API call; "
+                   "--status/--priority are the defaults for rows without them")
+    
     # Config and modes
     p.add_argument("--config", default="./config", help="Path to config directory")
     p.add_argument("--dry-run", action="store_true", help="Validate without executing")
+    p.add_argument("--no-journal", action="store_true",
+                   help="Do not record writes in the local journal (an interrupted run cannot be resumed)")
+    p.add_argument("--resume", action="store_true",
+                   help="Skip creates an earlier run of the same input already made "
+                        "(automatic when that run was interrupted)")
     p.add_argument("--verbose", action="store_true", help="Show detailed output")
     
-    args = p.parse_args()
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
+    
+    if args.input:
+        run_batch(load_config(args.config), args)
+        return
+    
+    if not args.subject:
+        print("Error: --subject is required", file=sys.stderr)
+        sys.exit(2)
+    if not args.due:
+        print("Error: --due is required", file=sys.stderr)
+        sys.exit(2)
     
     # Validate date format
     try:
@@ -165,6 +257,10 @@ def main() -> None:
     if missing:
         print(f"Error: Missing required fields: {missing}", file=sys.stderr)
         sys.exit(2)
+    problems = schema_errors("Task", fields)
+    if problems:
+        print("Error: Schema validation failed:\n  " + "\n  ".join(problems), file=sys.stderr)
+        sys.exit(2)
     
     # Dry run mode
     if args.dry_run:
@@ -174,10 +270,20 @@ def main() -> None:
         print("\nValidation: PASSED")
         return
     
-    # Execute
-    result = create_task(fields)
-    print(json.dumps({"action": "created", "id": result.get("id")}, indent=2))
+    # Execute (a create whose response was lost is looked up instead of creating a second Task)
+    e = entry("Task", "create", fields)
+    journal = open_journal(args)
+    settled = journal.resolve(get_client(), [e]) if journal else {}
+    if e["key"] in settled:
+        print(json.dumps(settled[e["key"]], indent=2))
+    else:
+        result = journaled(journal, e, lambda: create_task(fields), result_id=lambda r: r.get("id"))
+        print(json.dumps({"action": "created", "id": result.get("id")}, indent=2))
+    if journal:
+        journal.close()
 
 
 if __name__ == "__main__":
-    main()
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_create_task", main)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Log a new deal in one all-or-none Composite API call.
+Creates (or links) the Account, optionally records the founder as a Lead
+(updating the Lead that already has the founder's email, if there is one),
+creates the Opportunity and its next-step Task, linking the records with
+``@{ref.id}`` references. If any step fails, nothing is left half-created.
+
+Usage:
+    # Dry run (prints the composite request)
+    python3 sf_deal_intake.py --dry-run --account-name "ExampleAI" --name "ExampleAI Seed" \
+        --stage first_meeting --close-date 2026-03-31 --task-subject "Send follow-up" --task-due 2026-02-05
+
+    # New account + opportunity + next-step task
+    python3 sf_deal_intake.py --account-name "ExampleAI" --account-website https://example.ai \
+        --name "ExampleAI Seed" --stage first_meeting --close-date 2026-03-31 --thesis-tag "AI Security" \
+        --task-subject "Schedule diligence calls" --task-due 2026-02-05
+
+    # Existing account, plus the founder as a Lead
+    python3 sf_deal_intake.py --account-id 001XXXX --lead-email ada@example.ai --lead-first Ada --lead-last Lovelace \
+        --lead-company ExampleAI --name "ExampleAI Seed" --stage sourced --close-date 2026-03-31
+"""
+
+import sys
+import json
+import argparse
+import datetime
+
+from sf_batch import composite, lookup_records, subrequest
+from sf_client import api_version, get_client
+from sf_config import (
+    get_field_name, get_priority_value, get_stage_value, get_status_value, load_config, missing_required,
+)
+from sf_journal import entry, journaled, open_journal
+from sf_validate import schema_errors
+
+
+def account_fields(config: dict, args) -> dict:
+    values = {"name": args.account_name, "website": args.account_website, "thesis_tag": args.thesis_tag}
+    return {get_field_name(config, "account", k): v for k, v in values.items() if v}
+
+
+def lead_fields(config: dict, args) -> dict:
+    values = {
+        "email": args.lead_email,
+        "first_name": args.lead_first,
+        "last_name": args.lead_last,
+        "company": args.lead_company or args.account_name,
+        "title": args.lead_title,
+        "status": args.lead_status,
+        "thesis_tag": args.thesis_tag,
+    }
+    return {get_field_name(config, "lead", k): v for k, v in values.items() if v}
+
+
+def opportunity_fields(config: dict, args) -> dict:
+    values = {
+        "name": args.name,
+        "stage": get_stage_value(config, args.stage),
+        "close_date": args.close_date,
+        "amount": args.amount,
+        "next_step": args.next_step,
+        "description": args.description,
+        "thesis_tag": args.thesis_tag,
+    }
+    return {
+        get_field_name(config, "opportunity", k): v
+        for k, v in values.items() if v is not None and v != ""
+    }
+
+
+def task_fields(config: dict, args) -> dict:
+    values = {
+        "subject": args.task_subject,
+        "due_date": args.task_due,
+        "status": get_status_value(config, args.task_status),
+        "priority": get_priority_value(config, args.task_priority),
+    }
+    return {get_field_name(config, "task", k): v for k, v in values.items() if v}
+
+
+def existing_lead_id(config: dict, args):
+    """Id of the Lead that already has the founder's email, or None."""
+    if not (args.lead_last and args.lead_email) or args.external_id:
+        return None
+    email_field = get_field_name(config, "lead", "email")
+    found = lookup_records(get_client(), "Lead", email_field, [args.lead_email]).get(args.lead_email.lower())
+    return found["Id"] if found else None
+
+
+def build_subrequests(version: str, config: dict, args, lead_id: str = None) -> list:
+    """Build the linked subrequests: Account -> Opportunity -> Task, plus an optional Lead.
+
+    With ``lead_id`` (the founder is already a Lead) the Lead is updated instead of created.
+    """
+    subrequests = []
+    opp = opportunity_fields(config, args)
+    account_key = get_field_name(config, "opportunity", "account_id")
+
+    if args.account_id:
+        opp[account_key] = args.account_id
+    elif args.account_name:
+        subrequests.append(subrequest(version, "POST", "sobjects/Account/", "account", account_fields(config, args)))
+        opp[account_key] = "@{account.id}"
+
+    if args.lead_last:
+        lead = lead_fields(config, args)
+        if args.external_id and args.external_id_value:
+            path = f"sobjects/Lead/{args.external_id}/{args.external_id_value}"
+            subrequests.append(subrequest(version, "PATCH", path, "lead", lead))
+        elif lead_id:
+            subrequests.append(subrequest(version, "PATCH", f"sobjects/Lead/{lead_id}", "lead", lead))
+        else:
+            subrequests.append(subrequest(version, "POST", "sobjects/Lead/", "lead", lead))
+
+    subrequests.append(subrequest(version, "POST", "sobjects/Opportunity/", "opportunity", opp))
+
+    if args.task_subject:
+        task = task_fields(config, args)
+        task[get_field_name(config, "task", "what_id")] = "@{opportunity.id}"
+        subrequests.append(subrequest(version, "POST", "sobjects/Task/", "task", task))
+    return subrequests
+
+
+def reference_id(responses: list, reference: str):
+    """Record id a composite subrequest returned, or None."""
+    for r in responses:
+        body = r.get("body") or {}
+        if r.get("referenceId") == reference and isinstance(body, dict):
+            return body.get("id")
+    return None
+
+
+def journal_entry(subrequests: list) -> dict:
+    """Journal entry for the whole intake, reconciled on the Opportunity it creates."""
+    opp = next(s["body"] for s in subrequests if s["referenceId"] == "opportunity")
+    # Keyed without the API version in the URLs, so a version bump does not hide an earlier run
+    writes = [(s["method"], s["url"].split("/", 4)[-1], s.get("body")) for s in subrequests]
+    # A founder matched by email is keyed like the create: a rerun that finds the Lead a lost
+    # intake made still recognises the intake (and reconciles it) instead of sending it again
+    writes = [("POST", "sobjects/Lead/", body) if method == "PATCH" and path.count("/") == 2 else (method, path, body)
+              for method, path, body in writes]
+    return entry("Opportunity", "composite", writes, match=opp)
+
+
+def validate(config: dict, args) -> list:
+    """Required-field check for every record the intake would create."""
+    errors = []
+    if args.account_name and not args.account_id:
+        errors += [f"Account.{f}" for f in missing_required(config, "account", account_fields(config, args))]
+    if args.lead_last:
+        errors += [f"Lead.{f}" for f in missing_required(config, "lead", lead_fields(config, args))]
+    errors += [f"Opportunity.{f}" for f in missing_required(config, "opportunity", opportunity_fields(config, args))]
+    if args.task_subject:
+        errors += [f"Task.{f}" for f in missing_required(config, "task", task_fields(config, args))]
+    return errors
+
+
+def schema_problems(subrequests: list) -> list:
+    """Schema check of every record body in the composite request, against cached describes."""
+    problems = []
+    for sub in subrequests:
+        sobject = sub["url"].split("/sobjects/", 1)[1].split("/", 1)[0]
+        operation = "create" if sub["method"] == "POST" else "upsert"
+        problems += [f"{sobject}.{p}" for p in schema_errors(sobject, sub["body"], operation)]
+    return problems
+
+
+def report(journal, e: dict, responses: list, verbose: bool = False, lead_id: str = None) -> bool:
+    """Print the intake's outcome; True when allOrNone rolled it back."""
+    if verbose:
+        print(json.dumps(responses, indent=2), file=sys.stderr)
+
+    failed = [r for r in responses if r.get("httpStatusCode", 500) >= 400]
+    if failed:
+        # allOrNone: everything was rolled back; report the subrequest(s) that caused it
+        errors = {
+            r["referenceId"]: r.get("body")
+            for r in failed
+            if not any(e.get("errorCode") == "PROCESSING_HALTED" for e in (r.get("body") or []))
+        }
+        if journal:
+            journal.failed(e["key"], json.dumps(errors))
+        print(json.dumps({"action": "rolled_back", "errors": errors}, indent=2))
+        return True
+
+    result = {"action": "created"}
+    for r in responses:
+        body = r.get("body") or {}
+        result[r["referenceId"]] = body.get("id") if isinstance(body, dict) else None
+    if lead_id:
+        # An update by Id answers 204 without a body
+        result["lead"] = lead_id
+    print(json.dumps(result, indent=2))
+    return False
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Create Account/Lead + Opportunity + Task in one Composite call.")
+
+    # Account (new or existing)
+    p.add_argument("--account-id", help="Existing Account ID to attach the opportunity to")
+    p.add_argument("--account-name", help="Create a new Account with this name")
+    p.add_argument("--account-website", help="Website for the new Account")
+
+    # Founder as Lead (optional)
+    p.add_argument("--lead-email", help="Founder email")
+    p.add_argument("--lead-first", help="Founder first name")
+    p.add_argument("--lead-last", help="Founder last name (creates a Lead)")
+    p.add_argument("--lead-company", help="Lead company (defaults to --account-name)")
+    p.add_argument("--lead-title", help="Founder title")
+    p.add_argument("--lead-status", default="Open - Not Contacted", help="Lead status")
+    p.add_argument("--external-id", help="Upsert the Lead by this external ID field instead of creating it")
+    p.add_argument("--external-id-value", help="External ID value for the Lead upsert")
+
+    # Opportunity
+    p.add_argument("--name", required=True, help="Opportunity name")
+    p.add_argument("--stage", required=True, help="Stage name (maps through config/stages.yaml)")
+    p.add_argument("--close-date", required=True, help="Close date YYYY-MM-DD")
+    p.add_argument("--amount", type=float, help="Deal amount")
+    p.add_argument("--next-step", help="Next step description")
+    p.add_argument("--description", help="Description/notes")
+    p.add_argument("--thesis-tag", help="Thesis tag (custom field, set on every created record)")
+
+    # Next-step Task (optional)
+    p.add_argument("--task-subject", help="Create a next-step Task with this subject")
+    p.add_argument("--task-due", help="Task due date YYYY-MM-DD (required with --task-subject)")
+    p.add_argument("--task-status", default="Not Started", help="Task status")
+    p.add_argument("--task-priority", default="Normal", help="Task priority (High/Normal/Low)")
+
+    # Config and modes
+    p.add_argument("--config", default="./config", help="Path to config directory")
+    p.add_argument("--dry-run", action="store_true", help="Validate and print the composite request")
+    p.add_argument("--no-journal", action="store_true",
+                   help="Do not record the intake in the local journal (a lost response is not reconciled on rerun)")
+    p.add_argument("--resume", action="store_true",
+                   help="Skip creates an earlier run of the same input already made "
+                        "(automatic when that run was interrupted)")
+    p.add_argument("--verbose", action="store_true", help="Show the full composite response")
+
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
+
+    if args.account_id and args.account_name:
+        print("Error: use either --account-id or --account-name, not both", file=sys.stderr)
+        sys.exit(2)
+    if args.task_subject and not args.task_due:
+        print("Error: --task-due is required with --task-subject", file=sys.stderr)
+        sys.exit(2)
+    for flag, value in (("--close-date", args.close_date), ("--task-due", args.task_due)):
+        if value:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                print(f"Error: {flag} must be YYYY-MM-DD format", file=sys.stderr)
+                sys.exit(2)
+
+    config = load_config(args.config)
+
+    missing = validate(config, args)
+    if missing:
+        print(f"Error: Missing required fields: {missing}", file=sys.stderr)
+        sys.exit(2)
+
+    lead_id = None if args.dry_run else existing_lead_id(config, args)
+    subrequests = build_subrequests(api_version(), config, args, lead_id)
+    problems = schema_problems(subrequests)
+    if problems:
+        print("Error: Schema validation failed:\n  " + "\n  ".join(problems), file=sys.stderr)
+        sys.exit(2)
+
+    if args.dry_run:
+        print("=== DRY RUN MODE ===")
+        print("Would POST one all-or-none Composite request:")
+        print(json.dumps({"allOrNone": True, "compositeRequest": subrequests}, indent=2))
+        if args.lead_last and args.lead_email and not args.external_id:
+            print(f"\nWould update the existing Lead with email {args.lead_email} instead, if there is one")
+        print("\nValidation: PASSED")
+        return
+
+    # A resumed intake that already went through (or whose lost response turns up on lookup) is reported
+    e = journal_entry(subrequests)
+    journal = open_journal(args)
+    try:
+        settled = journal.resolve(get_client(), [e]) if journal else {}
+        if e["key"] in settled:
+            print(json.dumps({"action": settled[e["key"]]["action"], "opportunity": settled[e["key"]]["id"]},
+                             indent=2))
+            return
+        responses = journaled(journal, e, lambda: composite(get_client(), subrequests, all_or_none=True),
+                              result_id=lambda rs: reference_id(rs, "opportunity"))
+        rolled_back = report(journal, e, responses, args.verbose, lead_id)
+    finally:
+        if journal:
+            journal.close()
+    if rolled_back:
+        sys.exit(1)
+
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_deal_intake", main)
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Local fuzzy duplicate index for Leads and Accounts.
+Built once from the sf_sync mirror (or a direct API extract), it stores
+match keys in SQLite: normalized email, email domain, website host,
+normalized company and person names, and MinHash LSH band keys over name
+trigrams. "Is there probably an existing record for this?" is then a couple
+of indexed local lookups instead of a SOQL round trip per candidate, so
+"ExampleAI" finds "Example AI, Inc." and a founder's second address at the
+same company is caught before a duplicate Lead is created.
+
+Usage:
+    # Build (or rebuild) from the local mirror; run sf_sync.py first
+    python3 sf_dedupe_index.py build
+
+    # Build straight from the API instead
+    python3 sf_dedupe_index.py build --from-api
+
+    # Probable matches for one prospective lead
+    python3 sf_dedupe_index.py match --email ada@example.ai --first Ada --last Lovelace --company "Example AI, Inc."
+
+    # Check an import file (logical field names); rows also match earlier rows of the same file
+    python3 sf_dedupe_index.py scan --input leads.csv
+
+Library use (from another script in this directory):
+    from sf_dedupe_index import DedupeIndex, index_path
+
+    index = DedupeIndex(index_path())
+    matches = index.probable({"email": "ada@example.ai", "company": "ExampleAI"})
+
+Settings (env):
+    SF_DEDUPE_INDEX     index path (default: dedupe/<org key>.sqlite under SF_CACHE_DIR)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlparse
+
+from sf_cache import cache_key, cache_path
+
+# Score at or above which a candidate counts as a probable existing record.
+PROBABLE_SCORE = 0.75
+SIMILAR_NAME = 0.6  # trigram Jaccard for "similar" company/person names
+OTHER_PERSON_SCORE = 0.6  # cap for a shared company/domain when both records name different people
+
+# MinHash: 30 permutations in 10 bands of 3 rows. Names with Jaccard 0.6 share
+# a band ~91% of the time, unrelated names (Jaccard < 0.1) ~1%.
+BANDS, ROWS = 10, 3
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20260101)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+# Candidates scored per lookup. Keys are read exact-first (email, person, company,
+# then host and name LSH bands), so a broad bucket never crowds out an exact match.
+MAX_CANDIDATES = 200
+KEY_TIERS = ("email", "person", "company", "host", "plsh", "clsh")
+# A host or LSH band shared by more records than this is too common to point at one; it is skipped.
+MAX_BUCKET = 500
+
+# Bump when normalization or key derivation changes; older indexes must be rebuilt.
+INDEX_VERSION = 1
+
+FREE_EMAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "msn.com",
+    "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "gmx.com", "yandex.com",
+    "hey.com", "fastmail.com", "mail.com",
+}
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation", "co", "company", "gmbh", "ag",
+    "sa", "sas", "bv", "plc", "pbc", "lp", "llp", "pty", "oy", "ab",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    object TEXT NOT NULL,
+    email TEXT,
+    person TEXT,
+    company TEXT,
+    hosts TEXT
+);
+CREATE TABLE IF NOT EXISTS keys (
+    key TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (key, id)
+) WITHOUT ROWID;
+"""
+
+
+def index_path() -> Path:
+    if os.getenv("SF_DEDUPE_INDEX"):
+        return Path(os.environ["SF_DEDUPE_INDEX"])
+    from sf_client import base_url
+
+    return cache_path("dedupe", cache_key(base_url()) + ".sqlite")
+
+
+# ---------------------------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------------------------
+
+def _ascii_words(value: str) -> list:
+    value = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", " ", value.replace("&", " and ")).split()
+
+
+def normalize_email(email: str) -> str:
+    """Lowercase, drop ``+tags``, and fold Gmail's dot-insensitive local parts."""
+    email = str(email or "").strip().lower()
+    local, _, domain = email.partition("@")
+    if not local or not domain:
+        return ""
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}"
+
+
+def email_domain(email: str) -> str:
+    """Company domain of an email address, or "" for free-mail providers."""
+    domain = normalize_email(email).partition("@")[2]
+    return "" if domain in FREE_EMAIL_DOMAINS else domain
+
+
+def website_host(url: str) -> str:
+    url = str(url or "").strip().lower()
+    if not url:
+        return ""
+    host = urlparse(url if "://" in url else f"http://{url}").hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def company_key(name: str) -> str:
+    """``"Example AI, Inc."`` and ``"ExampleAI"`` both become ``"exampleai"``."""
+    words = _ascii_words(name)
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return "".join(words)
+
+
+def person_key(first: str, last: str) -> str:
+    return " ".join(_ascii_words(first) + _ascii_words(last))
+
+
+def trigrams(value: str) -> set:
+    padded = f"^{value}$"
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+@lru_cache(maxsize=65536)
+def _gram_hashes(gram: str) -> tuple:
+    """One trigram's value under every MinHash permutation (trigram vocabularies are small, so cached)."""
+    h = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "big")
+    return tuple((a * h + b) % _PRIME for a, b in _PERMS)
+
+
+@lru_cache(maxsize=16384)
+def lsh_keys(prefix: str, value: str) -> tuple:
+    """MinHash band keys for ``value``'s trigrams (stable across processes)."""
+    if not value:
+        return ()
+    signature = list(map(min, zip(*(_gram_hashes(g) for g in trigrams(value)))))
+    keys = []
+    for band in range(BANDS):
+        value = 0
+        for row in signature[band * ROWS:(band + 1) * ROWS]:
+            value = (value << 1) ^ row
+        keys.append(f"{prefix}:{band}:{value:x}")
+    return tuple(keys)
+
+
+def features(record: dict) -> dict:
+    """Normalized match features of a record given with logical field names."""
+    email = normalize_email(record.get("email"))
+    hosts = {h for h in (email_domain(email), website_host(record.get("website"))) if h}
+    return {
+        "email": email,
+        "person": person_key(record.get("first_name"), record.get("last_name")),
+        "company": company_key(record.get("company")),
+        "hosts": sorted(hosts),
+    }
+
+
+def match_keys(feat: dict) -> list:
+    keys = [f"host:{h}" for h in feat["hosts"]]
+    if feat["email"]:
+        keys.append(f"email:{feat['email']}")
+    if feat["company"]:
+        keys.append(f"company:{feat['company']}")
+        keys += lsh_keys("clsh", feat["company"])
+    if feat["person"]:
+        keys.append(f"person:{feat['person']}")
+        keys += lsh_keys("plsh", feat["person"])
+    return keys
+
+
+def score(query: dict, candidate: dict) -> tuple:
+    """(score 0..1, reasons) for how likely ``candidate`` is the same record as ``query``."""
+    if query["email"] and query["email"] == candidate["email"]:
+        return 1.0, ["email"]
+    reasons, best = [], 0.0
+    same_org = False
+    if set(query["hosts"]) & set(candidate["hosts"]):
+        reasons.append("domain")
+        best, same_org = 0.6, True
+    if query["company"] and candidate["company"]:
+        if query["company"] == candidate["company"]:
+            reasons.append("company")
+            best, same_org = max(best, 0.8), True
+        else:
+            similarity = jaccard(trigrams(query["company"]), trigrams(candidate["company"]))
+            if similarity >= SIMILAR_NAME:
+                reasons.append(f"similar_company:{similarity:.2f}")
+                best, same_org = max(best, 0.5 + 0.3 * similarity), True
+    if same_org and query["person"] and candidate["person"]:
+        if query["person"] == candidate["person"]:
+            reasons.append("person")
+            best = max(best, 0.95)
+        elif jaccard(trigrams(query["person"]), trigrams(candidate["person"])) >= SIMILAR_NAME:
+            reasons.append("similar_person")
+            best = max(best, 0.85)
+        else:
+            # A colleague at the same company, not the same person
+            reasons.append("other_person")
+            best = min(best, OTHER_PERSON_SCORE)
+    if "domain" in reasons and len(reasons) > 1 and "other_person" not in reasons:
+        best = min(0.99, best + 0.1)
+    return round(best, 3), reasons
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class DedupeIndex:
+    """SQLite-backed match-key index. ``add`` without ``commit`` keeps entries for this session only."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+        self.conn.commit()
+        version = self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+        if version != str(INDEX_VERSION):
+            self.conn.close()
+            raise RuntimeError(f"Dedupe index {self.path} has format {version}, expected {INDEX_VERSION}; "
+                               "rebuild it with 'sf_dedupe_index.py build'")
+
+    @staticmethod
+    def _rows(record_id: str, obj: str, record: dict) -> tuple:
+        feat = features(record)
+        row = (record_id, obj, feat["email"], feat["person"], feat["company"], " ".join(feat["hosts"]))
+        return row, [(k, record_id) for k in match_keys(feat)]
+
+    def add(self, record_id: str, obj: str, record: dict) -> None:
+        row, keys = self._rows(record_id, obj, record)
+        self.conn.execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", row)
+        self.conn.executemany("INSERT OR IGNORE INTO keys (key, id) VALUES (?, ?)", keys)
+
+    def load(self, entries, batch: int = 10000) -> None:
+        """Bulk ``add`` of (record_id, object, record) entries, committed at the end.
+
+        Keys go to an unindexed staging table first and are merged in key order,
+        which is several times faster than random-order inserts into the index.
+        """
+        self.conn.execute("CREATE TEMP TABLE keys_load (key TEXT, id TEXT)")
+        rows, keys = [], []
+        for record_id, obj, record in entries:
+            row, row_keys = self._rows(record_id, obj, record)
+            rows.append(row)
+            keys += row_keys
+            if len(rows) >= batch:
+                self.conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.conn.executemany("INSERT INTO keys_load VALUES (?, ?)", keys)
+                rows, keys = [], []
+        self.conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.executemany("INSERT INTO keys_load VALUES (?, ?)", keys)
+        self.conn.execute("INSERT OR IGNORE INTO keys SELECT key, id FROM keys_load ORDER BY key, id")
+        self.conn.execute("DROP TABLE keys_load")
+        self.conn.commit()
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def discard(self) -> None:
+        """Drop entries added since the last commit (e.g. rows of an import being checked)."""
+        self.conn.rollback()
+
+    def size(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def _oversized(self, key: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM keys WHERE key = ? LIMIT 1 OFFSET ?",
+                                 (key, MAX_BUCKET)).fetchone() is not None
+
+    def candidate_ids(self, keys: list) -> list:
+        """Up to MAX_CANDIDATES record ids sharing ``keys``, exact keys first."""
+        ids = {}
+        for tier in KEY_TIERS:
+            tier_keys = [k for k in keys if k.split(":", 1)[0] == tier]
+            if tier in ("host", "plsh", "clsh"):
+                tier_keys = [k for k in tier_keys if not self._oversized(k)]
+            if not tier_keys or len(ids) >= MAX_CANDIDATES:
+                continue
+            for (rid,) in self.conn.execute(
+                f"SELECT DISTINCT id FROM keys WHERE key IN ({', '.join('?' for _ in tier_keys)}) "
+                f"LIMIT {MAX_CANDIDATES}", tier_keys
+            ):
+                if len(ids) >= MAX_CANDIDATES:
+                    break
+                ids.setdefault(rid, None)
+        return list(ids)
+
+    def match(self, record: dict, limit: int = 5, min_score: float = 0.0) -> list:
+        """Best candidates for ``record`` (logical field names), highest score first."""
+        feat = features(record)
+        keys = match_keys(feat)
+        if not keys:
+            return []
+        ids = self.candidate_ids(keys)
+        if not ids:
+            return []
+        matches = []
+        rows = self.conn.execute(
+            f"SELECT id, object, email, person, company, hosts FROM records WHERE id IN ({', '.join('?' for _ in ids)})",
+            ids,
+        )
+        for rid, obj, email, person, company, hosts in rows:
+            candidate = {"email": email, "person": person, "company": company, "hosts": hosts.split()}
+            s, reasons = score(feat, candidate)
+            if s > min_score:
+                matches.append({"id": rid, "object": obj, "score": s, "reasons": reasons})
+        matches.sort(key=lambda m: -m["score"])
+        return matches[:limit]
+
+    def probable(self, record: dict, threshold: float = PROBABLE_SCORE, limit: int = 5) -> list:
+        return [m for m in self.match(record, limit) if m["score"] >= threshold]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+LEAD_SOQL = ("SELECT Id, Email, FirstName, LastName, Company, Website FROM Lead "
+             "WHERE IsConverted = false")
+ACCOUNT_SOQL = "SELECT Id, Name, Website FROM Account"
+
+
+def lead_record(row: dict) -> dict:
+    return {"email": row.get("Email"), "first_name": row.get("FirstName"), "last_name": row.get("LastName"),
+            "company": row.get("Company"), "website": row.get("Website")}
+
+
+def account_record(row: dict) -> dict:
+    return {"company": row.get("Name"), "website": row.get("Website")}
+
+
+def _mirror_rows(conn: sqlite3.Connection, table: str, fields: list, where: str = "") -> list:
+    """Rows of a mirror table, reading only the wanted columns it actually has (the rest come back None)."""
+    from sf_sync import query_local
+
+    columns = {row["name"] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    if "Id" not in columns:
+        raise RuntimeError(f"Mirror has no {table} table; run sf_sync.py first or use --from-api")
+    present = [f for f in fields if f in columns]
+    sql = f'SELECT {", ".join(present)} FROM "{table}"'
+    if where and "IsConverted" in columns:
+        sql += f" WHERE {where}"
+    return query_local(conn, sql)
+
+
+def extract_from_mirror() -> tuple:
+    from sf_sync import connect, mirror_path
+
+    conn = connect(mirror_path())
+    try:
+        leads = _mirror_rows(conn, "Lead", ["Id", "Email", "FirstName", "LastName", "Company", "Website"],
+                             "IsConverted IS NULL OR IsConverted = 0")
+        accounts = _mirror_rows(conn, "Account", ["Id", "Name", "Website"])
+    finally:
+        conn.close()
+    return leads, accounts
+
+
+def extract_from_api() -> tuple:
+    from sf_client import get_client
+    from sf_query import query_records
+
+    client = get_client()
+    return list(query_records(client, LEAD_SOQL)), list(query_records(client, ACCOUNT_SOQL))
+
+
+def build(path: Path, leads: list, accounts: list) -> int:
+    """Write a fresh index to ``path`` (atomically replacing any previous one)."""
+    tmp = path.with_name(path.name + ".building")
+    if tmp.exists():
+        tmp.unlink()
+    index = DedupeIndex(tmp)
+    index.load([(row["Id"], "Lead", lead_record(row)) for row in leads]
+               + [(row["Id"], "Account", account_record(row)) for row in accounts])
+    count = index.size()
+    index.close()
+    os.replace(tmp, path)
+    return count
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Local fuzzy duplicate index for Leads and Accounts.")
+    p.add_argument("--index", help="Index path (default: SF_DEDUPE_INDEX or per-org file under SF_CACHE_DIR)")
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("build", help="Build the index from the sf_sync mirror (or --from-api)")
+    b.add_argument("--from-api", action="store_true", help="Extract Leads and Accounts with SOQL instead of the mirror")
+
+    m = sub.add_parser("match", help="Probable existing records for one prospective lead")
+    m.add_argument("--email")
+    m.add_argument("--first")
+    m.add_argument("--last")
+    m.add_argument("--company")
+    m.add_argument("--website")
+    m.add_argument("--limit", type=int, default=5)
+
+    s = sub.add_parser("scan", help="Check an import file (CSV/JSONL with logical field names)")
+    s.add_argument("--input", required=True)
+    s.add_argument("--threshold", type=float, default=PROBABLE_SCORE, help="Minimum score to report")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
+
+    path = Path(args.index) if args.index else index_path()
+
+    if args.command == "build":
+        try:
+            leads, accounts = extract_from_api() if args.from_api else extract_from_mirror()
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        start = time.perf_counter()
+        count = build(path, leads, accounts)
+        print(json.dumps({"index": str(path), "records": count, "leads": len(leads), "accounts": len(accounts),
+                          "seconds": round(time.perf_counter() - start, 2)}))
+        return
+
+    if not path.exists():
+        print(f"Error: no dedupe index at {path}; run 'sf_dedupe_index.py build' first", file=sys.stderr)
+        sys.exit(2)
+    try:
+        index = DedupeIndex(path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.command == "match":
+        record = {"email": args.email, "first_name": args.first, "last_name": args.last,
+                  "company": args.company, "website": args.website}
+        print(json.dumps(index.match(record, args.limit), indent=2))
+        return
+
+    from sf_batch import read_rows
+
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    start, flagged = time.perf_counter(), 0
+    for i, row in enumerate(rows):
+        matches = index.probable(row, args.threshold)
+        if matches:
+            flagged += 1
+            print(json.dumps({"row": i + 1, "matches": matches}))
+        index.add(f"row:{i + 1}", "input", row)  # later rows also match this one
+    index.discard()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"summary": {"rows": len(rows), "flagged": flagged,
+                                  "ms_per_row": round(1000 * elapsed / max(1, len(rows)), 3)}}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_dedupe_index", main)
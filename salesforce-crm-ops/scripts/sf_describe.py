@@ -2,53 +2,134 @@
 """
 Salesforce schema discovery script.
 Describes objects to reveal fields, required fields, and picklist values.
+Describes are cached on disk per org and revalidated with If-Modified-Since,
+and several objects are fetched concurrently.
 
 Usage:
     python3 sf_describe.py Lead
     python3 sf_describe.py Lead Account Opportunity
     python3 sf_describe.py Lead --output schema.json
+
+    # Same objects in every org profile at once, to compare fields and picklists (see sf_orgs.py)
+    python3 sf_describe.py Opportunity Lead --orgs all --json
+
+    # Skip revalidation for describes fetched in the last hour
+    python3 sf_describe.py Lead Account Opportunity Task Event --max-age 3600
+
+Library use (from another script in this directory):
+    from sf_describe import DescribeCache
+
+    cache = DescribeCache(client)
+    lead = cache.get("Lead")
+    described, errors = cache.get_many(["Lead", "Opportunity"])
 """
 
-import os
 import sys
 import json
+import time
 import argparse
-import requests
+from functools import partial
 
-def get_env_or_exit(name: str) -> str:
-    val = os.environ.get(name)
-    if not val:
-        print(f"Error: {name} environment variable not set", file=sys.stderr)
-        sys.exit(1)
-    return val
+from sf_cache import cache_dir, cache_key, read_json, write_json
+from sf_client import SalesforceClient, get_client
 
-def get_access_token() -> str:
-    """Get access token from env or request new one."""
-    token = os.environ.get("SF_ACCESS_TOKEN")
-    if token:
-        return token
-    
-    base_url = get_env_or_exit("SF_BASE_URL")
-    client_id = get_env_or_exit("SF_CLIENT_ID")
-    client_secret = get_env_or_exit("SF_CLIENT_SECRET")
-    
-    token_url = f"{base_url}/services/oauth2/token"
-    resp = requests.post(token_url, data={
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret,
-    })
-    resp.raise_for_status()
-    return resp.json()["access_token"]
+DEFAULT_WORKERS = 8
 
-def describe_object(base_url: str, token: str, object_name: str, api_version: str) -> dict:
+# Parsed cache entries by path, reused while the file's mtime is unchanged
+# (keeps describes warm across calls in a long-lived process such as sfopsd).
+_entries = {}
+
+def _read_entry(path):
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    hit = _entries.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    entry = read_json(path)
+    if entry:
+        _entries[path] = (mtime, entry)
+    return entry
+
+def _write_entry(path, entry: dict):
+    write_json(path, entry)
+    _entries[path] = (path.stat().st_mtime_ns, entry)
+
+def describe_object(client: SalesforceClient, object_name: str) -> dict:
     """Describe a Salesforce object."""
-    url = f"{base_url}/services/data/{api_version}/sobjects/{object_name}/describe"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
+    resp = client.get(f"sobjects/{object_name}/describe")
     resp.raise_for_status()
     return resp.json()
 
+class DescribeCache:
+    """On-disk describe cache for one org, revalidated with If-Modified-Since.
+
+    ``max_age`` (seconds) serves entries younger than that without any request;
+    ``offline=True`` never touches the network and only returns cached describes;
+    ``refresh=True`` ignores cached entries and downloads full describes.
+    """
+
+    def __init__(self, client: SalesforceClient = None, max_age: float = 0, offline: bool = False,
+                 refresh: bool = False, base_url: str = None, api_version: str = None):
+        self.client = client
+        self.max_age = max_age
+        self.offline = offline
+        self.refresh = refresh
+        base_url = base_url or client.base_url
+        api_version = api_version or client.api_version
+        self.dir = cache_dir("describe", cache_key(base_url, api_version))
+
+    def path(self, object_name: str):
+        return self.dir / f"{object_name}.json"
+
+    def cached(self, object_name: str):
+        """Return the cached describe without revalidating, or None."""
+        entry = _read_entry(self.path(object_name))
+        return entry["describe"] if entry else None
+
+    def get(self, object_name: str) -> dict:
+        """Return the describe for one object, downloading it only if it changed."""
+        path = self.path(object_name)
+        entry = None if self.refresh else _read_entry(path)
+        if entry and (self.offline or time.time() - entry.get("fetched_at", 0) < self.max_age):
+            return entry["describe"]
+        if self.offline:
+            raise KeyError(f"No cached describe for {object_name}; run sf_describe.py {object_name} first")
+
+        headers = {}
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        resp = self.client.get(f"sobjects/{object_name}/describe", headers=headers)
+        if resp.status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+            _write_entry(path, entry)
+            return entry["describe"]
+        resp.raise_for_status()
+        describe = resp.json()
+        _write_entry(path, {
+            "last_modified": resp.headers.get("Last-Modified") or resp.headers.get("Date"),
+            "fetched_at": time.time(),
+            "describe": describe,
+        })
+        return describe
+
+    def get_many(self, object_names: list, max_workers: int = DEFAULT_WORKERS) -> tuple:
+        """Describe several objects concurrently.
+
+        Returns ({name: describe}, {name: error message}), both in input order.
+        """
+        from sf_async import run_all
+
+        calls = [partial(self.get, name) for name in object_names]
+        described, errors = {}, {}
+        for name, outcome in zip(object_names, run_all(calls, max_workers)):
+            if outcome["ok"]:
+                described[name] = outcome["result"]
+            else:
+                errors[name] = outcome["error"]
+        return described, errors
+
 def format_field_info(field: dict) -> dict:
     """Extract relevant field information."""
     info = {
@@ -111,38 +192,68 @@ def print_object_summary(description: dict):
         req = "*" if not f["nillable"] and not f["defaultedOnCreate"] else " "
         print(f"  {req} {f['name']:40} {f['type']:15} {f['label']}")
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(description="Describe Salesforce objects")
     parser.add_argument("objects", nargs="+", help="Object names to describe (e.g., Lead Account)")
     parser.add_argument("--output", "-o", help="Output file for JSON (optional)")
     parser.add_argument("--json", action="store_true", help="Output as JSON only")
-    args = parser.parse_args()
-    
-    base_url = get_env_or_exit("SF_BASE_URL")
-    api_version = os.environ.get("SF_API_VERSION", "v59.0")
-    token = get_access_token()
+    parser.add_argument("--max-age", type=float, default=0,
+                        help="Serve cached describes younger than this many seconds without revalidating")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached describes and download them in full")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent describe requests")
+    parser.add_argument("--orgs", help="Describe in these org profiles at once (comma-separated names from "
+                        "config/orgs.yaml, or all); results are keyed by org")
+    parser.add_argument("--config", default="./config", help="Path to config directory (for orgs.yaml)")
+    parser.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = parser.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
     
+    if args.orgs:
+        from sf_orgs import describe_orgs, load_orgs, org_clients
+
+        clients = org_clients(load_orgs(args.config), args.orgs)
+        by_org, org_errors = describe_orgs(clients, args.objects, args.max_age, args.refresh, args.workers)
+    else:
+        cache = DescribeCache(get_client(), max_age=args.max_age, refresh=args.refresh)
+        described, errors = cache.get_many(args.objects, args.workers)
+        by_org, org_errors = {None: described}, {None: errors}
+
     results = {}
-    for obj_name in args.objects:
-        try:
-            desc = describe_object(base_url, token, obj_name, api_version)
-            results[obj_name] = {
+    for org, described in by_org.items():
+        errors = org_errors.get(org, {})
+        org_results = results.setdefault(org, {})
+        for obj_name in args.objects:
+            if obj_name in errors:
+                print(f"Error describing {obj_name}" + (f" in {org}" if org else "") + f": {errors[obj_name]}",
+                      file=sys.stderr)
+                continue
+            desc = described[obj_name]
+            org_results[obj_name] = {
                 "name": desc["name"],
                 "label": desc["label"],
                 "fields": [format_field_info(f) for f in desc["fields"]],
             }
             if not args.json:
+                if org:
+                    print(f"\n[{org}]", end="")
                 print_object_summary(desc)
-        except requests.HTTPError as e:
-            print(f"Error describing {obj_name}: {e}", file=sys.stderr)
-    
+    # Single org: {object: schema}; with --orgs: {org: {object: schema}}
+    results = results if args.orgs else results[None]
+
     if args.output:
         with open(args.output, "w") as f:
             json.dump(results, f, indent=2)
         print(f"\nSchema saved to {args.output}")
-    
+
     if args.json:
         print(json.dumps(results, indent=2))
+    if args.orgs and org_errors:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_describe", main)
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Local write-ahead journal for the scripts' writes.
+Every create/update/upsert is recorded under an idempotency key (a hash of
+object, operation and field values) before it is sent, and its outcome is
+recorded when the answer comes back. That makes reruns safe:
+
+    done       sent and confirmed
+    failed     Salesforce rejected it (4xx); a rerun sends it again
+    pending    sent, but no usable answer arrived (timeout, 408/5xx, dropped
+               connection, crash)
+
+A pending create may or may not exist. Before it is retried, it is
+reconciled with a lookup: records of that object created since the write
+was sent, matching its identifying fields. A match is adopted as the
+result ("reconciled"). Otherwise the create is sent again. Pending updates
+and upserts are idempotent and are simply sent again.
+
+A rerun of an interrupted run (some of its writes still pending), or any
+run started with --resume, also skips the creates that run already made
+("already_done"), so a batch that died 3,000 rows in resumes where it
+stopped. Repeating writes that all completed is treated as deliberate:
+they are sent again, like done updates and upserts always are.
+
+The journal is SQLite, per org, at SF_JOURNAL_DB or under SF_CACHE_DIR.
+Scripts take --no-journal (or SF_JOURNAL=0) to bypass it.
+
+Usage:
+    python3 sf_journal.py status                  # counts per state, oldest pending write
+    python3 sf_journal.py list --state pending
+    python3 sf_journal.py reconcile               # look up every pending create now
+    python3 sf_journal.py prune --days 7          # drop settled entries older than 7 days
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import threading
+from pathlib import Path
+
+from sf_cache import cache_key, cache_path
+
+DEFAULT_TTL = 86400
+# HTTP status in the scripts' "... failed (503): ..." error messages
+_STATUS = re.compile(r"failed \((\d{3})\)")
+# Records created this long before a pending create was sent still count as its result (clock skew).
+RECONCILE_SKEW = 300
+
+# Fields that identify a record well enough to recognise a create that was sent twice.
+MATCH_FIELDS = {
+    "Lead": ["Email", "LastName", "Company"],
+    "Contact": ["Email", "LastName", "AccountId"],
+    "Account": ["Name", "Website"],
+    "Opportunity": ["Name", "CloseDate", "AccountId"],
+    "Task": ["Subject", "ActivityDate", "WhatId", "WhoId"],
+    "Event": ["Subject", "StartDateTime", "WhatId", "WhoId"],
+}
+
+DDL = """
+CREATE TABLE IF NOT EXISTS writes (
+    key TEXT PRIMARY KEY,
+    script TEXT,
+    sobject TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    state TEXT NOT NULL,
+    record_id TEXT,
+    error TEXT,
+    sent_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS writes_state ON writes (state, updated_at);
+"""
+
+
+def journal_path() -> Path:
+    if os.getenv("SF_JOURNAL_DB"):
+        return Path(os.environ["SF_JOURNAL_DB"])
+    from sf_client import base_url
+
+    return cache_path("journal", cache_key(base_url()) + ".sqlite")
+
+
+def outcome_unknown(error: str) -> bool:
+    """True for an error whose write may still have been applied (408 or 5xx answer)."""
+    from sf_retry import outcome_unknown as unknown_status
+
+    m = _STATUS.search(error or "")
+    return bool(m) and unknown_status(int(m.group(1)))
+
+
+def journal_ttl() -> float:
+    return float(os.getenv("SF_JOURNAL_TTL", DEFAULT_TTL))
+
+
+def write_key(sobject: str, operation: str, payload) -> str:
+    """Idempotency key for one intended write: same object, operation and values, same key."""
+    canonical = json.dumps([sobject, operation, payload], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def entry(sobject: str, operation: str, payload, match: dict = None) -> dict:
+    """A journal entry for ``payload``; ``match`` are the fields a pending create is reconciled on."""
+    return {"key": write_key(sobject, operation, payload), "sobject": sobject, "operation": operation,
+            "fields": payload if match is None else match}
+
+
+def _same(expected, actual) -> bool:
+    expected, actual = str(expected).lower(), str(actual or "").lower()
+    if len(expected) in (15, 18) and len(actual) in (15, 18) and expected.isalnum():
+        return expected[:15] == actual[:15]  # 15- and 18-char forms of one ID
+    return expected == actual
+
+
+class Journal:
+    """One SQLite journal; safe to use from the worker threads of a concurrent batch."""
+
+    def __init__(self, path: Path, ttl: float = None, script: str = None, resume: bool = False):
+        self.path = Path(path)
+        self.resume = resume
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = journal_ttl() if ttl is None else ttl
+        self.script = script or os.path.basename(sys.argv[0] or "")
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(DDL)
+
+    def prior(self, keys: list) -> dict:
+        """Journal rows for ``keys`` that still matter: done within the TTL, or pending."""
+        found, cutoff = {}, time.time() - self.ttl
+        keys = list(dict.fromkeys(keys))
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                sql = f"SELECT * FROM writes WHERE key IN ({','.join('?' * len(chunk))})"
+                for row in self.conn.execute(sql, chunk):
+                    if row["state"] == "pending" or (row["state"] == "done" and row["updated_at"] >= cutoff):
+                        found[row["key"]] = dict(row)
+        return found
+
+    def begin(self, entries: list) -> None:
+        """Record ``entries`` as pending in one transaction, before any of them is sent."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO writes (key, script, sobject, operation, fields, state, sent_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?) ON CONFLICT(key) DO UPDATE SET state = 'pending', "
+                "script = excluded.script, record_id = NULL, error = NULL, sent_at = excluded.sent_at, "
+                "updated_at = excluded.updated_at",
+                [(e["key"], self.script, e["sobject"], e["operation"], json.dumps(e["fields"], default=str), now, now)
+                 for e in entries])
+
+    def done(self, key: str, record_id: str = None) -> None:
+        self.settle([(key, record_id, None)])
+
+    def failed(self, key: str, error: str) -> None:
+        self.settle([(key, None, error)])
+
+    def settle(self, outcomes: list) -> None:
+        """Record (key, record id, error) outcomes; an error marks the write failed, else done."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE writes SET state = ?, record_id = ?, error = ?, updated_at = ? WHERE key = ?",
+                [("failed" if error else "done", record_id, error, now, key) for key, record_id, error in outcomes])
+
+    def settle_results(self, items: list) -> None:
+        """Record batch results, given as (entry key, result dict with ``id`` or ``error``) pairs.
+
+        Input rows repeating a write share its key; the key is done if any of them succeeded.
+        Rows whose outcome is unknown (their chunk got a 408/5xx answer) stay pending.
+        """
+        outcomes = {}
+        for key, res in items:
+            if outcome_unknown(res.get("error")):
+                continue
+            if outcomes.get(key, (None, "unset"))[1] is not None:
+                outcomes[key] = (res.get("id"), res.get("error"))
+        self.settle([(key, record_id, error) for key, (record_id, error) in outcomes.items()])
+
+    def call(self, key: str, send, result_id=None):
+        """Run ``send()`` for a begun write and record its outcome.
+
+        Salesforce's own rejections (RuntimeError with a 4xx status) mark the write
+        failed. A 408/5xx answer or any other exception leaves it pending, to be
+        reconciled on the next run.
+        """
+        try:
+            result = send()
+        except RuntimeError as e:
+            if outcome_unknown(str(e)):
+                raise RuntimeError(f"{e} (outcome unknown; rerun to reconcile from the journal)") from e
+            self.failed(key, str(e))
+            raise
+        except Exception as e:
+            raise RuntimeError(f"{e} (outcome unknown; rerun to reconcile from the journal)") from e
+        self.done(key, result_id(result) if result_id else result)
+        return result
+
+    def resolve(self, client, entries: list) -> dict:
+        """Outcomes for entries the journal already settles, keyed by entry key.
+
+        Pending creates are looked up and come back as ``reconciled`` when found.
+        Done creates come back as ``already_done`` only when resuming: with
+        ``resume``, or when some of ``entries`` are still pending from an
+        interrupted run. Everything not returned must be sent (after ``begin``).
+        """
+        prior = self.prior([e["key"] for e in entries])
+        resuming = self.resume or any(row["state"] == "pending" for row in prior.values())
+        outcomes, pending_creates = {}, []
+        for e in entries:
+            row = prior.get(e["key"])
+            if row is None or e["key"] in outcomes or e["operation"] not in ("create", "composite"):
+                continue
+            if row["state"] == "done" and resuming:
+                outcomes[e["key"]] = {"action": "already_done", "id": row["record_id"]}
+            elif row["state"] == "pending":
+                pending_creates.append(dict(e, sent_at=row["sent_at"]))
+        if pending_creates:
+            found = reconcile_creates(client, pending_creates)
+            self.settle([(key, record_id, None) for key, record_id in found.items()])
+            for key, record_id in found.items():
+                outcomes[key] = {"action": "reconciled", "id": record_id}
+        return outcomes
+
+    def pending(self) -> list:
+        with self.lock:
+            return [dict(r) for r in self.conn.execute("SELECT * FROM writes WHERE state = 'pending' ORDER BY sent_at")]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def reconcile_creates(client, entries: list) -> dict:
+    """Find records created by pending creates. Returns {entry key: record id} for those found.
+
+    Per object, one chunked ``IN`` query on the first identifying field, limited
+    to records created since the earliest send; the other identifying fields
+    are compared locally. Each found record is claimed by one entry only.
+    """
+    from sf_soql import format_soql, query_in
+
+    found, claimed = {}, set()
+    by_object = {}
+    for e in entries:
+        by_object.setdefault(e["sobject"], []).append(e)
+    for sobject, items in by_object.items():
+        fields = MATCH_FIELDS.get(sobject, ["Name"])
+        usable = [f for f in fields if any(_matchable(e["fields"].get(f)) for e in items)]
+        if not usable:
+            continue
+        lead_field = usable[0]
+        since = min(e["sent_at"] or time.time() for e in items) - RECONCILE_SKEW
+        stamp = datetime.datetime.fromtimestamp(since, datetime.timezone.utc)
+        values = [e["fields"][lead_field] for e in items if _matchable(e["fields"].get(lead_field))]
+        prefix = format_soql("SELECT Id, CreatedDate, {:field} FROM {:field} WHERE CreatedDate >= {} AND {:field}",
+                             usable, sobject, stamp, lead_field)
+        candidates = list(query_in(client, prefix, list(dict.fromkeys(values)), "ORDER BY CreatedDate ASC"))
+        for e in items:
+            wanted = {f: e["fields"][f] for f in usable if _matchable(e["fields"].get(f))}
+            if lead_field not in wanted:
+                continue
+            for rec in candidates:
+                if rec["Id"] not in claimed and all(_same(v, rec.get(f)) for f, v in wanted.items()):
+                    claimed.add(rec["Id"])
+                    found[e["key"]] = rec["Id"]
+                    break
+    return found
+
+
+def _matchable(value) -> bool:
+    """Usable as a lookup value (composite references like ``@{account.id}`` are not)."""
+    return value not in (None, "") and not str(value).startswith("@{")
+
+
+def journaled(journal, e: dict, send, result_id=None):
+    """Send one write through ``journal`` (begin, send, record), or directly when it is None."""
+    if journal is None:
+        return send()
+    journal.begin([e])
+    return journal.call(e["key"], send, result_id)
+
+
+def open_journal(args=None):
+    """The journal for a write run, or None with --no-journal / SF_JOURNAL=0."""
+    if os.getenv("SF_JOURNAL") == "0" or getattr(args, "no_journal", False):
+        return None
+    return Journal(journal_path(), resume=getattr(args, "resume", False))
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Inspect and maintain the local write journal.")
+    p.add_argument("--db", help="Journal path (default: SF_JOURNAL_DB or the per-org journal under SF_CACHE_DIR)")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Counts per state")
+    ls = sub.add_parser("list", help="List journal entries")
+    ls.add_argument("--state", choices=["pending", "done", "failed"], help="Only entries in this state")
+    ls.add_argument("--limit", type=int, default=50)
+    sub.add_parser("reconcile", help="Look up every pending create now; unmatched ones are marked failed")
+    pr = sub.add_parser("prune", help="Delete done/failed entries older than --days")
+    pr.add_argument("--days", type=float, default=7)
+    args = p.parse_args(argv)
+
+    path = Path(args.db) if args.db else journal_path()
+    if args.command != "reconcile" and not path.exists():
+        print(f"No journal at {path}")
+        return
+    journal = Journal(path)
+
+    if args.command == "status":
+        counts = {r[0]: r[1] for r in journal.conn.execute("SELECT state, COUNT(*) FROM writes GROUP BY state")}
+        pending = journal.pending()
+        oldest = None
+        if pending:
+            oldest = datetime.datetime.fromtimestamp(pending[0]["sent_at"]).isoformat(timespec="seconds")
+        print(json.dumps({"path": str(path), "counts": counts, "oldest_pending": oldest}, indent=2))
+    elif args.command == "list":
+        sql, params = "SELECT * FROM writes", []
+        if args.state:
+            sql, params = sql + " WHERE state = ?", [args.state]
+        for row in journal.conn.execute(sql + " ORDER BY updated_at DESC LIMIT ?", params + [args.limit]):
+            print(json.dumps({**dict(row), "fields": json.loads(row["fields"])}))
+    elif args.command == "reconcile":
+        from sf_client import get_client
+
+        pending = [dict(e, fields=json.loads(e["fields"])) for e in journal.pending()]
+        creates = [e for e in pending if e["operation"] in ("create", "composite")]
+        found = reconcile_creates(get_client(), creates) if creates else {}
+        journal.settle([(e["key"], found.get(e["key"]),
+                         None if e["key"] in found else "not found by reconcile; a rerun sends it again")
+                        for e in creates])
+        print(json.dumps({"pending_creates": len(creates), "reconciled": len(found),
+                          "not_found": len(creates) - len(found),
+                          "pending_updates": len(pending) - len(creates)}, indent=2))
+    elif args.command == "prune":
+        cutoff = time.time() - args.days * 86400
+        with journal.conn:
+            n = journal.conn.execute("DELETE FROM writes WHERE state != 'pending' AND updated_at < ?",
+                                     (cutoff,)).rowcount
+        print(json.dumps({"deleted": n}))
+    journal.close()
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_journal", main)
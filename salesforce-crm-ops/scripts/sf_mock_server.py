@@ -0,0 +1,861 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Salesforce REST API, for benchmarks and end-to-end runs.
+Keeps an in-memory org (Leads, Accounts, Contacts, Opportunities, Tasks,
+Events) and serves the endpoints the scripts use: SOQL query/queryAll with
+nextRecordsUrl paging, sObject create/read/update/delete, external-ID upsert,
+sObject Collections, Composite (allOrNone, @{ref.id} references), describe
+(with If-Modified-Since), getDeleted, limits and oauth2/token. Latency and
+transient 503 errors can be injected, and every request is counted per route.
+
+SOQL support covers what the scripts send: SELECT fields (including one
+level of parent relationships such as Account.Name) or COUNT(), FROM one
+object, WHERE conditions joined by AND (=, !=, <, >, <=, >=, LIKE, IN,
+NOT IN), ORDER BY and LIMIT. Like Salesforce, request URLs longer than
+16K characters are refused with 414. Bulk API 2.0 is not emulated.
+
+Usage:
+    # Serve an org seeded with 5000 leads; prints the env vars to point the scripts at it
+    python3 sf_mock_server.py --port 8765 --leads 5000 --accounts 500 --opportunities 1000
+
+    # 25 ms +/- 10 ms per request, 2% of requests answered 503
+    python3 sf_mock_server.py --latency-ms 25 --jitter-ms 10 --error-rate 0.02
+
+    # Request counts since start (or the last reset)
+    curl -s localhost:8765/__mock__/stats
+    curl -s -X POST localhost:8765/__mock__/reset
+
+Library use (from another script in this directory):
+    from sf_mock_server import MockSalesforce
+
+    with MockSalesforce(latency_ms=20) as mock:
+        mock.org.seed(leads=1000)
+        env = mock.env()           # SF_BASE_URL, SF_ACCESS_TOKEN
+        ...
+        print(mock.stats())
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from sf_validate import id_checksum
+
+DEFAULT_PORT = 8765
+DEFAULT_TOKEN = "mock-token"
+DEFAULT_PAGE_SIZE = 2000
+API_ALLOCATION = 100000
+MAX_URL_CHARS = 16384
+
+# Field flags: r = required on create, ro = read-only, d = defaulted on create, x = external ID
+_SYSTEM_FIELDS = [
+    ("Id", "id", 18, "ro"), ("OwnerId", "reference", 18, "d"), ("IsDeleted", "boolean", None, "ro"),
+    ("CreatedDate", "datetime", None, "ro"), ("LastModifiedDate", "datetime", None, "ro"),
+    ("SystemModstamp", "datetime", None, "ro"),
+]
+SCHEMA = {
+    "Lead": ("00Q", [
+        ("FirstName", "string", 40, ""), ("LastName", "string", 80, "r"), ("Company", "string", 255, "r"),
+        ("Email", "email", 80, ""), ("Title", "string", 128, ""), ("Website", "url", 255, ""),
+        ("Phone", "phone", 40, ""), ("Status", "picklist", 255, "d"), ("LeadSource", "picklist", 255, ""),
+        ("Description", "textarea", 32000, ""), ("IsConverted", "boolean", None, "ro"),
+        ("ConvertedAccountId", "reference", 18, "ro"), ("ConvertedOpportunityId", "reference", 18, "ro"),
+        ("Thesis_Tag__c", "string", 255, ""), ("Signal_Score__c", "double", None, ""),
+        ("Must_Be_True__c", "textarea", 1000, ""), ("Pass_Reason__c", "string", 255, ""),
+        ("Recheck_Date__c", "date", None, ""), ("External_ID__c", "string", 64, "x"),
+    ]),
+    "Account": ("001", [
+        ("Name", "string", 255, "r"), ("Website", "url", 255, ""), ("Type", "picklist", 255, ""),
+        ("Industry", "picklist", 255, ""), ("Description", "textarea", 32000, ""),
+        ("Thesis_Tag__c", "string", 255, ""), ("External_ID__c", "string", 64, "x"),
+    ]),
+    "Contact": ("003", [
+        ("FirstName", "string", 40, ""), ("LastName", "string", 80, "r"), ("Email", "email", 80, ""),
+        ("Title", "string", 128, ""), ("AccountId", "reference", 18, ""),
+    ]),
+    "Opportunity": ("006", [
+        ("Name", "string", 120, "r"), ("AccountId", "reference", 18, ""), ("StageName", "picklist", 255, "r"),
+        ("CloseDate", "date", None, "r"), ("Amount", "currency", None, ""), ("Probability", "percent", None, ""),
+        ("NextStep", "string", 255, ""), ("Description", "textarea", 32000, ""),
+        ("IsClosed", "boolean", None, "ro"), ("IsWon", "boolean", None, "ro"),
+        ("Thesis_Tag__c", "string", 255, ""), ("Pass_Reason__c", "string", 255, ""),
+        ("What_Would_Change__c", "textarea", 1000, ""), ("Recheck_Date__c", "date", None, ""),
+    ]),
+    "Task": ("00T", [
+        ("Subject", "combobox", 255, ""), ("ActivityDate", "date", None, ""), ("Status", "picklist", 255, "d"),
+        ("Priority", "picklist", 255, "d"), ("WhatId", "reference", 18, ""), ("WhoId", "reference", 18, ""),
+        ("Description", "textarea", 32000, ""), ("IsClosed", "boolean", None, "ro"),
+    ]),
+    "Event": ("00U", [
+        ("Subject", "combobox", 255, ""), ("StartDateTime", "datetime", None, "r"),
+        ("EndDateTime", "datetime", None, "r"), ("WhatId", "reference", 18, ""), ("WhoId", "reference", 18, ""),
+        ("Description", "textarea", 32000, ""),
+    ]),
+}
+PICKLISTS = {
+    ("Lead", "Status"): ["Open - Not Contacted", "Working - Contacted", "Qualified", "Meeting Scheduled",
+                         "Closed - Not Qualified", "Closed - Converted", "Closed - Not Converted"],
+    ("Lead", "LeadSource"): ["Web", "Referral", "Conference", "Inbound", "Outbound"],
+    ("Account", "Type"): ["Prospect", "Portfolio", "Partner", "Other"],
+    ("Account", "Industry"): ["Technology", "Finance", "Healthcare", "Other"],
+    ("Opportunity", "StageName"): ["Sourced", "First Meeting", "Second Meeting", "Diligence", "IC Scheduled",
+                                   "Term Sheet", "Legal/Docs", "Closed Won", "Passed", "Closed Lost"],
+    ("Task", "Status"): ["Not Started", "In Progress", "Completed", "Waiting on someone else", "Deferred"],
+    ("Task", "Priority"): ["High", "Normal", "Low"],
+}
+DEFAULTS = {("Lead", "Status"): "Open - Not Contacted", ("Lead", "IsConverted"): False,
+            ("Task", "Status"): "Not Started", ("Task", "Priority"): "Normal"}
+REFERENCES = {"OwnerId": ["User"], "AccountId": ["Account"], "ConvertedAccountId": ["Account"],
+              "ConvertedOpportunityId": ["Opportunity"], "WhatId": ["Account", "Opportunity"],
+              "WhoId": ["Lead", "Contact"]}
+CLOSED_STAGES = {"Closed Won", "Passed", "Closed Lost"}
+MOCK_USER_ID = "005000000000001AAA"
+
+_TOKEN_RE = re.compile(r"'(?:\\.|[^'\\])*'|<=|>=|!=|<>|[=<>(),]|[^\s=<>!(),]+")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.body = [{"errorCode": code, "message": message}]
+
+
+def sf_now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+0000"
+
+
+def _comparable(value):
+    """Normalize SOQL literals and stored values so datetimes, numbers and strings compare sensibly."""
+    if isinstance(value, str):
+        if len(value) >= 19 and value[4] == "-" and value[10] == "T":
+            return value[:19]
+        return value.lower()
+    return value
+
+
+def _literal(token: str):
+    if token.startswith("'"):
+        return re.sub(r"\\(.)", r"\1", token[1:-1])
+    lowered = token.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    try:
+        return float(token) if "." in token else int(token)
+    except ValueError:
+        return token  # date/datetime literal
+
+
+class Query:
+    """A parsed SOQL statement (the subset described in the module docstring)."""
+
+    def __init__(self, soql: str):
+        m = re.match(r"\s*SELECT\s+(.+?)\s+FROM\s+(\w+)(.*)$", soql, re.I | re.S)
+        if not m:
+            raise ApiError(400, "MALFORMED_QUERY", f"unsupported query: {soql[:200]}")
+        self.fields = [f.strip() for f in m.group(1).split(",")]
+        self.count = [f.upper() for f in self.fields] == ["COUNT()"]
+        self.object = m.group(2)
+        rest = m.group(3)
+        self.limit = None
+        lm = re.search(r"\s+LIMIT\s+(\d+)\s*$", rest, re.I)
+        if lm:
+            self.limit, rest = int(lm.group(1)), rest[:lm.start()]
+        self.order = []
+        om = re.search(r"\s+ORDER\s+BY\s+(.+)$", rest, re.I | re.S)
+        if om:
+            rest = rest[:om.start()]
+            for part in om.group(1).split(","):
+                words = part.split()
+                self.order.append((words[0], len(words) > 1 and words[1].upper() == "DESC"))
+        self.conditions = []
+        wm = re.match(r"\s+WHERE\s+(.+)$", rest, re.I | re.S)
+        if wm:
+            self.conditions = self._parse_where(wm.group(1))
+        elif rest.strip():
+            raise ApiError(400, "MALFORMED_QUERY", f"unsupported clause: {rest.strip()[:100]}")
+
+    @staticmethod
+    def _parse_where(where: str) -> list:
+        tokens = _TOKEN_RE.findall(where)
+        conditions, i = [], 0
+        while i < len(tokens):
+            field = tokens[i]
+            op = tokens[i + 1].upper() if i + 1 < len(tokens) else ""
+            if op == "NOT" and i + 2 < len(tokens) and tokens[i + 2].upper() == "IN":
+                op, i = "NOT IN", i + 1
+            if op in ("IN", "NOT IN"):
+                if tokens[i + 2] != "(":
+                    raise ApiError(400, "MALFORMED_QUERY", "expected ( after IN")
+                j, values = i + 3, []
+                while tokens[j] != ")":
+                    if tokens[j] != ",":
+                        values.append(_comparable(_literal(tokens[j])))
+                    j += 1
+                conditions.append((field, op, set(values)))
+                i = j + 1
+            elif op in ("=", "!=", "<>", "<", ">", "<=", ">=", "LIKE"):
+                conditions.append((field, op, _comparable(_literal(tokens[i + 2]))))
+                i += 3
+            else:
+                raise ApiError(400, "MALFORMED_QUERY", f"unsupported condition near '{' '.join(tokens[i:i + 3])}'")
+            if i < len(tokens):
+                if tokens[i].upper() != "AND":
+                    raise ApiError(400, "MALFORMED_QUERY", "only AND-joined conditions are supported by the mock")
+                i += 1
+        return conditions
+
+    def matches(self, record: dict) -> bool:
+        for field, op, value in self.conditions:
+            actual = _comparable(record.get(field))
+            if op == "IN" and actual not in value:
+                return False
+            if op == "NOT IN" and actual in value:
+                return False
+            if op == "=" and actual != value:
+                return False
+            if op in ("!=", "<>") and actual == value:
+                return False
+            if op == "LIKE":
+                pattern = "^" + re.escape(str(value)).replace("%", ".*").replace("_", ".") + "$"
+                if actual is None or not re.match(pattern, str(actual), re.I):
+                    return False
+            if op in ("<", ">", "<=", ">="):
+                if actual is None or value is None:
+                    return False
+                if not {"<": actual < value, ">": actual > value, "<=": actual <= value, ">=": actual >= value}[op]:
+                    return False
+        return True
+
+
+class MockOrg:
+    """In-memory org state. All methods are safe to call from several request threads."""
+
+    def __init__(self, page_size: int = DEFAULT_PAGE_SIZE):
+        self.lock = threading.RLock()
+        self.records = {name: {} for name in SCHEMA}
+        self.deleted = {name: [] for name in SCHEMA}
+        self.prefixes = {prefix: name for name, (prefix, _) in SCHEMA.items()}
+        self.fields = {name: {f[0]: f for f in _SYSTEM_FIELDS + fields} for name, (_, fields) in SCHEMA.items()}
+        self.counter = 0
+        self.cursors = {}
+        self.page_size = page_size
+        self.started = sf_now()
+        self.last_modified = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())
+
+    # -- records -------------------------------------------------------------
+
+    def new_id(self, sobject: str) -> str:
+        self.counter += 1
+        base = f"{SCHEMA[sobject][0]}{self.counter:012d}"
+        return base + id_checksum(base)
+
+    def _object(self, sobject: str) -> str:
+        for name in SCHEMA:
+            if name.lower() == sobject.lower():
+                return name
+        raise ApiError(404, "NOT_FOUND", f"The requested resource does not exist: {sobject}")
+
+    def _clean(self, sobject: str, fields: dict, create: bool) -> dict:
+        known = self.fields[sobject]
+        out = {}
+        for key, value in (fields or {}).items():
+            if key == "attributes":
+                continue
+            field = known.get(key) or next((f for name, f in known.items() if name.lower() == key.lower()), None)
+            if field is None:
+                raise ApiError(400, "INVALID_FIELD", f"No such column '{key}' on sobject of type {sobject}")
+            if "ro" in field[3]:
+                raise ApiError(400, "INVALID_FIELD_FOR_INSERT_UPDATE", f"Unable to create/update fields: {field[0]}")
+            if field[2] and isinstance(value, str) and len(value) > field[2]:
+                raise ApiError(400, "STRING_TOO_LONG", f"{field[0]}: data value too large (max length={field[2]})")
+            options = PICKLISTS.get((sobject, field[0]))
+            if options and value not in (None, "") and value not in options and (sobject, field[0]) in (
+                    ("Opportunity", "StageName"), ("Lead", "Status"), ("Task", "Status"), ("Task", "Priority")):
+                raise ApiError(400, "INVALID_OR_NULL_FOR_RESTRICTED_PICKLIST", f"{field[0]}: bad value for restricted picklist field: {value}")
+            out[field[0]] = value
+        if create:
+            missing = [name for name, f in known.items() if "r" in f[3].split(",") and out.get(name) in (None, "")]
+            if missing:
+                raise ApiError(400, "REQUIRED_FIELD_MISSING", f"Required fields are missing: {missing}")
+        return out
+
+    def _derive(self, sobject: str, record: dict) -> None:
+        if sobject == "Opportunity":
+            record["IsClosed"] = record.get("StageName") in CLOSED_STAGES
+            record["IsWon"] = record.get("StageName") == "Closed Won"
+        elif sobject == "Task":
+            record["IsClosed"] = record.get("Status") == "Completed"
+
+    def create(self, sobject: str, fields: dict, undo: list = None) -> str:
+        sobject = self._object(sobject)
+        with self.lock:
+            values = self._clean(sobject, fields, create=True)
+            now = sf_now()
+            record = {name: None for name in self.fields[sobject]}
+            record.update({k: v for (o, k), v in DEFAULTS.items() if o == sobject})
+            record.update(values)
+            record.update(Id=self.new_id(sobject), OwnerId=values.get("OwnerId") or MOCK_USER_ID, IsDeleted=False,
+                          CreatedDate=now, LastModifiedDate=now, SystemModstamp=now)
+            self._derive(sobject, record)
+            self.records[sobject][record["Id"]] = record
+            if undo is not None:
+                undo.append(lambda: self.records[sobject].pop(record["Id"], None))
+            return record["Id"]
+
+    def find(self, record_id: str):
+        with self.lock:
+            sobject = self.prefixes.get(str(record_id)[:3])
+            if not sobject:
+                return None, None
+            records = self.records[sobject]
+            record = records.get(record_id) or (records.get(record_id + id_checksum(record_id))
+                                                if len(record_id) == 15 else None)
+            return sobject, record
+
+    def update(self, sobject: str, record_id: str, fields: dict, undo: list = None) -> None:
+        sobject = self._object(sobject)
+        with self.lock:
+            found_object, record = self.find(record_id)
+            if record is None or found_object != sobject:
+                raise ApiError(404, "NOT_FOUND", f"Provided external ID field does not exist or is not accessible: {record_id}")
+            values = self._clean(sobject, {k: v for k, v in fields.items() if k != "Id"}, create=False)
+            if undo is not None:
+                before = dict(record)
+                undo.append(lambda: record.update(before))
+            record.update(values)
+            record["LastModifiedDate"] = record["SystemModstamp"] = sf_now()
+            self._derive(sobject, record)
+
+    def delete(self, record_id: str, undo: list = None) -> None:
+        with self.lock:
+            sobject, record = self.find(record_id)
+            if record is None:
+                raise ApiError(404, "ENTITY_IS_DELETED", f"entity is deleted: {record_id}")
+            del self.records[sobject][record["Id"]]
+            self.deleted[sobject].append((record["Id"], sf_now()))
+            if undo is not None:
+                undo.append(lambda: (self.records[sobject].__setitem__(record["Id"], record),
+                                     self.deleted[sobject].pop()))
+
+    def upsert(self, sobject: str, field: str, value: str, fields: dict, undo: list = None) -> tuple:
+        """(id, created) for an external-ID upsert; raises on ambiguous matches."""
+        sobject = self._object(sobject)
+        with self.lock:
+            if field != "Id" and "x" not in self.fields[sobject].get(field, ("", "", None, ""))[3]:
+                raise ApiError(400, "INVALID_FIELD", f"{field} is not an external ID field on {sobject}")
+            if field == "Id":
+                matches = [value] if self.find(value)[1] else []
+            else:
+                matches = [rid for rid, rec in self.records[sobject].items() if rec.get(field) == value]
+            if len(matches) > 1:
+                raise ApiError(300, "MULTIPLE_CHOICES", f"{len(matches)} records match {field} = {value}")
+            body = {k: v for k, v in fields.items() if k != field}
+            if matches:
+                self.update(sobject, matches[0], body, undo)
+                return matches[0], False
+            return self.create(sobject, {**body, field: value} if field != "Id" else body, undo), True
+
+    def seed(self, leads: int = 0, accounts: int = 0, opportunities: int = 0, tasks: int = 0, seed: int = 0) -> None:
+        """Add deterministic sample data (accounts first, so opportunities and tasks can point at them)."""
+        rng = random.Random(seed)
+        words = ["Nova", "Vector", "Signal", "Forge", "Quant", "Atlas", "Orbit", "Mesh", "Pixel", "Hyper", "Zen", "Core"]
+        firsts = ["Ada", "Alan", "Grace", "Linus", "Barbara", "Margaret", "Dennis", "Mary", "Sam", "Ana", "Raj"]
+        lasts = ["Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Hamilton", "Ritchie", "Patel", "Nguyen"]
+        with self.lock:
+            account_ids = list(self.records["Account"])
+            for i in range(accounts):
+                name = f"{rng.choice(words)} {rng.choice(words)} {i}"
+                account_ids.append(self.create("Account", {"Name": name, "Website": f"{name.lower().replace(' ', '')}.io"}))
+            for i in range(leads):
+                company = f"{rng.choice(words)}{rng.choice(words)} {i}"
+                first, last = rng.choice(firsts), rng.choice(lasts)
+                self.create("Lead", {"FirstName": first, "LastName": last, "Company": company,
+                                     "Email": f"{first}.{last}.{i}@{company.lower().replace(' ', '')}.com".lower(),
+                                     "Status": rng.choice(PICKLISTS[("Lead", "Status")][:4])})
+            opportunity_ids = list(self.records["Opportunity"])
+            for i in range(opportunities):
+                opportunity_ids.append(self.create("Opportunity", {
+                    "Name": f"Deal {i}", "StageName": rng.choice(PICKLISTS[("Opportunity", "StageName")][:6]),
+                    "CloseDate": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    "AccountId": rng.choice(account_ids) if account_ids else None,
+                    "Amount": rng.choice([250000, 500000, 1000000, 2000000]),
+                }))
+            for i in range(tasks):
+                self.create("Task", {
+                    "Subject": f"Follow up {i}", "ActivityDate": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    "WhatId": rng.choice(opportunity_ids) if opportunity_ids else None,
+                    "Status": rng.choice(["Not Started", "In Progress", "Completed"]),
+                })
+
+    # -- query ---------------------------------------------------------------
+
+    def _project(self, sobject: str, record: dict, fields: list) -> dict:
+        out = {"attributes": {"type": sobject, "url": f"/services/data/v59.0/sobjects/{sobject}/{record['Id']}"}}
+        for name in fields:
+            if "." in name:
+                relation, _, child = name.partition(".")
+                parent_object, parent = self.find(record.get(f"{relation}Id") or "")
+                out[relation] = None if parent is None else {"attributes": {"type": parent_object}, child: parent.get(child)}
+            else:
+                field = self.fields[sobject].get(name) or next(
+                    (f for n, f in self.fields[sobject].items() if n.lower() == name.lower()), None)
+                if field is None:
+                    raise ApiError(400, "INVALID_FIELD", f"No such column '{name}' on entity '{sobject}'")
+                out[field[0]] = record.get(field[0])
+        return out
+
+    def query(self, soql: str, include_deleted: bool = False, page_size: int = None, version: str = "v59.0") -> dict:
+        parsed = Query(soql)
+        sobject = self._object(parsed.object)
+        with self.lock:
+            rows = [r for r in self.records[sobject].values() if parsed.matches(r)]
+            if include_deleted:
+                rows += [dict(Id=rid, IsDeleted=True) for rid, _ in self.deleted[sobject]
+                         if parsed.matches(dict(Id=rid, IsDeleted=True))]
+        for field, descending in reversed(parsed.order):
+            rows.sort(key=lambda r: (r.get(field) is None, _comparable(r.get(field))), reverse=descending)
+        if parsed.limit is not None:
+            rows = rows[:parsed.limit]
+        if parsed.count:
+            return {"totalSize": len(rows), "done": True, "records": []}
+        records = [self._project(sobject, r, parsed.fields) for r in rows]
+        return self._page(records, 0, page_size or self.page_size, version)
+
+    def _page(self, records: list, offset: int, size: int, version: str, cursor: str = None) -> dict:
+        """One page; like Salesforce, every page of a query shares one cursor (``<cursor>-<offset>``)."""
+        page = records[offset:offset + size]
+        body = {"totalSize": len(records), "done": offset + size >= len(records), "records": page}
+        with self.lock:
+            if body["done"]:
+                self.cursors.pop(cursor, None)
+                return body
+            if cursor is None:
+                self.counter += 1
+                cursor = f"01g{self.counter:012d}"
+                self.cursors[cursor] = (records, size)
+        body["nextRecordsUrl"] = f"/services/data/{version}/query/{cursor}-{offset + size}"
+        return body
+
+    def next_page(self, locator: str, version: str) -> dict:
+        cursor, _, offset = locator.rpartition("-")
+        with self.lock:
+            entry = self.cursors.get(cursor)
+        if entry is None or not offset.isdigit():
+            raise ApiError(400, "INVALID_QUERY_LOCATOR", "invalid query locator")
+        return self._page(entry[0], int(offset), entry[1], version, cursor)
+
+    # -- describe / getDeleted -------------------------------------------------
+
+    def describe(self, sobject: str) -> dict:
+        sobject = self._object(sobject)
+        fields = []
+        for name, ftype, length, flags in self.fields[sobject].values():
+            flags = flags.split(",")
+            field = {
+                "name": name, "label": name.replace("__c", "").replace("_", " "), "type": ftype,
+                "length": length or 0, "nillable": "r" not in flags and name != "Id",
+                "defaultedOnCreate": "d" in flags or name == "Id", "createable": "ro" not in flags,
+                "updateable": "ro" not in flags, "externalId": "x" in flags, "restrictedPicklist": False,
+            }
+            if ftype == "currency":
+                field.update(precision=18, scale=2)
+            elif ftype in ("double", "percent"):
+                field.update(precision=3 if ftype == "percent" else 18, scale=0)
+            if (sobject, name) in PICKLISTS:
+                field["picklistValues"] = [{"value": v, "label": v, "active": True} for v in PICKLISTS[(sobject, name)]]
+            if ftype == "reference":
+                field["referenceTo"] = REFERENCES.get(name, [])
+            fields.append(field)
+        return {"name": sobject, "label": sobject, "keyPrefix": SCHEMA[sobject][0], "createable": True,
+                "updateable": True, "fields": fields}
+
+    def get_deleted(self, sobject: str, start: str, end: str) -> dict:
+        sobject = self._object(sobject)
+        lo, hi = _comparable(start), _comparable(end)
+        with self.lock:
+            found = [{"id": rid, "deletedDate": when} for rid, when in self.deleted[sobject]
+                     if lo <= _comparable(when) <= hi]
+        return {"deletedRecords": found, "earliestDateAvailable": self.started, "latestDateCovered": sf_now()}
+
+
+class Router:
+    """Maps REST calls onto a MockOrg. ``handle`` returns (status, body, extra headers)."""
+
+    def __init__(self, org: MockOrg):
+        self.org = org
+
+    def handle(self, method: str, path: str, query: dict, headers: dict, body):
+        m = re.match(r"/services/data/(v\d+\.\d+)/(.*)$", path)
+        if not m:
+            raise ApiError(404, "NOT_FOUND", f"The requested resource does not exist: {path}")
+        version, rest = m.group(1), m.group(2).rstrip("/")
+        parts = rest.split("/")
+        org = self.org
+
+        if parts[0] in ("query", "queryAll") and method == "GET":
+            if len(parts) > 1:
+                return 200, org.next_page(parts[1], version), {}
+            options = headers.get("Sforce-Query-Options", "")
+            size = re.search(r"batchSize=(\d+)", options)
+            page_size = max(200, min(2000, int(size.group(1)))) if size else None
+            return 200, org.query(query.get("q", ""), parts[0] == "queryAll", page_size, version), {}
+
+        if parts[0] == "composite" and len(parts) == 1 and method == "POST":
+            return 200, self.composite(body or {}), {}
+
+        if parts[:2] == ["composite", "sobjects"]:
+            return 200, self.collection(method, parts[2:], query, body or {}), {}
+
+        if parts[0] == "sobjects" and len(parts) >= 2:
+            sobject = parts[1]
+            if len(parts) == 2:
+                if method == "POST":
+                    return 201, {"id": org.create(sobject, body), "success": True, "errors": []}, {}
+                if method == "GET":
+                    return 200, {"objectDescribe": org.describe(sobject)}, {}
+            if len(parts) == 3 and parts[2] == "describe" and method == "GET":
+                if headers.get("If-Modified-Since"):
+                    return 304, None, {"Last-Modified": org.last_modified}
+                return 200, org.describe(sobject), {"Last-Modified": org.last_modified}
+            if len(parts) == 3 and parts[2] == "deleted" and method == "GET":
+                return 200, org.get_deleted(sobject, query.get("start", ""), query.get("end", "")), {}
+            if len(parts) == 3:
+                record_id = parts[2]
+                if method == "GET":
+                    found_object, record = org.find(record_id)
+                    if record is None:
+                        raise ApiError(404, "NOT_FOUND", f"The requested resource does not exist: {record_id}")
+                    fields = query.get("fields", "").split(",") if query.get("fields") else list(record)
+                    return 200, org._project(found_object, record, fields), {}
+                if method == "PATCH":
+                    org.update(sobject, record_id, body or {})
+                    return 204, None, {}
+                if method == "DELETE":
+                    org.delete(record_id)
+                    return 204, None, {}
+            if len(parts) == 4 and method == "PATCH":
+                record_id, created = org.upsert(sobject, parts[2], parts[3], body or {})
+                if created:
+                    return 201, {"id": record_id, "success": True, "errors": [], "created": True}, {}
+                return 204, None, {}
+        raise ApiError(404, "NOT_FOUND", f"The requested resource does not exist: {method} {path}")
+
+    def collection(self, method: str, parts: list, query: dict, body: dict) -> list:
+        all_or_none = bool(body.get("allOrNone"))
+        undo = [] if all_or_none else None
+        results, failed = [], False
+        if method == "DELETE":
+            items = [(None, rid) for rid in query.get("ids", "").split(",") if rid]
+        else:
+            records = body.get("records") or []
+            if len(records) > 200:
+                raise ApiError(400, "EXCEEDED_ID_LIMIT", "record limit reached. cannot submit more than 200 records")
+            items = [(r, None) for r in records]
+        with self.org.lock:
+            for record, record_id in items:
+                try:
+                    if method == "POST":
+                        sobject = (record.get("attributes") or {}).get("type", "")
+                        results.append({"id": self.org.create(sobject, record, undo), "success": True, "errors": []})
+                    elif method == "PATCH" and parts:
+                        rid, created = self.org.upsert(parts[0], parts[1], record.get(parts[1]), record, undo)
+                        results.append({"id": rid, "success": True, "errors": [], "created": created})
+                    elif method == "PATCH":
+                        sobject = (record.get("attributes") or {}).get("type", "")
+                        self.org.update(sobject, record.get("Id", ""), record, undo)
+                        results.append({"id": record["Id"], "success": True, "errors": []})
+                    elif method == "DELETE":
+                        self.org.delete(record_id, undo)
+                        results.append({"id": record_id, "success": True, "errors": []})
+                    else:
+                        raise ApiError(405, "METHOD_NOT_ALLOWED", f"{method} not allowed")
+                except ApiError as e:
+                    failed = True
+                    results.append({"success": False, "errors": [{"statusCode": e.body[0]["errorCode"],
+                                                                  "message": e.body[0]["message"], "fields": []}]})
+            if all_or_none and failed:
+                for step in reversed(undo):
+                    step()
+                rolled_back = {"statusCode": "ALL_OR_NONE_OPERATION_ROLLED_BACK", "message": "Record rolled back "
+                               "because not all records were valid and the request was using AllOrNone header", "fields": []}
+                results = [r if not r["success"] else {"success": False, "errors": [rolled_back]} for r in results]
+        return results
+
+    def composite(self, body: dict) -> dict:
+        all_or_none = bool(body.get("allOrNone"))
+        undo = [] if all_or_none else None
+        refs, responses, halted = {}, [], False
+        halt = [{"errorCode": "PROCESSING_HALTED", "message": "The transaction was rolled back since "
+                 "another operation in the same transaction failed."}]
+
+        def resolve(value):
+            if isinstance(value, str):
+                def lookup(m):
+                    ref, _, path = m.group(1).partition(".")
+                    target = refs.get(ref)
+                    for key in path.split("."):
+                        target = target.get(key) if isinstance(target, dict) else None
+                    if target is None:
+                        raise ApiError(400, "INVALID_REFERENCE", f"reference {m.group(1)} could not be resolved")
+                    return str(target)
+                return re.sub(r"@\{([^}]+)\}", lookup, value)
+            if isinstance(value, dict):
+                return {k: resolve(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [resolve(v) for v in value]
+            return value
+
+        with self.org.lock:
+            for sub in body.get("compositeRequest") or []:
+                ref = sub.get("referenceId")
+                if halted:
+                    responses.append({"referenceId": ref, "httpStatusCode": 400, "httpHeaders": {}, "body": halt})
+                    continue
+                try:
+                    url = urlparse(resolve(sub["url"]))
+                    status, result, _ = self.handle_undoable(sub["method"], url.path,
+                                                             {k: v[0] for k, v in parse_qs(url.query).items()},
+                                                             resolve(sub.get("body")), undo)
+                    refs[ref] = result if isinstance(result, dict) else {}
+                    responses.append({"referenceId": ref, "httpStatusCode": status, "httpHeaders": {}, "body": result})
+                except ApiError as e:
+                    responses.append({"referenceId": ref, "httpStatusCode": e.status, "httpHeaders": {}, "body": e.body})
+                    halted = all_or_none
+            if halted:
+                for step in reversed(undo):
+                    step()
+                responses = [r if r["httpStatusCode"] >= 400 else dict(r, httpStatusCode=400, body=halt)
+                             for r in responses]
+        return {"compositeResponse": responses}
+
+    def handle_undoable(self, method: str, path: str, query: dict, body, undo: list):
+        """``handle`` for one composite subrequest, recording undo steps for allOrNone rollback."""
+        parts = path.split("/sobjects/", 1)[-1].rstrip("/").split("/")
+        if undo is not None and "/sobjects/" in path:
+            if method == "POST" and len(parts) == 1:
+                return 201, {"id": self.org.create(parts[0], body, undo), "success": True, "errors": []}, {}
+            if method == "PATCH" and len(parts) == 2:
+                self.org.update(parts[0], parts[1], body or {}, undo)
+                return 204, None, {}
+            if method == "PATCH" and len(parts) == 3:
+                record_id, created = self.org.upsert(parts[0], parts[1], parts[2], body or {}, undo)
+                return (201, {"id": record_id, "success": True, "errors": [], "created": True}, {}) if created \
+                    else (204, None, {})
+            if method == "DELETE" and len(parts) == 2:
+                self.org.delete(parts[1], undo)
+                return 204, None, {}
+        return self.handle(method, path, query, {}, body)
+
+
+def route_name(method: str, path: str) -> str:
+    """Stable per-endpoint key for request counting, e.g. ``GET query`` or ``PATCH composite/sobjects``."""
+    if path.startswith("/services/oauth2/"):
+        return f"{method} oauth2/token"
+    rest = re.sub(r"^/services/data/v\d+\.\d+/", "", path).rstrip("/")
+    parts = rest.split("/")
+    if parts[0] in ("query", "queryAll"):
+        return f"{method} {parts[0]}" + ("/next" if len(parts) > 1 else "")
+    if parts[:2] == ["composite", "sobjects"]:
+        return f"{method} composite/sobjects" + ("/upsert" if len(parts) > 2 else "")
+    if parts[0] == "sobjects" and len(parts) >= 3 and parts[2] in ("describe", "deleted"):
+        return f"{method} sobjects/{parts[2]}"
+    if parts[0] == "sobjects":
+        return f"{method} sobjects" + ("/upsert" if len(parts) == 4 else "/id" if len(parts) == 3 else "")
+    return f"{method} {parts[0]}"
+
+
+class MockSalesforce:
+    """The mock org behind a threaded HTTP server; usable as a context manager."""
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1", latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0.0, page_size: int = DEFAULT_PAGE_SIZE, access_token: str = DEFAULT_TOKEN,
+                 seed: int = 0):
+        self.org = MockOrg(page_size)
+        self.router = Router(self.org)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.access_token = access_token
+        self.tokens = {access_token}
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        return {"SF_BASE_URL": self.url, "SF_ACCESS_TOKEN": self.access_token}
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {"requests": sum(self.counts.values()), "by_route": dict(sorted(self.counts.items()))}
+
+    def reset_stats(self) -> None:
+        with self.stats_lock:
+            self.counts.clear()
+
+    def start(self) -> "MockSalesforce":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockSalesforce":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _handler(mock: MockSalesforce):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, status: int, body=None, headers: dict = None) -> None:
+            data = b"" if body is None else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json;charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            size = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(size) if size else b""
+            if not raw:
+                return None
+            if "json" in (self.headers.get("Content-Type") or ""):
+                return json.loads(raw)
+            return {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+
+        def _dispatch(self, method: str) -> None:
+            url = urlparse(self.path)
+            try:
+                body = self._body()
+            except ValueError:
+                return self._send(400, [{"errorCode": "JSON_PARSER_ERROR", "message": "invalid JSON body"}])
+            if url.path.startswith("/__mock__/"):
+                return self._control(method, url.path, body)
+
+            route = route_name(method, url.path)
+            with mock.stats_lock:
+                mock.counts[route] += 1
+                used = sum(mock.counts.values())
+                fail = mock.error_rate and mock.rng.random() < mock.error_rate
+                delay = max(0.0, mock.latency_ms + mock.rng.uniform(-mock.jitter_ms, mock.jitter_ms)) / 1000
+            if delay:
+                time.sleep(delay)
+            limit_header = {"Sforce-Limit-Info": f"api-usage={used}/{API_ALLOCATION}"}
+            if len(self.path) > MAX_URL_CHARS:
+                return self._send(414, [{"errorCode": "URI_TOO_LONG", "message": "Request URI too long"}], limit_header)
+            if fail:
+                return self._send(503, [{"errorCode": "SERVER_UNAVAILABLE", "message": "Injected failure"}], limit_header)
+
+            if url.path.startswith("/services/oauth2/token") and method == "POST":
+                token = f"mock-{used}-{int(time.time())}"
+                mock.tokens.add(token)
+                return self._send(200, {"access_token": token, "instance_url": mock.url, "token_type": "Bearer",
+                                        "id": f"{mock.url}/id/00D000000000001AAA/{MOCK_USER_ID}",
+                                        "issued_at": str(int(time.time() * 1000)), "signature": "mock"})
+            auth = self.headers.get("Authorization", "")
+            if not auth.startswith("Bearer ") or auth[7:] not in mock.tokens:
+                return self._send(401, [{"errorCode": "INVALID_SESSION_ID", "message": "Session expired or invalid"}])
+            if re.match(r"/services/data/v\d+\.\d+/limits/?$", url.path) and method == "GET":
+                daily = {"Max": API_ALLOCATION, "Remaining": API_ALLOCATION - used}
+                return self._send(200, {"DailyApiRequests": daily}, limit_header)
+            try:
+                status, result, headers = mock.router.handle(
+                    method, url.path, {k: v[0] for k, v in parse_qs(url.query).items()}, dict(self.headers), body)
+            except ApiError as e:
+                return self._send(e.status, e.body, limit_header)
+            self._send(status, result, {**limit_header, **headers})
+
+        def _control(self, method: str, path: str, body) -> None:
+            if path == "/__mock__/stats":
+                return self._send(200, mock.stats())
+            if path == "/__mock__/reset" and method == "POST":
+                mock.reset_stats()
+                return self._send(200, {"reset": True})
+            if path == "/__mock__/config" and method == "POST":
+                for key in ("latency_ms", "jitter_ms", "error_rate"):
+                    if key in (body or {}):
+                        setattr(mock, key, float(body[key]))
+                return self._send(200, {k: getattr(mock, k) for k in ("latency_ms", "jitter_ms", "error_rate")})
+            if path == "/__mock__/seed" and method == "POST":
+                mock.org.seed(**{k: int(v) for k, v in (body or {}).items()})
+                return self._send(200, {name: len(records) for name, records in mock.org.records.items()})
+            self._send(404, [{"errorCode": "NOT_FOUND", "message": path}])
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_PATCH(self):
+            self._dispatch("PATCH")
+
+        def do_PUT(self):
+            self._dispatch("PUT")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+    return Handler
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Serve a local mock of the Salesforce REST API.")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default {DEFAULT_PORT}; 0 = any free port)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--latency-ms", type=float, default=0, help="Added latency per request")
+    p.add_argument("--jitter-ms", type=float, default=0, help="Random +/- variation of the latency")
+    p.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered 503 (0-1)")
+    p.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Query page size")
+    p.add_argument("--token", default=DEFAULT_TOKEN, help="Access token the mock accepts")
+    p.add_argument("--leads", type=int, default=0, help="Seed this many Leads")
+    p.add_argument("--accounts", type=int, default=0, help="Seed this many Accounts")
+    p.add_argument("--opportunities", type=int, default=0, help="Seed this many Opportunities")
+    p.add_argument("--tasks", type=int, default=0, help="Seed this many Tasks")
+    p.add_argument("--seed", type=int, default=0, help="Random seed for sample data, jitter and errors")
+    args = p.parse_args(argv)
+
+    mock = MockSalesforce(args.port, args.host, args.latency_ms, args.jitter_ms, args.error_rate, args.page_size,
+                          args.token, args.seed)
+    mock.org.seed(args.leads, args.accounts, args.opportunities, args.tasks, args.seed)
+    print(f"export SF_BASE_URL={mock.url} SF_ACCESS_TOKEN={mock.access_token}", flush=True)
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
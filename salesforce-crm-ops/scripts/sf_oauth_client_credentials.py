@@ -7,7 +7,8 @@ import json
 import argparse
 from urllib.parse import urljoin
 
-import requests
+from sf_cache import read_json
+from sf_client import timeout
 
 
 def get_env(name: str, required: bool = True, default: str | None = None) -> str | None:
@@ -18,13 +19,20 @@ def get_env(name: str, required: bool = True, default: str | None = None) -> str
     return val
 
 
-def main() -> None:
+def main(argv: list = None) -> None:
     parser = argparse.ArgumentParser(description="Get a Salesforce access token using OAuth client credentials flow.")
     parser.add_argument("--base-url", default=os.getenv("SF_BASE_URL"), help="Salesforce base URL, e.g. https://yourdomain.my.salesforce.com")
     parser.add_argument("--client-id", default=os.getenv("SF_CLIENT_ID"))
     parser.add_argument("--client-secret", default=os.getenv("SF_CLIENT_SECRET"))
     parser.add_argument("--token-endpoint", default=None, help="Override token endpoint; defaults to <base-url>/services/oauth2/token")
-    args = parser.parse_args()
+    parser.add_argument("--no-cache", action="store_true", help="Always request a new token and skip the shared token cache")
+    parser.add_argument("--force-refresh", action="store_true", help="Replace the cached token with a new one")
+    parser.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = parser.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
 
     base_url = args.base_url
     if not base_url:
@@ -36,22 +44,23 @@ def main() -> None:
 
     token_url = args.token_endpoint or urljoin(base_url.rstrip("/") + "/", "services/oauth2/token")
 
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret,
-    }
+    from sf_auth import TokenProvider
 
-    resp = requests.post(token_url, data=data, timeout=30)
-    if resp.status_code >= 400:
-        print(f"Token request failed: {resp.status_code}", file=sys.stderr)
-        print(resp.text, file=sys.stderr)
+    provider = TokenProvider(base_url, client_id, client_secret, token_url=token_url,
+                             request_timeout=timeout(), use_cache=not args.no_cache)
+    try:
+        if args.force_refresh:
+            provider.refresh(stale=(read_json(provider.cache_file) or {}).get("access_token"))
+        payload = provider.payload()
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
         sys.exit(1)
 
-    payload = resp.json()
-    # Print token to stdout as JSON for piping into other scripts
+    # Print token to stdout as JSON for piping into other scripts (expires_at is epoch seconds)
     print(json.dumps(payload, indent=2))
 
 
 if __name__ == "__main__":
-    main()
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_oauth_client_credentials", main)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Named org profiles and concurrent fan-out across them.
+Profiles live in config/orgs.yaml (or SF_ORGS_FILE). Each org gets its own
+SalesforceClient, and with it its own token cache entry, connection pool and
+API usage limiter. Queries and describes run across the selected orgs at
+the same time, with at most SF_CONCURRENCY calls in flight per org, and come
+back merged and tagged with the org name, so a cross-org run takes about as
+long as its slowest org.
+
+Secrets never go in orgs.yaml: a profile names the SF_* environment
+variables that hold its client credentials or access token.
+
+Usage:
+    python3 sf_orgs.py list
+    python3 sf_orgs.py check                          # one limits call per org, concurrently
+    eval "$(python3 sf_orgs.py env fund2)"            # point the single-org scripts at one profile
+
+    python3 sf_query.py "SELECT Id, Name, StageName FROM Opportunity WHERE IsClosed = false" --orgs all
+    python3 sf_describe.py Opportunity --orgs fund1,sandbox
+
+Library use (from another script in this directory):
+    from sf_orgs import load_orgs, org_clients, query_orgs
+
+    clients = org_clients(load_orgs("./config"), "fund1,fund2")
+    records, errors = query_orgs(clients, "SELECT Id, Email FROM Lead WHERE Email = 'ada@example.ai'")
+    for rec in records:
+        print(rec["org"], rec["Id"])
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import argparse
+import threading
+from pathlib import Path
+from functools import partial
+
+PROFILE_KEYS = ("base_url", "api_version", "token_url", "client_id_env", "client_secret_env", "access_token_env")
+ENV_KEYS = ("client_id_env", "client_secret_env", "access_token_env")
+
+_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# One client per profile per process (reused across calls in a long-lived process such as sfopsd)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def orgs_file(config_dir: str = "./config") -> Path:
+    return Path(os.getenv("SF_ORGS_FILE") or Path(config_dir) / "orgs.yaml")
+
+
+def _validate(orgs) -> None:
+    if not isinstance(orgs, dict) or not orgs:
+        raise ValueError("'orgs' must map profile names to settings")
+    for name, profile in orgs.items():
+        if not _NAME.match(str(name)):
+            raise ValueError(f"'{name}' is not a valid profile name (letters, digits, - and _)")
+        if not isinstance(profile, dict):
+            raise ValueError(f"'{name}' must be a mapping of settings")
+        unknown = set(profile) - set(PROFILE_KEYS)
+        if unknown:
+            raise ValueError(f"'{name}' has unknown setting(s): {', '.join(sorted(unknown))}")
+        if not str(profile.get("base_url") or "").startswith(("https://", "http://")):
+            raise ValueError(f"'{name}' needs a base_url such as https://yourdomain.my.salesforce.com")
+        for key in ENV_KEYS:
+            # SF_* names are part of the environment sfopsd compares, so a warm daemon never reuses stale secrets
+            if key in profile and not str(profile[key]).startswith("SF_"):
+                raise ValueError(f"'{name}': {key} must name an SF_* environment variable")
+        if not profile.get("access_token_env") and not (profile.get("client_id_env")
+                                                        and profile.get("client_secret_env")):
+            raise ValueError(f"'{name}' needs access_token_env, or client_id_env and client_secret_env")
+
+
+def load_orgs(config_dir: str = "./config") -> dict:
+    """Profiles by name, in file order. Exits with status 2 if orgs.yaml is missing or malformed."""
+    path = orgs_file(config_dir)
+    if not path.exists():
+        print(f"No org profiles: {path} does not exist (see config/orgs.yaml in the skill)", file=sys.stderr)
+        sys.exit(2)
+    import yaml
+
+    with open(path) as f:
+        raw = yaml.safe_load(f) or {}
+    orgs = raw.get("orgs") if isinstance(raw, dict) else None
+    try:
+        _validate(orgs)
+    except ValueError as e:
+        print(f"Invalid org profiles in {path}: {e}", file=sys.stderr)
+        sys.exit(2)
+    return {str(name): profile for name, profile in orgs.items()}
+
+
+def select_orgs(orgs: dict, spec: str) -> list:
+    """Profile names from a comma-separated list, or every profile for ``all``."""
+    if spec.strip() == "all":
+        return list(orgs)
+    names = list(dict.fromkeys(n.strip() for n in spec.split(",") if n.strip()))
+    unknown = [n for n in names if n not in orgs]
+    if unknown or not names:
+        named = ", ".join(unknown) or repr(spec)
+        print(f"Error: unknown org profile(s): {named} (have: {', '.join(orgs)})", file=sys.stderr)
+        sys.exit(2)
+    return names
+
+
+def _credentials(profile: dict) -> tuple:
+    return tuple(os.getenv(profile[k]) if profile.get(k) else None for k in ENV_KEYS)
+
+
+def org_client(name: str, profile: dict):
+    """The pooled client for one profile, created on first use."""
+    from sf_auth import TokenProvider
+    from sf_client import SalesforceClient, api_version, timeout
+
+    client_id, client_secret, access_token = _credentials(profile)
+    if not access_token and not (client_id and client_secret):
+        wanted = profile.get("access_token_env") or f"{profile['client_id_env']} and {profile['client_secret_env']}"
+        print(f"Missing credentials for org '{name}': set {wanted}", file=sys.stderr)
+        sys.exit(2)
+    version = profile.get("api_version") or api_version()
+    key = (name, profile["base_url"], version, profile.get("token_url"), client_id, client_secret, access_token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            provider = TokenProvider(profile["base_url"], client_id, client_secret, profile.get("token_url"),
+                                     static_token=access_token, request_timeout=timeout())
+            client = SalesforceClient(profile["base_url"], provider, version, timeout())
+            provider.session = client.session  # token refreshes reuse the org's pool
+            _clients[key] = client
+    return client
+
+
+def org_clients(orgs: dict, spec: str) -> dict:
+    """Clients for the profiles ``spec`` selects, by name."""
+    return {name: org_client(name, orgs[name]) for name in select_orgs(orgs, spec)}
+
+
+def fan_out(clients: dict, calls: list, concurrency: int = None) -> list:
+    """Run (org name, fn) pairs as ``fn(client)`` concurrently, at most ``concurrency`` in flight per org.
+
+    Returns sf_async outcome dicts in input order.
+    """
+    from sf_async import default_concurrency, run_all
+
+    concurrency = concurrency or default_concurrency()
+    for org in {org for org, _ in calls}:
+        clients[org].resize_pool(concurrency)
+    return run_all([partial(fn, clients[org]) for org, fn in calls], concurrency, [org for org, _ in calls])
+
+
+def _records(soql: str, batch_size: int, include_deleted: bool, max_records: int, client) -> list:
+    from sf_query import query_records
+
+    records = []
+    for rec in query_records(client, soql, batch_size, include_deleted):
+        if max_records is not None and len(records) >= max_records:
+            break
+        records.append(rec)
+    return records
+
+
+def query_orgs(clients: dict, soql: str, batch_size: int = None, include_deleted: bool = False,
+               max_records: int = None) -> tuple:
+    """Run one query in every org at once.
+
+    Returns (records, errors): records from all orgs in profile order, each
+    with an ``org`` key first; errors maps org name to message for orgs that failed.
+    """
+    fetch = partial(_records, soql, batch_size, include_deleted, max_records)
+    outcomes = fan_out(clients, [(org, fetch) for org in clients], 1)
+    records, errors = [], {}
+    for org, outcome in zip(clients, outcomes):
+        if outcome["ok"]:
+            records.extend({"org": org, **rec} for rec in outcome["result"])
+        else:
+            errors[org] = outcome["error"]
+    return records, errors
+
+
+def _describe(object_name: str, max_age: float, refresh: bool, client) -> dict:
+    from sf_describe import DescribeCache
+
+    return DescribeCache(client, max_age=max_age, refresh=refresh).get(object_name)
+
+
+def describe_orgs(clients: dict, object_names: list, max_age: float = 0, refresh: bool = False,
+                  concurrency: int = None) -> tuple:
+    """Describe objects in every org at once, each org through its own describe cache.
+
+    Returns ({org: {object: describe}}, {org: {object: error message}}).
+    """
+    pairs = [(org, name) for org in clients for name in object_names]
+    calls = [(org, partial(_describe, name, max_age, refresh)) for org, name in pairs]
+    described, errors = {org: {} for org in clients}, {}
+    for (org, name), outcome in zip(pairs, fan_out(clients, calls, concurrency)):
+        if outcome["ok"]:
+            described[org][name] = outcome["result"]
+        else:
+            errors.setdefault(org, {})[name] = outcome["error"]
+    return described, errors
+
+
+def _check(client) -> dict:
+    began = time.perf_counter()
+    r = client.get("limits/")
+    if r.status_code >= 400:
+        raise RuntimeError(f"limits call failed ({r.status_code}): {r.text[:200]}")
+    daily = r.json().get("DailyApiRequests", {})
+    return {"ms": round((time.perf_counter() - began) * 1000, 1), "remaining": daily.get("Remaining"),
+            "max": daily.get("Max")}
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="List, check and switch between named org profiles.")
+    p.add_argument("--config", default="./config", help="Path to config directory (default: ./config)")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Profiles, base URLs and which credentials are set")
+    check = sub.add_parser("check", help="Authenticate and read API limits in every org, concurrently")
+    check.add_argument("--orgs", default="all", help="Comma-separated profile names, or all (default)")
+    env = sub.add_parser("env", help="Print shell exports that point SF_BASE_URL etc. at one profile")
+    env.add_argument("name", help="Profile name")
+    args = p.parse_args(argv)
+
+    orgs = load_orgs(args.config)
+    if args.command == "list":
+        for name, profile in orgs.items():
+            client_id, client_secret, token = _credentials(profile)
+            auth = "client credentials" if profile.get("client_id_env") else "access token"
+            ready = "set" if token or (client_id and client_secret) else "MISSING"
+            print(f"{name:16} {profile['base_url']:50} {auth} ({ready})")
+    elif args.command == "check":
+        clients = org_clients(orgs, args.orgs)
+        outcomes = fan_out(clients, [(org, _check) for org in clients], 1)
+        failed = False
+        for org, outcome in zip(clients, outcomes):
+            result = outcome["result"] if outcome["ok"] else {"error": outcome["error"]}
+            failed |= not outcome["ok"]
+            print(json.dumps({"org": org, **result}))
+        sys.exit(1 if failed else 0)
+    else:
+        select_orgs(orgs, args.name)
+        profile = orgs[args.name]
+        exports = [f"SF_BASE_URL={shlex.quote(profile['base_url'])}"]
+        if profile.get("api_version"):
+            exports.append(f"SF_API_VERSION={shlex.quote(profile['api_version'])}")
+        # Reference the profile's variables instead of printing secret values
+        for target, key in (("SF_CLIENT_ID", "client_id_env"), ("SF_CLIENT_SECRET", "client_secret_env"),
+                            ("SF_ACCESS_TOKEN", "access_token_env")):
+            if profile.get(key):
+                exports.append(f'{target}="${{{profile[key]}}}"')
+        print("unset SF_ACCESS_TOKEN SF_CLIENT_ID SF_CLIENT_SECRET SF_API_VERSION")
+        print("export " + " ".join(exports))
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_orgs", main)
@@ -1,56 +1,325 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Run a SOQL query via the Salesforce REST API and stream every result page.
+Follows nextRecordsUrl lazily and writes records as they arrive, so memory
+stays flat no matter how many rows the query returns.
+
+Usage:
+    python3 sf_query.py "SELECT Id, Name FROM Lead LIMIT 5"
+
+    # Stream a large extract as NDJSON or CSV
+    python3 sf_query.py "SELECT Id, Email, Company FROM Lead" --format ndjson --output leads.ndjson
+    python3 sf_query.py "SELECT Id, Name, Account.Name FROM Opportunity" --format csv \
+        --fields Id,Name,Account.Name --output opps.csv
+
+    # Stop after the first 10,000 records
+    python3 sf_query.py "SELECT Id FROM Lead" --format ndjson --max-records 10000
+
+    # Answer repeats from the local result cache for 10 minutes (see sf_query_cache.py)
+    python3 sf_query.py "SELECT Id, Name FROM Opportunity WHERE Thesis_Tag__c = 'AI Security'" --cache --cache-ttl 600
+
+    # Open pipeline across every org profile in config/orgs.yaml at once, tagged by org (see sf_orgs.py)
+    python3 sf_query.py "SELECT Id, Name, StageName FROM Opportunity WHERE IsClosed = false" --orgs all --format csv
+
+    # Include deleted and archived rows (queryAll)
+    python3 sf_query.py "SELECT Id, IsDeleted FROM Opportunity" --all --format ndjson
+
+    # Nightly snapshot through a Bulk API 2.0 query job (CSV streamed to disk)
+    python3 sf_query.py "SELECT Id, Name, StageName, CloseDate FROM Opportunity" --bulk --output opps.csv
+    python3 sf_query.py "SELECT Id, Email FROM Lead" --bulk --all --output leads_all.csv
+"""
 
 import os
 import sys
+import csv
 import json
 import argparse
-from urllib.parse import quote_plus, urljoin
+import textwrap
+from urllib.parse import quote_plus
+
+from sf_bulk import bulk_query
+from sf_client import SalesforceClient, get_client
+from sf_soql import MAX_QUERY_URL_CHARS
+
+
+def query_records(client: SalesforceClient, soql: str, batch_size: int = None, include_deleted: bool = False):
+    """Yield every record of a query, fetching the next page only when needed."""
+    for page in query_pages(client, soql, batch_size, include_deleted):
+        yield from page.get("records", [])
+
+
+def query_pages(client: SalesforceClient, soql: str, batch_size: int = None, include_deleted: bool = False):
+    """Yield raw result pages of a query, following nextRecordsUrl lazily.
+
+    ``include_deleted`` uses the queryAll resource to also return deleted/archived rows.
+    A query too long for a GET URL is sent inside a Composite request instead.
+    """
+    headers = {"Sforce-Query-Options": f"batchSize={batch_size}"} if batch_size else {}
+    resource = "queryAll/" if include_deleted else "query/"
+    if len(quote_plus(soql)) > MAX_QUERY_URL_CHARS:
+        page = _composite_query(client, resource, soql, headers)
+    else:
+        page = _page(client.get(resource, params={"q": soql}, headers=headers))
+    while True:
+        yield page
+        if page.get("done", True) or not page.get("nextRecordsUrl"):
+            return
+        page = _page(client.get(page["nextRecordsUrl"], headers=headers))
+
+
+def _page(r) -> dict:
+    if r.status_code >= 400:
+        raise RuntimeError(f"SOQL query failed ({r.status_code}): {r.text}")
+    return r.json()
+
+
+def _composite_query(client: SalesforceClient, resource: str, soql: str, headers: dict) -> dict:
+    """First page of a long query as a GET subrequest of a Composite POST.
+
+    The query resource only accepts GET, so a query whose URL would pass the
+    ~16K request-line limit travels in the request body; later pages use the
+    short nextRecordsUrl as usual.
+    """
+    sub = {"method": "GET", "referenceId": "query",
+           "url": f"/services/data/{client.api_version}/{resource}?q={quote_plus(soql)}"}
+    if headers:
+        sub["httpHeaders"] = headers
+    r = client.post("composite", json={"allOrNone": False, "compositeRequest": [sub]}, idempotent=True)
+    if r.status_code >= 400:
+        raise RuntimeError(f"SOQL query failed ({r.status_code}): {r.text}")
+    result = r.json()["compositeResponse"][0]
+    if result.get("httpStatusCode", 500) >= 400:
+        raise RuntimeError(f"SOQL query failed ({result.get('httpStatusCode')}): {json.dumps(result.get('body'))}")
+    return result["body"]
+
+
+def strip_attributes(value):
+    """Drop the ``attributes`` metadata Salesforce adds to every record and relationship."""
+    if isinstance(value, dict):
+        return {k: strip_attributes(v) for k, v in value.items() if k != "attributes"}
+    if isinstance(value, list):
+        return [strip_attributes(v) for v in value]
+    return value
+
+
+def flatten(record: dict, prefix: str = "") -> dict:
+    """Flatten relationship fields to dotted keys (``Account.Name``)."""
+    flat = {}
+    for k, v in record.items():
+        if k == "attributes":
+            continue
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            flat.update(flatten(v, key + "."))
+        else:
+            flat[key] = v
+    return flat
+
 
-import requests
+def project(record: dict, fields: list) -> dict:
+    """Keep only the requested (possibly dotted) fields, in the requested order."""
+    flat = flatten(record)
+    return {f: flat.get(f) for f in fields}
 
 
-def get_api_version() -> str:
-    return os.getenv("SF_API_VERSION", "v59.0")
+class JsonWriter:
+    """Writes the classic query response shape, one record at a time."""
 
+    def __init__(self, out, total_size: int, fields: list = None):
+        self.out = out
+        self.first = True
+        out.write(f'{{\n  "totalSize": {total_size},\n  "done": true,\n  "records": [')
 
-def get_base_url() -> str:
-    base = os.getenv("SF_BASE_URL")
-    if not base:
-        print("Missing SF_BASE_URL", file=sys.stderr)
-        sys.exit(2)
-    return base.rstrip("/")
+    def write(self, record: dict) -> None:
+        self.out.write("\n" if self.first else ",\n")
+        self.out.write(textwrap.indent(json.dumps(record, indent=2), "    "))
+        self.first = False
 
+    def close(self) -> None:
+        self.out.write("]\n}\n" if self.first else "\n  ]\n}\n")
 
-def get_token() -> str:
-    token = os.getenv("SF_ACCESS_TOKEN")
-    if not token:
-        print("Missing SF_ACCESS_TOKEN (set it, or run sf_oauth_client_credentials.py and export access_token).", file=sys.stderr)
-        sys.exit(2)
-    return token
 
+class NdjsonWriter:
+    def __init__(self, out, total_size: int, fields: list = None):
+        self.out = out
 
-def main() -> None:
+    def write(self, record: dict) -> None:
+        self.out.write(json.dumps(strip_attributes(record)) + "\n")
+
+    def close(self) -> None:
+        pass
+
+
+class CsvWriter:
+    """Writes flattened records; the header comes from --fields or the first record."""
+
+    def __init__(self, out, total_size: int, fields: list = None):
+        self.out = out
+        self.fields = fields
+        self.writer = None
+
+    def write(self, record: dict) -> None:
+        flat = flatten(record)
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.out, fieldnames=self.fields or list(flat), extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerow(flat)
+
+    def close(self) -> None:
+        pass
+
+
+WRITERS = {"json": JsonWriter, "ndjson": NdjsonWriter, "csv": CsvWriter}
+
+
+def stream_query(client: SalesforceClient, soql: str, out, fmt: str = "json", fields: list = None,
+                 max_records: int = None, batch_size: int = None, include_deleted: bool = False,
+                 pages=None) -> int:
+    """Write query results to ``out`` as they arrive. Returns the number of records written.
+
+    ``pages`` replaces the API result pages (e.g. with ``sf_query_cache.cached_pages``).
+    """
+    writer = None
+    count = 0
+    if pages is None:
+        pages = query_pages(client, soql, batch_size, include_deleted)
+    for page in pages:
+        if writer is None:
+            total = page.get("totalSize", 0)
+            if max_records is not None:
+                total = min(total, max_records)
+            writer = WRITERS[fmt](out, total, fields)
+        for record in page.get("records", []):
+            if max_records is not None and count >= max_records:
+                break
+            writer.write(project(record, fields) if fields else record)
+            count += 1
+        out.flush()
+        if max_records is not None and count >= max_records:
+            break
+    if writer is not None:
+        writer.close()
+    return count
+
+
+def run_bulk(args) -> None:
+    """Handle --bulk: stream the job's CSV to --output (or stdout)."""
+    client = get_client()
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        count = bulk_query(client, args.soql, out, include_deleted=args.all, max_records=args.batch_size,
+                           verbose=args.verbose)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Bulk query wrote {count} records" + (f" to {args.output}" if args.output else ""), file=sys.stderr)
+
+
+def run_orgs(args, fields: list) -> None:
+    """Handle --orgs: run the query in every named org at once and write the merged records, tagged by org."""
+    from sf_orgs import load_orgs, org_clients, query_orgs
+
+    clients = org_clients(load_orgs(args.config), args.orgs)
+    records, errors = query_orgs(clients, args.soql, args.batch_size, args.all, args.max_records)
+    for org, error in errors.items():
+        print(f"{org}: {error}", file=sys.stderr)
+    if fields and "org" not in fields:
+        fields = ["org"] + fields
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writer = WRITERS[args.format or "json"](out, len(records), fields)
+        for record in records:
+            writer.write(project(record, fields) if fields else record)
+        writer.close()
+    finally:
+        if args.output:
+            out.close()
+    if args.output:
+        print(f"Wrote {len(records)} records from {len(clients) - len(errors)} org(s) to {args.output}",
+              file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+def main(argv: list = None) -> None:
     parser = argparse.ArgumentParser(description="Run a SOQL query via Salesforce REST API and print results.")
     parser.add_argument("soql", help="SOQL query string, e.g. SELECT Id, Name FROM Lead LIMIT 5")
-    args = parser.parse_args()
+    parser.add_argument("--format", choices=sorted(WRITERS),
+                        help="Output format (default: json, the REST response shape; csv with --bulk)")
+    parser.add_argument("--output", "-o", help="Write results to this file instead of stdout")
+    parser.add_argument("--fields", help="Comma-separated fields to keep, dotted for relationships (e.g. Id,Account.Name)")
+    parser.add_argument("--max-records", type=int, help="Stop after this many records")
+    parser.add_argument("--batch-size", type=int,
+                        help="Records per page, 200-2000 (Sforce-Query-Options); rows per result locator with --bulk")
+    parser.add_argument("--all", action="store_true", help="Include deleted and archived rows (queryAll)")
+    parser.add_argument("--bulk", action="store_true", help="Run as a Bulk API 2.0 query job and stream CSV")
+    parser.add_argument("--cache", action="store_true",
+                        help="Answer from (and fill) the local query result cache (also SF_QUERY_CACHE=1)")
+    parser.add_argument("--cache-ttl", type=float,
+                        help="Seconds this result stays cached (default: SF_QUERY_CACHE_TTL or 300)")
+    parser.add_argument("--orgs", help="Run in these org profiles at once (comma-separated names from "
+                        "config/orgs.yaml, or all); records gain an org field")
+    parser.add_argument("--config", default="./config", help="Path to config directory (for orgs.yaml)")
+    parser.add_argument("--verbose", action="store_true", help="Show bulk job progress")
+    parser.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = parser.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
 
-    base_url = get_base_url()
-    token = get_token()
-    api_version = get_api_version()
+        start_trace()
 
-    q = quote_plus(args.soql)
-    path = f"/services/data/{api_version}/query/?q={q}"
-    url = base_url + path
+    if args.bulk:
+        if args.orgs:
+            print("Error: --bulk runs in one org; use --orgs with REST queries", file=sys.stderr)
+            sys.exit(2)
+        if args.format not in (None, "csv") or args.fields or args.max_records:
+            print("Error: --bulk writes the full CSV result; --format, --fields and --max-records do not apply",
+                  file=sys.stderr)
+            sys.exit(2)
+        run_bulk(args)
+        return
 
-    resp = requests.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=30)
-    if resp.status_code >= 400:
-        print(f"Query failed: {resp.status_code}", file=sys.stderr)
-        print(resp.text, file=sys.stderr)
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()] if args.fields else None
+    if args.orgs:
+        if args.cache:
+            print("Error: --cache applies to single-org queries, not --orgs", file=sys.stderr)
+            sys.exit(2)
+        run_orgs(args, fields)
+        return
+    client = get_client()
+    pages = cache = None
+    if args.cache or os.getenv("SF_QUERY_CACHE") == "1":
+        from sf_query_cache import cached_pages, open_query_cache
+
+        cache = open_query_cache(client)
+        fetch = lambda: query_pages(client, args.soql, args.batch_size, args.all)
+        pages = cached_pages(cache, client, args.soql, fetch, include_deleted=args.all, ttl=args.cache_ttl)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = stream_query(client, args.soql, out, args.format or "json", fields, args.max_records,
+                             args.batch_size, args.all, pages)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
         sys.exit(1)
+    except BrokenPipeError:
+        # Downstream reader (e.g. `head`) closed the pipe; stop fetching pages quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
+    finally:
+        if args.output:
+            out.close()
+        if cache is not None:
+            cache.close()
 
-    print(json.dumps(resp.json(), indent=2))
+    if args.output:
+        print(f"Wrote {count} records to {args.output}", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    main()
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_query", main)
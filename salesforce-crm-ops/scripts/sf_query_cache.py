@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Opt-in result cache for SOQL queries, shared by every process on the machine.
+Agents and scripts often repeat the same query within minutes (stage
+picklists, "open opps for this thesis tag"); with the cache on, a repeat is
+answered from disk instead of costing an API round trip per result page.
+
+    key         normalized SOQL (whitespace and keyword case do not matter; string
+                literals do) + org + client ID + API version + query/queryAll
+    expiry      per query: --cache-ttl on sf_query.py, else SF_QUERY_CACHE_TTL (default 300 s)
+    size        bounded by SF_QUERY_CACHE_MB (default 64); least recently used entries
+                are evicted first, and results over a quarter of the budget are not stored
+    store       SQLite per org under SF_CACHE_DIR (or SF_QUERY_CACHE_DB)
+
+Writes made through these scripts invalidate it: every POST/PATCH/PUT/DELETE
+drops the cached queries that read the objects it touches, including objects
+reached through relationship fields (``Account.Name``) and subqueries.
+Relationships the cache cannot map to an object make the query invalidated
+by any write. Changes made outside this tooling are only bounded by the TTL.
+
+Turn it on with --cache on sf_query.py or SF_QUERY_CACHE=1.
+
+Usage:
+    python3 sf_query.py "SELECT Id, Name FROM Opportunity WHERE IsClosed = false" --cache --cache-ttl 600
+    python3 sf_query_cache.py stats               # hits, misses, API calls saved, size
+    python3 sf_query_cache.py list                # cached queries, most recently used first
+    python3 sf_query_cache.py invalidate Opportunity
+    python3 sf_query_cache.py clear
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+
+from sf_cache import cache_key, cache_path
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_MB = 64
+# Results larger than this share of the cache budget are streamed but not stored.
+MAX_ENTRY_SHARE = 0.25
+# Stop collecting a result for the cache past this many records (keeps big extracts streaming in flat memory).
+MAX_ENTRY_RECORDS = 50000
+
+# Parent relationship names -> objects they reach; anything else not listed maps to "*".
+PARENT_RELATIONSHIPS = {
+    "Account": ["Account"], "ConvertedAccount": ["Account"], "Contact": ["Contact"],
+    "ConvertedContact": ["Contact"], "Lead": ["Lead"], "Opportunity": ["Opportunity"],
+    "ConvertedOpportunity": ["Opportunity"], "Campaign": ["Campaign"], "Who": ["Lead", "Contact"],
+    "Owner": ["User"], "CreatedBy": ["User"], "LastModifiedBy": ["User"],
+}
+# Child relationship names used in subqueries -> objects.
+CHILD_RELATIONSHIPS = {
+    "Contacts": "Contact", "Opportunities": "Opportunity", "Tasks": "Task", "Events": "Event",
+    "OpenActivities": "Task", "ActivityHistories": "Task", "Cases": "Case", "Leads": "Lead",
+}
+ANY = "*"
+
+DDL = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    soql TEXT NOT NULL,
+    result BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    pages INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+CREATE TABLE IF NOT EXISTS entry_objects (
+    key TEXT NOT NULL,
+    sobject TEXT NOT NULL,
+    PRIMARY KEY (sobject, key)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_QUOTED = re.compile(r"'(?:[^'\\]|\\.)*'")
+_SUBQUERY = re.compile(r"(\bIN\s*)?\(\s*SELECT\b[^()]*?\bFROM\s+(\w+)[^()]*\)", re.I)
+_FROM = re.compile(r"\bFROM\s+(\w+)", re.I)
+_PATH = re.compile(r"\b([A-Za-z]\w*)\.[A-Za-z]\w*")
+
+
+def cache_db(base: str = None) -> Path:
+    if os.getenv("SF_QUERY_CACHE_DB"):
+        return Path(os.environ["SF_QUERY_CACHE_DB"])
+    if base is None:
+        from sf_client import base_url
+
+        base = base_url()
+    return cache_path("query-cache", cache_key(base.rstrip("/")) + ".sqlite")
+
+
+def cache_ttl() -> float:
+    return float(os.getenv("SF_QUERY_CACHE_TTL", DEFAULT_TTL))
+
+
+def cache_max_bytes() -> int:
+    return int(float(os.getenv("SF_QUERY_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+def normalize_soql(soql: str) -> str:
+    """SOQL with whitespace collapsed and everything outside string literals lower-cased."""
+    out, last = [], 0
+    for m in _QUOTED.finditer(soql):
+        out.append(_normalize_clause(soql[last:m.start()]))
+        out.append(m.group(0))
+        last = m.end()
+    out.append(_normalize_clause(soql[last:]))
+    return " ".join(p for p in out if p)
+
+
+def _normalize_clause(text: str) -> str:
+    return re.sub(r"\s*([(),=<>])\s*", r"\1", " ".join(text.split()).lower())
+
+
+def objects_read(soql: str) -> set:
+    """Objects whose changes can change the result of ``soql`` (``"*"`` when one cannot be mapped)."""
+    text = _QUOTED.sub("''", soql)
+    objects = set()
+    for semi_join, name in _SUBQUERY.findall(text):
+        objects.add(name if semi_join else CHILD_RELATIONSHIPS.get(name, ANY))
+    main = re.sub(r"\(\s*SELECT\b[^()]*\)", "", text, flags=re.I)
+    m = _FROM.search(main)
+    if m:
+        objects.add(m.group(1))
+    for name in _PATH.findall(main):
+        if m and name == m.group(1):
+            continue  # Lead.Email: the object's own name as a prefix
+        objects.update(PARENT_RELATIONSHIPS.get(name, [ANY]))
+    return objects or {ANY}
+
+
+def written_objects(method: str, url: str, kwargs: dict):
+    """Objects a write call may change; None for calls that do not write (GETs, queries)."""
+    if method in ("GET", "HEAD") or "/services/data/" not in url:
+        return None
+    from sf_trace import _api_parts, request_objects
+
+    parts = _api_parts(url)
+    if parts[0] in ("query", "queryAll") or parts[:2] == ["jobs", "query"]:
+        return None
+    if parts == ["composite"]:
+        body = kwargs.get("json") if isinstance(kwargs.get("json"), dict) else {}
+        subrequests = [s for s in body.get("compositeRequest") or [] if s.get("method", "GET") != "GET"]
+        if not subrequests:
+            return None
+        kwargs = {"json": {"compositeRequest": subrequests}}
+    return request_objects(url, kwargs) or [ANY]
+
+
+class QueryCache:
+    """One org's query cache; safe to share between threads and processes."""
+
+    def __init__(self, path: Path, max_bytes: int = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = cache_max_bytes() if max_bytes is None else max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(DDL)
+
+    @staticmethod
+    def key(soql: str, include_deleted: bool = False, scope: str = "") -> str:
+        return cache_key(scope, "queryAll" if include_deleted else "query", normalize_soql(soql))
+
+    def get(self, key: str):
+        """The cached result for ``key`` (one page holding every record), or None when missing or expired."""
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT result, pages, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[2] <= now:
+                self._count(misses=1)
+                return None
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self._count(hits=1, calls_saved=row[1])
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, soql: str, result: dict, pages: int, ttl: float) -> bool:
+        """Store a complete result; returns False when it is too large to keep."""
+        blob = zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"), 1)
+        if len(blob) > self.max_bytes * MAX_ENTRY_SHARE:
+            return False
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entry_objects WHERE key = ?", (key,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, soql, result, size, pages, created_at, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (key, soql, blob, len(blob), pages, now, now + ttl, now))
+            self.conn.executemany("INSERT OR IGNORE INTO entry_objects (key, sobject) VALUES (?, ?)",
+                                  [(key, name.lower()) for name in objects_read(soql)])
+            self._count(stored=1)
+            self._evict(now)
+        return True
+
+    def _evict(self, now: float) -> None:
+        expired = [r[0] for r in self.conn.execute("SELECT key FROM entries WHERE expires_at <= ?", (now,))]
+        self._delete(expired)
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        self._delete(victims)
+        self._count(evicted=len(victims))
+
+    def _delete(self, keys: list) -> None:
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            self.conn.execute(f"DELETE FROM entries WHERE key IN ({marks})", chunk)
+            self.conn.execute(f"DELETE FROM entry_objects WHERE key IN ({marks})", chunk)
+
+    def invalidate(self, objects) -> int:
+        """Drop cached queries reading any of ``objects`` (``"*"`` drops everything). Returns the count."""
+        names = {str(o).lower() for o in objects}
+        with self.lock, self.conn:
+            if ANY in names:
+                keys = [r[0] for r in self.conn.execute("SELECT key FROM entries")]
+            else:
+                names.add(ANY)
+                marks = ",".join("?" * len(names))
+                keys = [r[0] for r in self.conn.execute(
+                    f"SELECT DISTINCT key FROM entry_objects WHERE sobject IN ({marks})", sorted(names))]
+            self._delete(keys)
+            self._count(invalidated=len(keys))
+        return len(keys)
+
+    def _count(self, **deltas) -> None:
+        self.conn.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            [(name, n, n) for name, n in deltas.items() if n])
+
+    def stats(self) -> dict:
+        with self.lock:
+            counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {"path": str(self.path), "entries": entries, "size_mb": round(size / 1048576, 2),
+                "max_mb": round(self.max_bytes / 1048576, 2), "hits": counters.get("hits", 0),
+                "misses": counters.get("misses", 0),
+                "hit_rate": round(counters.get("hits", 0) / lookups, 3) if lookups else None,
+                "api_calls_saved": counters.get("calls_saved", 0), "stored": counters.get("stored", 0),
+                "invalidated": counters.get("invalidated", 0), "evicted": counters.get("evicted", 0)}
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def open_query_cache(client) -> QueryCache:
+    return QueryCache(cache_db(client.base_url))
+
+
+def cache_scope(client) -> str:
+    """What besides the SOQL decides a result: the org, the API version and who is asking."""
+    return "\x1f".join([client.base_url, client.api_version, os.getenv("SF_CLIENT_ID", "")])
+
+
+def cached_pages(cache: QueryCache, client, soql: str, fetch, include_deleted: bool = False, ttl: float = None):
+    """Result pages of ``soql``: one page from the cache, or ``fetch()``'s pages, stored once complete.
+
+    A result is only stored when it was read to the end (a consumer stopping early
+    leaves it uncached) and stays within the size limits.
+    """
+    key = cache.key(soql, include_deleted, cache_scope(client))
+    hit = cache.get(key)
+    if hit is not None:
+        yield hit
+        return
+    records, pages, total = [], 0, 0
+    for page in fetch():
+        pages += 1
+        total = page.get("totalSize", total)
+        if records is not None:
+            records.extend(page.get("records", []))
+            if len(records) > MAX_ENTRY_RECORDS:
+                records = None
+        yield page
+    if records is not None:
+        cache.put(key, soql, {"totalSize": total, "done": True, "records": records}, pages,
+                  cache_ttl() if ttl is None else ttl)
+
+
+_paths, _open = {}, {}
+
+
+def note_write(base: str, method: str, url: str, kwargs: dict) -> None:
+    """Invalidate the org's cache (when there is one) for a write sent through the client."""
+    path = _paths.get(base)
+    if path is None:
+        path = _paths[base] = cache_db(base)
+    if not path.exists():
+        return
+    objects = written_objects(method, url, kwargs)
+    if objects:
+        # One connection per org for the life of the process; batch runs write thousands of times
+        cache = _open.get(path)
+        if cache is None:
+            cache = _open.setdefault(path, QueryCache(path))
+        cache.invalidate(objects)
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Inspect and maintain the SOQL query result cache.")
+    p.add_argument("--db", help="Cache path (default: SF_QUERY_CACHE_DB or the per-org cache under SF_CACHE_DIR)")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Hits, misses, API calls saved, size")
+    ls = sub.add_parser("list", help="Cached queries, most recently used first")
+    ls.add_argument("--limit", type=int, default=50)
+    inv = sub.add_parser("invalidate", help="Drop cached queries that read these objects")
+    inv.add_argument("objects", nargs="+", metavar="OBJECT")
+    sub.add_parser("clear", help="Drop every cached query and reset the counters")
+    args = p.parse_args(argv)
+
+    path = Path(args.db) if args.db else cache_db()
+    if not path.exists():
+        print(f"No query cache at {path}")
+        return
+    cache = QueryCache(path)
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "list":
+        now = time.time()
+        rows = cache.conn.execute("SELECT key, soql, size, pages, expires_at, last_used FROM entries "
+                                  "ORDER BY last_used DESC LIMIT ?", (args.limit,))
+        for key, soql, size, pages, expires_at, last_used in rows:
+            print(json.dumps({"soql": soql, "bytes": size, "pages": pages,
+                              "expires_in_s": round(expires_at - now), "idle_s": round(now - last_used)}))
+    elif args.command == "invalidate":
+        print(json.dumps({"invalidated": cache.invalidate(args.objects)}))
+    elif args.command == "clear":
+        with cache.conn:
+            cache.conn.execute("DELETE FROM entries")
+            cache.conn.execute("DELETE FROM entry_objects")
+            cache.conn.execute("DELETE FROM counters")
+        print(json.dumps({"cleared": True}))
+    cache.close()
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_query_cache", main)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Retry policy and API-limit-aware rate limiter for the shared client.
+Idempotent calls that hit a transient failure (connection reset, timeout,
+502/503/504, REQUEST_LIMIT_EXCEEDED from concurrency limits) are retried
+with jittered exponential backoff, within a retry budget so a failing org
+is not hammered. The limiter reads ``Sforce-Limit-Info`` from every response
+and slows down as the org's 24-hour API usage approaches a ceiling, then
+stops before it eats the allocation other integrations depend on.
+
+Settings (env):
+    SF_MAX_RETRIES      retries per call (default 4)
+    SF_RETRY_BASE       first backoff in seconds (default 0.5)
+    SF_RETRY_CAP        longest backoff in seconds (default 30)
+    SF_API_SLOWDOWN     usage fraction where throttling starts (default 0.75)
+    SF_API_CEILING      usage fraction where calls stop (default 0.9)
+    SF_API_MAX_DELAY    per-call delay just below the ceiling, seconds (default 2)
+"""
+
+import os
+import re
+import time
+import random
+import threading
+
+import requests
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "PATCH"}
+RETRY_STATUSES = {429, 502, 503, 504}
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+LIMIT_INFO_RE = re.compile(r"api-usage=(\d+)/(\d+)")
+
+
+def outcome_unknown(status_code: int) -> bool:
+    """A write answered with this status may or may not have been applied (request timeout, 5xx)."""
+    return status_code == 408 or status_code >= 500
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class RetryBudget:
+    """Allow retries up to ``ratio`` of all calls (plus a small floor), per client."""
+
+    def __init__(self, ratio: float = 0.2, floor: int = 10):
+        self.ratio = ratio
+        self.floor = floor
+        self.calls = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.retries >= self.floor + self.ratio * self.calls:
+                return False
+            self.retries += 1
+            return True
+
+
+class RetryPolicy:
+    """Decides whether a failed call is retried and how long to wait first."""
+
+    def __init__(self, max_retries: int = None, base: float = None, cap: float = None,
+                 budget: RetryBudget = None):
+        self.max_retries = int(os.getenv("SF_MAX_RETRIES", 4)) if max_retries is None else max_retries
+        self.base = _env_float("SF_RETRY_BASE", 0.5) if base is None else base
+        self.cap = _env_float("SF_RETRY_CAP", 30) if cap is None else cap
+        self.budget = budget or RetryBudget()
+
+    @staticmethod
+    def is_idempotent(method: str) -> bool:
+        return method.upper() in IDEMPOTENT_METHODS
+
+    @staticmethod
+    def retryable_response(r: requests.Response) -> bool:
+        if r.status_code in RETRY_STATUSES:
+            return True
+        if r.status_code == 403 and "REQUEST_LIMIT_EXCEEDED" in r.text:
+            # Concurrency limits clear up; the daily TotalRequests limit does not
+            return "TotalRequests" not in r.text
+        return False
+
+    def should_retry(self, attempt: int) -> bool:
+        return attempt < self.max_retries and self.budget.try_spend()
+
+    def delay(self, attempt: int, r: requests.Response = None) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when the server sends it."""
+        if r is not None and r.headers.get("Retry-After", "").isdigit():
+            return min(float(r.headers["Retry-After"]), self.cap)
+        return random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+
+class ApiLimiter:
+    """Tracks the org's daily API usage from Sforce-Limit-Info and paces calls near the ceiling."""
+
+    def __init__(self, slowdown: float = None, ceiling: float = None, max_delay: float = None):
+        self.slowdown = _env_float("SF_API_SLOWDOWN", 0.75) if slowdown is None else slowdown
+        self.ceiling = _env_float("SF_API_CEILING", 0.9) if ceiling is None else ceiling
+        self.max_delay = _env_float("SF_API_MAX_DELAY", 2) if max_delay is None else max_delay
+        self.used = None
+        self.limit = None
+
+    @property
+    def usage(self) -> float:
+        if not self.limit:
+            return 0.0
+        return self.used / self.limit
+
+    def observe(self, r: requests.Response) -> None:
+        m = LIMIT_INFO_RE.search(r.headers.get("Sforce-Limit-Info", ""))
+        if m:
+            self.used, self.limit = int(m.group(1)), int(m.group(2))
+
+    def wait_time(self) -> float:
+        usage = self.usage
+        if usage <= self.slowdown:
+            return 0.0
+        span = max(self.ceiling - self.slowdown, 1e-9)
+        return self.max_delay * min(1.0, (usage - self.slowdown) / span)
+
+    def before_request(self) -> None:
+        """Sleep in proportion to usage above the slowdown point; refuse calls past the ceiling."""
+        if self.limit and self.usage >= self.ceiling:
+            raise RuntimeError(
+                f"API usage {self.used}/{self.limit} is at the {self.ceiling:.0%} ceiling "
+                f"(SF_API_CEILING); stopping to protect the org's daily allocation"
+            )
+        delay = self.wait_time()
+        if delay:
+            time.sleep(delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(org: str) -> ApiLimiter:
+    """One limiter per org, shared by every client in the process."""
+    with _limiters_lock:
+        if org not in _limiters:
+            _limiters[org] = ApiLimiter()
+        return _limiters[org]
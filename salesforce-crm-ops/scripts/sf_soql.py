@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+SOQL building helpers: literal escaping, templates with typed placeholders,
+and ``WHERE field IN (...)`` lookups split into chunks that fit both the
+query URL and the SOQL length limit, run concurrently and merged back into
+one record stream.
+
+Usage (from another script in this directory):
+    from sf_soql import format_soql, query_in
+
+    soql = format_soql("SELECT Id FROM Lead WHERE Email = {} AND CreatedDate >= {}", email, since)
+    soql = format_soql("SELECT {:field} FROM Account WHERE Name LIKE '{:like}%'", ["Id", "Name"], "50% Ventures")
+
+    # 5,000 emails -> a handful of concurrent IN queries, records streamed back in chunk order
+    for rec in query_in(client, "SELECT Id, Email FROM Lead WHERE Email", emails):
+        print(rec["Id"], rec["Email"])
+"""
+
+import re
+import string
+import datetime
+from functools import partial
+from urllib.parse import quote_plus
+
+# GET query URLs must stay under the ~16K request-line limit; SOQL itself under 100K chars.
+MAX_QUERY_URL_CHARS = 12000
+MAX_SOQL_CHARS = 100000
+
+_ESCAPES = {"\\": "\\\\", "'": "\\'", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_ESCAPE = re.compile("|".join(re.escape(c) for c in _ESCAPES))
+_IDENTIFIER = re.compile(r"^[A-Za-z]\w*(\.[A-Za-z]\w*)*$")
+
+
+def quote(value) -> str:
+    """Quote a value as a SOQL string literal."""
+    return "'" + _ESCAPE.sub(lambda m: _ESCAPES[m.group()], str(value)) + "'"
+
+
+def literal(value) -> str:
+    """Render a Python value as a SOQL literal.
+
+    None is ``null``, booleans are ``true``/``false``, numbers are bare,
+    datetimes are UTC ``YYYY-MM-DDThh:mm:ssZ`` (naive ones are taken as UTC),
+    dates are ``YYYY-MM-DD``, lists/tuples/sets are ``(a,b,...)`` for ``IN``
+    and anything else is a quoted string.
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        text = repr(value)
+        return format(value, "f") if "e" in text else text
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return "(" + ",".join(literal(v) for v in value) + ")"
+    return quote(value)
+
+
+def identifiers(value) -> str:
+    """Field or object names (a string or a list), checked and joined with ``, ``."""
+    names = [value] if isinstance(value, str) else list(value)
+    for name in names:
+        if not _IDENTIFIER.match(str(name)):
+            raise ValueError(f"Not a SOQL field or object name: {name!r}")
+    return ", ".join(names)
+
+
+def like_text(value) -> str:
+    """Escape a value for use inside a quoted LIKE pattern, ``%`` and ``_`` matching literally."""
+    return quote(value)[1:-1].replace("%", "\\%").replace("_", "\\_")
+
+
+class _SoqlFormatter(string.Formatter):
+    def format_field(self, value, format_spec: str) -> str:
+        if format_spec == "":
+            return literal(value)
+        if format_spec == "field":
+            return identifiers(value)
+        if format_spec == "like":
+            return like_text(value)
+        raise ValueError(f"Unknown SOQL placeholder format: {format_spec!r} (expected field or like)")
+
+    def convert_field(self, value, conversion):
+        if conversion is not None:
+            raise ValueError("SOQL placeholders do not take !r/!s/!a conversions")
+        return value
+
+
+_formatter = _SoqlFormatter()
+
+
+def format_soql(template: str, *args, **kwargs) -> str:
+    """Fill ``{}``/``{name}`` placeholders with escaped SOQL literals.
+
+    ``{:field}`` inserts checked field or object names instead (a string or a
+    list); ``{:like}`` inserts escaped text for a quoted LIKE pattern in the
+    template (``Name LIKE '{:like}%'``). Literal braces are ``{{``/``}}``.
+    """
+    return _formatter.format(template, *args, **kwargs)
+
+
+def in_queries(prefix: str, values, suffix: str = ""):
+    """Yield ``prefix IN (...) suffix`` queries whose IN lists fit the URL and SOQL limits.
+
+    ``prefix`` ends with the field name, e.g. ``SELECT Id, Email FROM Lead WHERE Email``.
+    Values are rendered with ``literal``.
+    """
+    base_url_len = len(quote_plus(f"{prefix} IN () {suffix}"))
+    base_soql_len = len(prefix) + len(suffix) + 7
+    chunk, url_len, soql_len = [], base_url_len, base_soql_len
+    for value in values:
+        text = literal(value)
+        extra_url = len(quote_plus(text)) + 3  # "%2C"
+        extra_soql = len(text) + 1
+        if chunk and (url_len + extra_url > MAX_QUERY_URL_CHARS or soql_len + extra_soql > MAX_SOQL_CHARS):
+            yield f"{prefix} IN ({','.join(chunk)}) {suffix}".rstrip()
+            chunk, url_len, soql_len = [], base_url_len, base_soql_len
+        chunk.append(text)
+        url_len += extra_url
+        soql_len += extra_soql
+    if chunk:
+        yield f"{prefix} IN ({','.join(chunk)}) {suffix}".rstrip()
+
+
+def _fetch(client, soql: str) -> list:
+    from sf_query import query_records
+
+    return list(query_records(client, soql))
+
+
+def query_in(client, prefix: str, values, suffix: str = "", concurrency: int = None):
+    """Yield the records of ``prefix IN (...) suffix`` over all ``values``.
+
+    The IN list is split with ``in_queries``; with more than one chunk the
+    queries run concurrently (at most ``concurrency`` in flight, default
+    ``SF_CONCURRENCY``) and their records are yielded in chunk order. A failed
+    chunk raises RuntimeError, so a lookup never silently misses records.
+    """
+    queries = list(in_queries(prefix, values, suffix))
+    if len(queries) <= 1:
+        from sf_query import query_records
+
+        for soql in queries:
+            yield from query_records(client, soql)
+        return
+    from sf_async import default_concurrency, run_all
+
+    concurrency = min(len(queries), concurrency or default_concurrency())
+    client.resize_pool(concurrency)
+    outcomes = run_all([partial(_fetch, client, soql) for soql in queries], concurrency)
+    failed = [o["error"] for o in outcomes if not o["ok"]]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(queries)} IN query chunks failed: {failed[0]}")
+    for outcome in outcomes:
+        yield from outcome["result"]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Startup-time budget check for the sfops CLI.
+Runs dry-run and --help invocations in fresh interpreter processes (no
+daemon, no credentials) and fails if the median wall time of any of them
+exceeds the budget, or if any of them imports a module that only network
+calls need (requests, urllib3, yaml).
+
+Usage:
+    python3 sf_startup_bench.py                  # default budget, 7 runs per command
+    python3 sf_startup_bench.py --budget-ms 120 --runs 15
+    python3 sf_startup_bench.py --json           # machine-readable report
+
+Exit status: 0 within budget, 1 over budget or heavy imports found.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+CONFIG_DIR = SCRIPTS_DIR.parent / "config"
+
+DEFAULT_BUDGET_MS = 150
+DEFAULT_RUNS = 7
+
+# Modules a dry run or --help must never load.
+HEAVY_MODULES = {"requests", "urllib3", "yaml"}
+
+BENCHMARKS = {
+    "help": ["--help"],
+    "task --dry-run": ["task", "--config", str(CONFIG_DIR), "--subject", "Bench", "--due", "2026-01-01", "--dry-run"],
+    "opportunity --dry-run": ["opportunity", "--config", str(CONFIG_DIR), "--name", "Bench Seed",
+                              "--stage", "sourced", "--close-date", "2026-03-31", "--dry-run"],
+    "upsert-lead --dry-run": ["upsert-lead", "--config", str(CONFIG_DIR), "--last", "Bench",
+                              "--company", "Bench", "--dry-run"],
+    "query --help": ["query", "--help"],
+    "describe --help": ["describe", "--help"],
+    "token --help": ["token", "--help"],
+}
+
+
+def bench_env() -> dict:
+    """Caller's environment minus credentials and the daemon, so runs are in-process and offline."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith("SF_") or k == "SF_CACHE_DIR"}
+    env["SF_DAEMON"] = "0"
+    return env
+
+
+def time_run(args: list, env: dict) -> float:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, str(SCRIPTS_DIR / "sfops.py")] + args, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"sfops {' '.join(args)} exited {proc.returncode}: {proc.stderr.decode()[-500:]}")
+    return elapsed
+
+
+def time_interpreter(env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def heavy_imports(args: list, env: dict) -> list:
+    """Top-level packages from HEAVY_MODULES that the command imports (via -X importtime)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(SCRIPTS_DIR / "sfops.py")] + args, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    found = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:"):
+            name = line.rsplit("|", 1)[-1].strip().split(".")[0]
+            if name in HEAVY_MODULES:
+                found.add(name)
+    return sorted(found)
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Fail if sfops cold start for dry-run/--help exceeds a time budget.")
+    p.add_argument("--budget-ms", type=float, default=float(os.getenv("SF_STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)),
+                   help=f"Allowed median wall time per command (default {DEFAULT_BUDGET_MS}, or SF_STARTUP_BUDGET_MS)")
+    p.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Fresh processes per command")
+    p.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = p.parse_args(argv)
+
+    env = bench_env()
+    time_run(["--help"], env)  # warm the OS file cache and the compiled config cache
+    time_run(BENCHMARKS["task --dry-run"], env)
+
+    baseline = statistics.median(time_interpreter(env) for _ in range(args.runs))
+    report, failed = [], False
+    for name, cmd in BENCHMARKS.items():
+        times = [time_run(cmd, env) for _ in range(args.runs)]
+        median = statistics.median(times)
+        heavy = heavy_imports(cmd, env)
+        ok = median <= args.budget_ms and not heavy
+        failed |= not ok
+        report.append({"command": name, "median_ms": round(median, 1), "max_ms": round(max(times), 1),
+                       "heavy_imports": heavy, "ok": ok})
+
+    if args.json:
+        print(json.dumps({"budget_ms": args.budget_ms, "interpreter_ms": round(baseline, 1),
+                          "results": report, "ok": not failed}, indent=2))
+    else:
+        print(f"budget {args.budget_ms:.0f} ms; bare interpreter {baseline:.1f} ms")
+        for r in report:
+            flag = "ok" if r["ok"] else "FAIL"
+            extra = f"  imports {', '.join(r['heavy_imports'])}" if r["heavy_imports"] else ""
+            print(f"  {flag:4} {r['command']:24} median {r['median_ms']:7.1f} ms  max {r['max_ms']:7.1f} ms{extra}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Incremental local mirror of Leads, Accounts, Opportunities and Tasks in SQLite.
+The first run loads each object in full; later runs fetch only records whose
+SystemModstamp is past the object's watermark and remove records reported
+by the getDeleted resource. Each result page is upserted in one transaction
+together with the new watermark, so an interrupted sync resumes where it
+stopped.
+
+Pipeline reviews, dedupe and recheck-date scans can then query the mirror
+locally (``--sql``) instead of spending API calls through sf_query.py.
+
+Usage:
+    # Sync all four objects (first run loads everything)
+    python3 sf_sync.py
+
+    # Only some objects, with extra fields mirrored
+    python3 sf_sync.py --objects Lead Opportunity --fields Opportunity=Recheck_Date__c,Pass_Reason__c
+
+    # Reload an object from scratch (also drops rows deleted since)
+    python3 sf_sync.py --objects Account --full
+
+    # Show the SOQL each object would run, and the watermarks
+    python3 sf_sync.py --dry-run
+    python3 sf_sync.py --status
+
+    # Query the mirror
+    python3 sf_sync.py --sql "SELECT Name, StageName, CloseDate FROM Opportunity WHERE IsClosed = 0"
+
+Library use (from another script in this directory):
+    from sf_sync import connect, mirror_path, query_local
+
+    conn = connect(mirror_path())
+    rows = query_local(conn, 'SELECT Id, Email FROM Lead WHERE Email LIKE ?', ("%@example.ai",))
+
+Settings (env):
+    SF_MIRROR_DB        mirror database path (default: mirror/<org key>.sqlite under SF_CACHE_DIR)
+    SF_SYNC_OVERLAP     seconds re-read before each watermark to catch late commits (default 300)
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+from pathlib import Path
+
+from sf_cache import cache_key, cache_path
+from sf_config import load_config
+
+MIRRORED_OBJECTS = ("Lead", "Account", "Opportunity", "Task")
+
+# Standard fields mirrored for every object; field_map.yaml fields are added on top.
+BASE_FIELDS = {
+    "Lead": ["Id", "FirstName", "LastName", "Company", "Email", "Title", "Website", "Status", "LeadSource",
+             "IsConverted", "ConvertedAccountId", "ConvertedOpportunityId", "OwnerId"],
+    "Account": ["Id", "Name", "Website", "Type", "Industry", "OwnerId"],
+    "Opportunity": ["Id", "Name", "AccountId", "StageName", "CloseDate", "Amount", "Probability", "NextStep",
+                    "IsClosed", "IsWon", "OwnerId"],
+    "Task": ["Id", "Subject", "ActivityDate", "Status", "Priority", "WhatId", "WhoId", "IsClosed", "OwnerId"],
+}
+AUDIT_FIELDS = ["CreatedDate", "LastModifiedDate", "SystemModstamp"]
+
+# getDeleted only reaches back 30 days; older watermarks need a full reload.
+DELETED_WINDOW_DAYS = 29
+DEFAULT_OVERLAP = 300
+PAGE_SIZE = 2000
+
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS _sync_state (
+    object TEXT PRIMARY KEY,
+    watermark TEXT,
+    deleted_watermark TEXT,
+    fields TEXT,
+    run INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+)
+"""
+
+
+def mirror_path() -> Path:
+    if os.getenv("SF_MIRROR_DB"):
+        return Path(os.environ["SF_MIRROR_DB"])
+    from sf_client import base_url
+
+    return cache_path("mirror", cache_key(base_url()) + ".sqlite")
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open the mirror (WAL mode, so local readers never block a running sync)."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(STATE_DDL)
+    return conn
+
+
+def connect_readonly(path: Path) -> sqlite3.Connection:
+    """Open an existing mirror for reading only (ad-hoc --sql cannot change rows or watermarks)."""
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    # ATTACH would open (or create) other database files writable
+    conn.set_authorizer(lambda action, *_: sqlite3.SQLITE_DENY if action == sqlite3.SQLITE_ATTACH else sqlite3.SQLITE_OK)
+    return conn
+
+
+def query_local(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    """Run a read query against the mirror and return plain dicts."""
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def parse_sf_datetime(value: str) -> datetime.datetime:
+    """Parse Salesforce's ``2026-01-05T10:00:00.000+0000`` datetime format."""
+    return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def soql_datetime(value: datetime.datetime) -> str:
+    return value.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def mirror_fields(config: dict, obj: str, extra: list = None, describe: dict = None) -> list:
+    """Fields to mirror for ``obj``: standard fields, field_map.yaml fields, then ``extra``.
+
+    With a cached ``describe``, fields the org does not have are left out
+    instead of failing the query (Id, the audit fields and ``extra`` are always kept).
+    """
+    mapped = config["field_map"].get(obj.lower(), {}).values()
+    fields = list(dict.fromkeys(BASE_FIELDS[obj] + list(mapped) + (extra or []) + AUDIT_FIELDS))
+    if describe:
+        known = {f["name"] for f in describe["fields"]}
+        keep = {"Id", *AUDIT_FIELDS, *(extra or [])}
+        fields = [f for f in fields if "." in f or f in known or f in keep]
+    return fields
+
+
+def read_state(conn: sqlite3.Connection, obj: str) -> dict:
+    row = conn.execute("SELECT * FROM _sync_state WHERE object = ?", (obj,)).fetchone()
+    return dict(row) if row else {"object": obj, "watermark": None, "deleted_watermark": None,
+                                  "fields": None, "run": 0, "synced_at": None}
+
+
+def ensure_table(conn: sqlite3.Connection, obj: str, fields: list) -> bool:
+    """Create the object's table or add missing columns. Returns True if columns were added."""
+    existing = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(obj)})")]
+    if not existing:
+        columns = ", ".join(f"{_quote(f)}" for f in fields if f != "Id")
+        conn.execute(f"CREATE TABLE {_quote(obj)} (Id TEXT PRIMARY KEY, {columns}, _run INTEGER)")
+        return False
+    added = [f for f in fields if f not in existing]
+    for f in added:
+        conn.execute(f"ALTER TABLE {_quote(obj)} ADD COLUMN {_quote(f)}")
+    return bool(added)
+
+
+def needs_full_sync(state: dict, columns_added: bool, now: datetime.datetime) -> bool:
+    if not state["watermark"] or not state["deleted_watermark"] or columns_added:
+        return True
+    age = now - datetime.datetime.fromisoformat(state["deleted_watermark"])
+    return age > datetime.timedelta(days=DELETED_WINDOW_DAYS)
+
+
+def sync_soql(obj: str, fields: list, watermark: str = None, overlap: float = DEFAULT_OVERLAP) -> str:
+    soql = f"SELECT {', '.join(fields)} FROM {obj}"
+    if watermark:
+        since = parse_sf_datetime(watermark) - datetime.timedelta(seconds=overlap)
+        soql += f" WHERE SystemModstamp > {soql_datetime(since)}"
+    return soql + " ORDER BY SystemModstamp ASC"
+
+
+def fetch_deleted(client, obj: str, start: datetime.datetime, end: datetime.datetime) -> tuple:
+    """IDs deleted in [start, end] via the getDeleted resource, and the latest date it covered."""
+    r = client.get(f"sobjects/{obj}/deleted/", params={
+        "start": start.astimezone(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "end": end.astimezone(datetime.timezone.utc).isoformat(timespec="seconds"),
+    })
+    if r.status_code >= 400:
+        raise RuntimeError(f"getDeleted {obj} failed ({r.status_code}): {r.text}")
+    body = r.json()
+    ids = [d["id"] for d in body.get("deletedRecords", [])]
+    covered = body.get("latestDateCovered")
+    return ids, parse_sf_datetime(covered) if covered else end
+
+
+def sync_object(client, conn: sqlite3.Connection, obj: str, fields: list, full: bool = False,
+                overlap: float = DEFAULT_OVERLAP, verbose: bool = False) -> dict:
+    """Bring one object's table up to date. Returns a summary dict."""
+    from sf_query import flatten, query_pages
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    state = read_state(conn, obj)
+    with conn:
+        columns_added = ensure_table(conn, obj, fields)
+    known = json.loads(state["fields"]) if state["fields"] else []
+    full = full or needs_full_sync(state, columns_added or any(f not in known for f in fields), now)
+    run = state["run"] + 1 if full else state["run"]
+    watermark = None if full else state["watermark"]
+
+    columns = fields + ["_run"]
+    updates = ", ".join(f"{_quote(f)} = excluded.{_quote(f)}" for f in columns if f != "Id")
+    upsert_sql = (
+        f"INSERT INTO {_quote(obj)} ({', '.join(_quote(f) for f in columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)}) ON CONFLICT(Id) DO UPDATE SET {updates}"
+    )
+    state_sql = (
+        "INSERT INTO _sync_state (object, watermark, deleted_watermark, fields, run, synced_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(object) DO UPDATE SET watermark = excluded.watermark, "
+        "deleted_watermark = excluded.deleted_watermark, fields = excluded.fields, run = excluded.run, "
+        "synced_at = excluded.synced_at"
+    )
+    # A full load restarts the delete window at its own start time. Until it completes, pages
+    # clear the delete watermark, so an interrupted full load (an explicit --full included) is redone.
+    deleted_since = now if full else datetime.datetime.fromisoformat(state["deleted_watermark"])
+    deleted_mark = deleted_since.isoformat() if full else state["deleted_watermark"]
+    page_state = (None, state["fields"]) if full else (deleted_mark, json.dumps(fields))
+
+    soql = sync_soql(obj, fields, watermark, overlap)
+    if verbose:
+        print(f"[{obj}] {'full' if full else 'incremental'}: {soql}", file=sys.stderr)
+
+    upserted = 0
+    new_watermark = state["watermark"] if not full else None
+    for page in query_pages(client, soql, batch_size=PAGE_SIZE):
+        records = [flatten(r) for r in page.get("records", [])]
+        if not records:
+            continue
+        rows = [[rec.get(f) for f in fields] + [run] for rec in records]
+        new_watermark = records[-1]["SystemModstamp"]
+        with conn:  # page and watermark commit together
+            conn.executemany(upsert_sql, rows)
+            conn.execute(state_sql, (obj, new_watermark, *page_state, run, time.time()))
+        upserted += len(rows)
+
+    deleted = 0
+    with conn:
+        if full:
+            # Anything not seen by this full load was deleted (or is otherwise gone)
+            deleted = conn.execute(f"DELETE FROM {_quote(obj)} WHERE _run IS NOT ?", (run,)).rowcount
+        else:
+            ids, covered = fetch_deleted(client, obj, deleted_since, now)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                deleted += conn.execute(
+                    f"DELETE FROM {_quote(obj)} WHERE Id IN ({', '.join('?' for _ in chunk)})", chunk
+                ).rowcount
+            deleted_mark = covered.isoformat()
+        conn.execute(state_sql, (obj, new_watermark, deleted_mark, json.dumps(fields), run, time.time()))
+
+    return {"object": obj, "mode": "full" if full else "incremental", "upserted": upserted, "deleted": deleted,
+            "watermark": new_watermark}
+
+
+def status(conn: sqlite3.Connection) -> list:
+    out = []
+    for obj in MIRRORED_OBJECTS:
+        state = read_state(conn, obj)
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (obj,)).fetchone()
+        rows = conn.execute(f"SELECT COUNT(*) FROM {_quote(obj)}").fetchone()[0] if exists else 0
+        out.append({"object": obj, "rows": rows, "watermark": state["watermark"],
+                    "deleted_watermark": state["deleted_watermark"], "synced_at": state["synced_at"]})
+    return out
+
+
+def parse_extra_fields(values: list) -> dict:
+    """``--fields Opportunity=A__c,B__c`` (repeatable) -> {"Opportunity": ["A__c", "B__c"]}."""
+    extra = {}
+    for value in values or []:
+        obj, _, names = value.partition("=")
+        if obj not in MIRRORED_OBJECTS or not names:
+            print(f"Error: --fields expects Object=Field1,Field2 with Object one of {', '.join(MIRRORED_OBJECTS)}",
+                  file=sys.stderr)
+            sys.exit(2)
+        extra.setdefault(obj, []).extend(f.strip() for f in names.split(",") if f.strip())
+    return extra
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Mirror Leads, Accounts, Opportunities and Tasks into local SQLite.")
+    p.add_argument("--objects", nargs="+", choices=MIRRORED_OBJECTS, default=list(MIRRORED_OBJECTS),
+                   help="Objects to sync (default: all four)")
+    p.add_argument("--fields", action="append", metavar="OBJECT=F1,F2",
+                   help="Extra fields to mirror for an object (repeatable)")
+    p.add_argument("--full", action="store_true", help="Reload the objects from scratch")
+    p.add_argument("--db", help="Mirror database path (default: SF_MIRROR_DB or per-org file under SF_CACHE_DIR)")
+    p.add_argument("--status", action="store_true", help="Show row counts and watermarks, then exit")
+    p.add_argument("--sql", help="Run a read-only SQL query against the mirror and print the rows as JSON")
+    p.add_argument("--config", default="./config", help="Path to config directory")
+    p.add_argument("--dry-run", action="store_true", help="Print the SOQL each object would run; no API calls")
+    p.add_argument("--verbose", action="store_true", help="Log each object's query to stderr")
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
+
+    path = Path(args.db) if args.db else mirror_path()
+    if args.sql:
+        if not path.exists():
+            print(f"Error: no mirror at {path} (run sf_sync.py first)", file=sys.stderr)
+            sys.exit(2)
+        conn = connect_readonly(path)
+        try:
+            print(json.dumps(query_local(conn, args.sql), indent=2, default=str))
+        except sqlite3.Error as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        finally:
+            conn.close()
+        return
+    conn = connect(path)
+    if args.status:
+        print(json.dumps({"db": str(path), "objects": status(conn)}, indent=2))
+        return
+
+    config = load_config(args.config)
+    extra = parse_extra_fields(args.fields)
+    overlap = float(os.getenv("SF_SYNC_OVERLAP", DEFAULT_OVERLAP))
+
+    # Cached describes (no API calls) trim fields the org does not have
+    describes = None
+    if os.getenv("SF_BASE_URL"):
+        from sf_client import api_version, base_url
+        from sf_describe import DescribeCache
+
+        describes = DescribeCache(base_url=base_url(), api_version=api_version(), offline=True)
+
+    def fields_for(obj: str) -> list:
+        return mirror_fields(config, obj, extra.get(obj), describes.cached(obj) if describes else None)
+
+    if args.dry_run:
+        print("=== DRY RUN MODE ===")
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for obj in args.objects:
+            state = read_state(conn, obj)
+            fields = fields_for(obj)
+            known = json.loads(state["fields"]) if state["fields"] else []
+            full = args.full or needs_full_sync(state, any(f not in known for f in fields), now)
+            soql = sync_soql(obj, fields, None if full else state["watermark"], overlap)
+            print(json.dumps({"object": obj, "mode": "full" if full else "incremental", "soql": soql}))
+        return
+
+    from sf_client import get_client
+
+    client = get_client()
+    failed = False
+    for obj in args.objects:
+        fields = fields_for(obj)
+        try:
+            summary = sync_object(client, conn, obj, fields, args.full, overlap, args.verbose)
+        except RuntimeError as e:
+            failed = True
+            summary = {"object": obj, "error": str(e)}
+        print(json.dumps(summary))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_sync", main)
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Request-level tracing for the shared client.
+When enabled, every API call made through sf_client (and token requests in
+sf_auth) is recorded as a span: method, path template, object, status,
+bytes, attempts and retry reasons, ``Sforce-Limit-Info`` usage, and the
+latency split into phases:
+
+    auth      getting or refreshing the access token
+    limiter   pacing waits imposed by the API usage limiter
+    connect   DNS lookup + TCP connect (0 when a pooled connection is reused)
+    tls       TLS handshake
+    server    request sent until response headers arrived (upload + Salesforce time)
+    download  reading the response body (plus client-side overhead)
+    backoff   sleeping between retries
+
+Spans are written as JSONL as they complete, followed by a summary record
+(p50/p95 per route, calls per object, phase totals, API units consumed);
+the summary is also printed to stderr when the process exits.
+
+Enable with ``--trace`` on any script that calls the API, or the SF_TRACE
+env var (which also reaches scripts run from pipelines):
+    SF_TRACE=1              spans to SF_CACHE_DIR/traces/<script>-<time>-<pid>.jsonl
+    SF_TRACE=run.jsonl      spans appended to run.jsonl (one file for a whole job)
+
+Traced runs always execute in-process (never forwarded to sfopsd), so the
+numbers describe the call being investigated.
+
+Usage:
+    python3 sf_upsert_lead.py --input leads.csv --trace
+    SF_TRACE=job.jsonl ./nightly_pipeline.sh
+    python3 sf_trace.py job.jsonl                        # summary across every script in the job
+    python3 sf_trace.py job.jsonl --script sf_sync.py    # one script's spans
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+
+# A Salesforce record/job ID as a path segment (15 or 18 chars, contains a digit).
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$")
+_FROM_RE = re.compile(r"\bFROM\s+(\w+)", re.I)
+_VERSION_PREFIX = re.compile(r"^/services/data/v\d+\.\d+/")
+_LIMIT_INFO_RE = re.compile(r"api-usage=(\d+)/(\d+)")
+
+PHASES = ("auth", "limiter", "connect", "tls", "server", "download", "backoff")
+
+_local = threading.local()
+_tracer = None
+_env_checked = False
+_patched = False
+
+
+def _api_parts(url: str) -> list:
+    """Path segments of a call relative to the data API, e.g. ``["sobjects", "Lead", "describe"]``."""
+    path = url.split("?", 1)[0]
+    if "://" in path:
+        path = "/" + path.split("://", 1)[1].partition("/")[2]
+    return _VERSION_PREFIX.sub("", path).strip("/").split("/")
+
+
+def route_template(method: str, url: str) -> str:
+    """``GET sobjects/Lead/{id}``-style key: IDs, query locators and external ID values become placeholders."""
+    parts = _api_parts(url)
+    if parts[:2] == ["services", "oauth2"]:
+        return f"{method} oauth2/token"
+    if parts[0] in ("query", "queryAll") and len(parts) > 1:
+        return f"{method} {parts[0]}/{{locator}}"
+    if parts[0] == "sobjects" and len(parts) == 4 and parts[3] not in ("describe", "deleted", "updated"):
+        parts[3] = "{value}"
+    return f"{method} " + "/".join("{id}" if _ID_SEGMENT.match(p) else p for p in parts)
+
+
+def request_objects(url: str, kwargs: dict) -> list:
+    """sObject names a call touches, from the path, the SOQL or the JSON body."""
+    parts = _api_parts(url)
+    if parts[0] in ("query", "queryAll") and len(parts) == 1:
+        m = _FROM_RE.search((kwargs.get("params") or {}).get("q", ""))
+        return [m.group(1)] if m else []
+    if parts[0] == "sobjects" and len(parts) > 1:
+        return [parts[1]]
+    body = kwargs.get("json") if isinstance(kwargs.get("json"), dict) else {}
+    if parts[:2] == ["composite", "sobjects"]:
+        if len(parts) > 2:
+            return [parts[2]]
+        return sorted({(r.get("attributes") or {}).get("type") for r in body.get("records") or []} - {None})
+    if parts == ["composite"]:
+        urls = [sub.get("url", "") for sub in body.get("compositeRequest") or []]
+        return sorted({u.split("/sobjects/", 1)[1].split("/", 1)[0] for u in urls if "/sobjects/" in u})
+    if parts[0] == "jobs" and body.get("object"):
+        return [body["object"]]
+    return []
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def _install_connection_timers() -> None:
+    """Time new connections (DNS + TCP, then TLS) for the calling thread's current span."""
+    global _patched
+    if _patched:
+        return
+    import urllib3.connection
+    import urllib3.util.connection
+
+    create_connection = urllib3.util.connection.create_connection
+
+    def timed_create_connection(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return create_connection(*args, **kwargs)
+        finally:
+            _add_phase("connect", start)
+
+    def timed_connect(connect):
+        def wrapper(self):
+            start = time.perf_counter()
+            before = getattr(_local, "phases", {}).get("connect", 0.0)
+            try:
+                return connect(self)
+            finally:
+                phases = getattr(_local, "phases", None)
+                if phases is not None:
+                    tcp = phases.get("connect", 0.0) - before
+                    phases["tls"] = phases.get("tls", 0.0) + (time.perf_counter() - start) * 1000 - tcp
+        return wrapper
+
+    urllib3.util.connection.create_connection = timed_create_connection
+    urllib3.connection.HTTPSConnection.connect = timed_connect(urllib3.connection.HTTPSConnection.connect)
+    _patched = True
+
+
+def _add_phase(name: str, start: float) -> None:
+    phases = getattr(_local, "phases", None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+class Span:
+    """One logical API call (all of its attempts). Phases are in milliseconds."""
+
+    def __init__(self, tracer: "Tracer", method: str, url: str, kwargs: dict):
+        self.tracer = tracer
+        self.record = {"type": "span", "ts": round(time.time(), 4), "method": method,
+                       "route": route_template(method, url), "objects": request_objects(url, kwargs),
+                       "status": None, "bytes_out": 0, "bytes_in": 0, "attempts": 0, "retries": []}
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.start = time.perf_counter()
+        self.outer = getattr(_local, "phases", None)  # a token request inside another call's span
+        _local.phases = self.phases
+
+    def add(self, phase: str, start: float) -> None:
+        self.phases[phase] += (time.perf_counter() - start) * 1000
+
+    def begin(self) -> tuple:
+        """Mark the start of an attempt; pass the result to ``attempt``."""
+        return time.perf_counter(), self.phases["auth"], self.phases["connect"], self.phases["tls"]
+
+    def attempt(self, begun: tuple, r=None, error: Exception = None, stream: bool = False) -> None:
+        """Account for one attempt (from ``begin``) that got response ``r`` or raised ``error``."""
+        self.record["attempts"] += 1
+        if error is not None:
+            self.record["error"] = type(error).__name__
+            return
+        started, auth, connect, tls = begun
+        total = (time.perf_counter() - started) * 1000
+        waited = r.elapsed.total_seconds() * 1000
+        setup = (self.phases["connect"] - connect) + (self.phases["tls"] - tls)
+        self.phases["server"] += max(0.0, waited - setup)
+        self.phases["download"] += max(0.0, total - waited - (self.phases["auth"] - auth))
+        self.record.pop("error", None)
+        self.record["status"] = r.status_code
+        body = r.request.body if r.request is not None else None
+        self.record["bytes_out"] += len(body) if isinstance(body, (bytes, str)) else 0
+        if stream:
+            self.record["bytes_in"] += int(r.headers.get("Content-Length") or 0)
+        else:
+            self.record["bytes_in"] += len(r.content or b"")
+        m = _LIMIT_INFO_RE.search(r.headers.get("Sforce-Limit-Info", ""))
+        if m:
+            self.record["api_usage"] = [int(m.group(1)), int(m.group(2))]
+        if self.record["route"].split(" ", 1)[1].startswith(("query", "queryAll")) and not stream:
+            self.tracer.note_locator(self, r.url, r.content)
+
+    def retry(self, reason) -> None:
+        self.record["retries"].append(str(reason))
+
+    def finish(self) -> None:
+        _local.phases = self.outer
+        self.record["ms"] = round((time.perf_counter() - self.start) * 1000, 2)
+        self.record["phases"] = {k: round(v, 2) for k, v in self.phases.items() if v}
+        if not self.record["retries"]:
+            del self.record["retries"]
+        self.tracer.finish(self.record)
+
+
+class _NoSpan:
+    """Stand-in used when tracing is off, so the client needs no branches."""
+
+    def add(self, phase, start):
+        pass
+
+    def begin(self):
+        return None
+
+    def attempt(self, begun, r=None, error=None, stream=False):
+        pass
+
+    def retry(self, reason):
+        pass
+
+    def finish(self):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Collects one process's spans, appends them to ``path`` and summarizes them at exit."""
+
+    def __init__(self, path: str, script: str = None):
+        self.path = path
+        self.script = script or os.path.basename(sys.argv[0] or "python")
+        self.spans = []
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.cursor_objects = {}
+        self.out = open(path, "a", encoding="utf-8")
+        self.closed = False
+
+    def span(self, method: str, url: str, kwargs: dict) -> Span:
+        return Span(self, method, url, kwargs)
+
+    def note_locator(self, span: Span, url: str, content: bytes) -> None:
+        """Attribute follow-up query pages to the object of the query that opened the cursor."""
+        parts = _api_parts(url)
+        if len(parts) > 1:
+            with self.lock:
+                span.record["objects"] = self.cursor_objects.get(parts[1].split("-", 1)[0], [])
+            return
+        at = content.find(b'"nextRecordsUrl"') if content and span.record["objects"] else -1
+        if at >= 0:
+            cursor = content[at:at + 200].split(b'"')[3].rsplit(b"/", 1)[-1].split(b"-", 1)[0].decode()
+            with self.lock:
+                self.cursor_objects[cursor] = span.record["objects"]
+
+    def finish(self, record: dict) -> None:
+        record["script"] = self.script
+        with self.lock:
+            self.spans.append(record)
+            self.out.write(json.dumps(record) + "\n")
+            self.out.flush()
+
+    def summary(self) -> dict:
+        with self.lock:
+            spans = list(self.spans)
+        return summarize(spans, wall_ms=(time.perf_counter() - self.started) * 1000, script=self.script)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        summary = self.summary()
+        self.out.write(json.dumps(summary) + "\n")
+        self.out.close()
+        print(format_summary(summary) + f"\n  spans: {self.path}", file=sys.stderr)
+
+
+def summarize(spans: list, wall_ms: float = None, script: str = None) -> dict:
+    """Run summary of ``spans``: latency percentiles per route, calls per object, phases, API usage."""
+    routes, objects, phases = {}, {}, dict.fromkeys(PHASES, 0.0)
+    usage = [s["api_usage"] for s in spans if s.get("api_usage")]
+    for s in spans:
+        routes.setdefault(s["route"], []).append(s)
+        for name in s.get("objects") or ["(no object)"]:
+            objects[name] = objects.get(name, 0) + 1
+        for name, ms in (s.get("phases") or {}).items():
+            phases[name] += ms
+    api_ms = sum(s["ms"] for s in spans)
+    summary = {
+        "type": "summary", "script": script, "requests": len(spans),
+        "attempts": sum(s["attempts"] for s in spans),
+        "retries": sum(len(s.get("retries", [])) for s in spans),
+        "errors": sum(1 for s in spans if s.get("error") or (s.get("status") or 0) >= 400),
+        "api_ms": round(api_ms, 1),
+        "p50_ms": round(percentile([s["ms"] for s in spans], 50), 1),
+        "p95_ms": round(percentile([s["ms"] for s in spans], 95), 1),
+        "phases_ms": {k: round(v, 1) for k, v in phases.items() if v},
+        "routes": {
+            route: {"calls": len(items), "p50_ms": round(percentile([s["ms"] for s in items], 50), 1),
+                    "p95_ms": round(percentile([s["ms"] for s in items], 95), 1),
+                    "bytes_in": sum(s["bytes_in"] for s in items), "bytes_out": sum(s["bytes_out"] for s in items)}
+            for route, items in sorted(routes.items(), key=lambda kv: -sum(s["ms"] for s in kv[1]))
+        },
+        "objects": dict(sorted(objects.items(), key=lambda kv: -kv[1])),
+        # Every attempt that reached the org counts against the daily allocation
+        "api_units": sum(s["attempts"] for s in spans if not s["route"].endswith("oauth2/token")),
+    }
+    if usage:
+        summary["org_usage"] = {"first": usage[0][0], "last": usage[-1][0], "limit": usage[-1][1]}
+    if wall_ms is not None:
+        summary["wall_ms"] = round(wall_ms, 1)
+        summary["outside_api_ms"] = round(max(0.0, wall_ms - busy_ms(spans)), 1)
+    return summary
+
+
+def busy_ms(spans: list) -> float:
+    """Wall time during which at least one call was in flight (concurrent calls overlap)."""
+    total, end = 0.0, None
+    for start, stop in sorted((s["ts"] * 1000, s["ts"] * 1000 + s["ms"]) for s in spans):
+        if end is None or start > end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+    return total
+
+
+def format_summary(summary: dict) -> str:
+    wall = f"{summary['wall_ms'] / 1000:.2f} s wall, " if "wall_ms" in summary else ""
+    outside = f", {summary['outside_api_ms'] / 1000:.2f} s outside API calls" if "outside_api_ms" in summary else ""
+    lines = [f"trace: {summary['requests']} requests ({wall}{summary['api_ms'] / 1000:.2f} s in API calls{outside}); "
+             f"p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms; "
+             f"{summary['retries']} retries, {summary['errors']} errors"]
+    if summary["phases_ms"]:
+        lines.append("  phases: " + ", ".join(f"{k} {v:.0f} ms" for k, v in summary["phases_ms"].items() if v >= 0.5))
+    for route, r in summary["routes"].items():
+        lines.append(f"  {route:44} {r['calls']:6} calls  p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+                     f"{r['bytes_in'] / 1024:9.1f} KiB in")
+    if summary["objects"]:
+        lines.append("  objects: " + ", ".join(f"{k} {v}" for k, v in summary["objects"].items()))
+    usage = summary.get("org_usage")
+    org = f"; org usage {usage['first']} -> {usage['last']} of {usage['limit']}" if usage else ""
+    lines.append(f"  API units: {summary['api_units']}{org}")
+    return "\n".join(lines)
+
+
+def trace_file(script: str = None) -> str:
+    """Where spans go: SF_TRACE when it names a file, else a new file under SF_CACHE_DIR/traces."""
+    target = os.getenv("SF_TRACE", "")
+    if target not in ("", "0", "1"):
+        return target
+    from sf_cache import cache_path
+
+    name = os.path.splitext(script or os.path.basename(sys.argv[0] or "python"))[0]
+    return str(cache_path("traces", f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"))
+
+
+def start_trace(script: str = None) -> Tracer:
+    """Turn tracing on for this process (idempotent); the summary is written when the process exits."""
+    global _tracer, _env_checked
+    _env_checked = True
+    if _tracer is None:
+        _tracer = Tracer(trace_file(script), script)
+        atexit.register(_tracer.close)
+        try:
+            _install_connection_timers()
+        except ImportError:  # no urllib3: spans simply lack connect/tls
+            pass
+    return _tracer
+
+
+def active_tracer():
+    """The process tracer, started from SF_TRACE on first use; None when tracing is off."""
+    global _env_checked
+    if _tracer is None and not _env_checked:
+        _env_checked = True
+        if os.getenv("SF_TRACE") not in (None, "", "0"):
+            start_trace()
+    return _tracer
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Summarize a JSONL trace written by --trace / SF_TRACE.")
+    p.add_argument("trace", help="Trace file (JSONL spans)")
+    p.add_argument("--script", help="Only spans from this script (e.g. sf_query.py)")
+    p.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = p.parse_args(argv)
+
+    spans = []
+    try:
+        with open(args.trace, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line) if line.strip() else {}
+                if record.get("type") == "span" and (not args.script or record.get("script") == args.script):
+                    spans.append(record)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    summary = summarize(spans, script=args.script)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,124 +13,57 @@ Usage:
     # Upsert by external ID
     python3 sf_upsert_lead.py --external-id External_ID__c --external-id-value "abc123" --first Ada --last Lovelace --company ExampleAI
 
+    # Bulk upsert from a file (columns are logical field names from config/field_map.yaml,
+    # e.g. email,first_name,last_name,company,thesis_tag; 200 leads per API call)
+    python3 sf_upsert_lead.py --input leads.csv --external-id External_ID__c
+    python3 sf_upsert_lead.py --input leads.jsonl --external-id External_ID__c --dry-run
+
+    # Bulk upsert matched by email (existing Leads resolved with chunked IN queries)
+    python3 sf_upsert_lead.py --input leads.csv
+
+    # Re-sync: send existing Leads only the fields that changed, skip Leads that already match
+    python3 sf_upsert_lead.py --input leads.csv --diff
+
     # With custom fields
     python3 sf_upsert_lead.py --email founder@company.com --first Ada --last Lovelace --company ExampleAI \
         --thesis-tag "AI Security" --signal-score 4 --must-be-true "Enterprise buyers will pay"
+
+    # Hold creates that probably duplicate an existing Lead/Account ("Example AI, Inc." vs "ExampleAI",
+    # a second address at the same company); needs an index from sf_dedupe_index.py build
+    python3 sf_upsert_lead.py --input leads.csv --fuzzy-dedupe
 """
 
-import os
 import sys
 import json
 import argparse
 from pathlib import Path
-from urllib.parse import quote_plus
-
-import requests
-import yaml
-
-
-def load_config(config_dir: str) -> dict:
-    """Load field mappings and stages from config files."""
-    config = {"field_map": {}, "stages": {}, "required_fields": {}}
-    config_path = Path(config_dir)
-    
-    if (config_path / "field_map.yaml").exists():
-        with open(config_path / "field_map.yaml") as f:
-            config["field_map"] = yaml.safe_load(f) or {}
-    
-    if (config_path / "stages.yaml").exists():
-        with open(config_path / "stages.yaml") as f:
-            config["stages"] = yaml.safe_load(f) or {}
-    
-    if (config_path / "required_fields.yaml").exists():
-        with open(config_path / "required_fields.yaml") as f:
-            config["required_fields"] = yaml.safe_load(f) or {}
-    
-    return config
-
-
-def get_field_name(config: dict, obj: str, logical_name: str) -> str:
-    """Map logical field name to Salesforce API field name."""
-    if obj in config.get("field_map", {}) and logical_name in config["field_map"][obj]:
-        return config["field_map"][obj][logical_name]
-    # Default mappings if no config
-    defaults = {
-        "email": "Email",
-        "first_name": "FirstName",
-        "last_name": "LastName",
-        "company": "Company",
-        "title": "Title",
-        "website": "Website",
-        "status": "Status",
-        "source": "LeadSource",
-        "description": "Description",
-    }
-    return defaults.get(logical_name, logical_name)
-
-
-def env(name: str, default: str = None, required: bool = True) -> str:
-    v = os.getenv(name, default)
-    if required and not v:
-        print(f"Missing {name}", file=sys.stderr)
-        sys.exit(2)
-    return v
-
-
-def api_version() -> str:
-    return os.getenv("SF_API_VERSION", "v59.0")
-
-
-def base_url() -> str:
-    return env("SF_BASE_URL").rstrip("/")
 
-
-def token() -> str:
-    return env("SF_ACCESS_TOKEN")
-
-
-def soql_query(soql: str) -> dict:
-    q = quote_plus(soql)
-    url = f"{base_url()}/services/data/{api_version()}/query/?q={q}"
-    r = requests.get(url, headers={"Authorization": f"Bearer {token()}"}, timeout=30)
-    if r.status_code >= 400:
-        raise RuntimeError(f"SOQL query failed ({r.status_code}): {r.text}")
-    return r.json()
+from sf_batch import (
+    read_rows, lookup_records, collection_create, collection_update, collection_upsert, error_text,
+    changed_fields, diff_updates,
+)
+from sf_client import get_client
+from sf_config import get_field_name, load_config, missing_required, record_mapper
+from sf_journal import entry, journaled, open_journal
+from sf_validate import record_errors, schema_errors, schema_validator
 
 
 def create_lead(fields: dict) -> str:
-    url = f"{base_url()}/services/data/{api_version()}/sobjects/Lead/"
-    r = requests.post(
-        url,
-        headers={"Authorization": f"Bearer {token()}", "Content-Type": "application/json"},
-        data=json.dumps(fields),
-        timeout=30
-    )
+    r = get_client().post("sobjects/Lead/", json=fields)
     if r.status_code >= 400:
         raise RuntimeError(f"Create Lead failed ({r.status_code}): {r.text}")
     return r.json().get("id")
 
 
 def update_lead(lead_id: str, fields: dict) -> None:
-    url = f"{base_url()}/services/data/{api_version()}/sobjects/Lead/{lead_id}"
-    r = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {token()}", "Content-Type": "application/json"},
-        data=json.dumps(fields),
-        timeout=30
-    )
+    r = get_client().patch(f"sobjects/Lead/{lead_id}", json=fields)
     if r.status_code >= 400:
         raise RuntimeError(f"Update Lead failed ({r.status_code}): {r.text}")
 
 
 def upsert_by_external_id(external_id_field: str, external_id_value: str, fields: dict) -> dict:
     """Upsert using Salesforce's native external ID upsert."""
-    url = f"{base_url()}/services/data/{api_version()}/sobjects/Lead/{external_id_field}/{external_id_value}"
-    r = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {token()}", "Content-Type": "application/json"},
-        data=json.dumps(fields),
-        timeout=30
-    )
+    r = get_client().patch(f"sobjects/Lead/{external_id_field}/{external_id_value}", json=fields)
     if r.status_code >= 400:
         raise RuntimeError(f"Upsert Lead failed ({r.status_code}): {r.text}")
     
@@ -143,19 +76,260 @@ def upsert_by_external_id(external_id_field: str, external_id_value: str, fields
 
 def validate_required_fields(config: dict, fields: dict) -> list:
     """Check if required fields are present."""
-    required = config.get("required_fields", {}).get("lead", ["LastName", "Company", "Status"])
-    missing = [f for f in required if f not in fields or not fields[f]]
-    return missing
+    return missing_required(config, "lead", fields)
+
+
+def split_by_email(config: dict, pending: list, diff: bool = False) -> tuple:
+    """Resolve existing Leads for all emails at once and split rows into creates and updates.
+
+    ``pending`` holds (row index, fields) pairs. Returns (creates, updates, duplicates,
+    unchanged); updates carry the matched ``Id``, duplicates are rows repeating an
+    earlier row's email. With ``diff`` the lookup also selects the rows' fields, updates
+    are reduced to the fields that change and identical rows come back as unchanged
+    (row index, Id) pairs, at no extra API cost.
+    """
+    email_field = get_field_name(config, "lead", "email")
+    select = list(dict.fromkeys(k for _, f in pending for k in f)) if diff else ()
+    existing = lookup_records(get_client(), "Lead", email_field, [f.get(email_field) for _, f in pending], select)
+    creates, updates, duplicates, unchanged = [], [], [], []
+    seen = {}
+    for i, fields in pending:
+        email = str(fields.get(email_field) or "").lower()
+        if email and email in seen:
+            duplicates.append((i, seen[email]))
+            continue
+        if email:
+            seen[email] = i
+        if email in existing:
+            updates.append((i, {"Id": existing[email]["Id"], **fields}))
+        else:
+            creates.append((i, fields))
+    if diff:
+        updates, unchanged = diff_updates({rec["Id"][:15]: rec for rec in existing.values()}, updates)
+    return creates, updates, duplicates, unchanged
+
+
+def skip_unchanged_by_external_id(external_id_field: str, pending: list, results: list) -> list:
+    """--diff with --external-id: drop rows whose Lead already holds every value (reported as
+    ``unchanged``) and reduce the others to their changed fields plus the external ID."""
+    select = list(dict.fromkeys(k for _, f in pending for k in f))
+    existing = lookup_records(get_client(), "Lead", external_id_field,
+                              [f[external_id_field] for _, f in pending], select)
+    kept = []
+    for i, fields in pending:
+        current = existing.get(str(fields[external_id_field]).lower())
+        if current is None:
+            kept.append((i, fields))
+            continue
+        diff = changed_fields(current, fields)
+        if diff:
+            kept.append((i, {external_id_field: fields[external_id_field], **diff}))
+        else:
+            results[i] = {"row": i + 1, "action": "unchanged", "id": current["Id"]}
+    return kept
+
+
+def dedupe_record(config: dict, fields: dict) -> dict:
+    """The logical-name view of a Lead's fields that the dedupe index matches on."""
+    return {k: fields.get(get_field_name(config, "lead", k))
+            for k in ("email", "first_name", "last_name", "company", "website")}
+
+
+def probable_duplicates(config: dict, index, fields: dict) -> list:
+    """Probable existing records for a Lead about to be created ([] if its email already matches one)."""
+    matches = index.probable(dedupe_record(config, fields))
+    if any(m["reasons"] == ["email"] for m in matches):
+        return []  # same email: the email match path updates that record instead
+    return matches
+
+
+def hold_probable_duplicates(config: dict, index, pending: list, results: list) -> list:
+    """Drop rows with a probable existing match (recorded as ``probable_duplicate``); return the rest.
+
+    Each row is added to the index for the rest of the scan, so near-duplicate
+    rows in the same file are caught too; those entries are discarded afterwards.
+    """
+    kept = []
+    for i, fields in pending:
+        matches = probable_duplicates(config, index, fields)
+        if matches:
+            results[i] = {"row": i + 1, "action": "probable_duplicate", "matches": matches}
+        else:
+            kept.append((i, fields))
+        index.add(f"row:{i + 1}", "input", dedupe_record(config, fields))
+    index.discard()
+    return kept
+
+
+def open_dedupe_index(args):
+    """The dedupe index for --fuzzy-dedupe/--dedupe-index, or None when fuzzy dedupe is off."""
+    if not (args.fuzzy_dedupe or args.dedupe_index):
+        return None
+    from sf_dedupe_index import DedupeIndex, index_path
 
+    path = Path(args.dedupe_index) if args.dedupe_index else index_path()
+    if not path.exists():
+        print(f"Error: no dedupe index at {path}; run 'sf_dedupe_index.py build' first", file=sys.stderr)
+        sys.exit(2)
+    try:
+        return DedupeIndex(path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+def journal_entry(config: dict, fields: dict, external_id_field: str = None, external_id_value: str = None) -> dict:
+    """Journal entry for one Lead write: an upsert when it has an external ID or email, else a create.
+
+    The external ID value is part of the key, so upserts of the same fields
+    under different external IDs are separate writes.
+    """
+    if external_id_field:
+        value = fields.get(external_id_field) if external_id_value is None else external_id_value
+        return entry("Lead", "upsert", {**fields, external_id_field: value})
+    email = fields.get(get_field_name(config, "lead", "email"))
+    return entry("Lead", "upsert" if email else "create", fields)
+
+
+def _record_results(results: list, batch: list, sent: list, default_action: str) -> None:
+    for (i, _), res in zip(batch, sent):
+        if res.get("success"):
+            action = default_action
+            if action == "upserted":
+                action = "created" if res.get("created") else "updated"
+            results[i] = {"row": i + 1, "action": action, "id": res.get("id")}
+        else:
+            results[i] = {"row": i + 1, "action": "error", "error": error_text(res)}
+
+
+def upsert_rows(config: dict, rows: list, external_id_field: str, default_status: str,
+                dry_run: bool = False, dedupe_index=None, journal=None, diff: bool = False) -> list:
+    """Upsert many leads through sObject Collections. Returns one result per input row.
+
+    With ``external_id_field`` rows go through the collections upsert endpoint;
+    otherwise existing Leads are matched by email in chunked IN queries, and
+    with a ``dedupe_index`` rows that would be created but probably duplicate
+    an existing Lead/Account are held back as ``probable_duplicate``. With a
+    ``journal`` creates a resumed run already made are reported as
+    ``already_done`` (or ``reconciled``) instead of being sent again. With
+    ``diff`` existing Leads get only the fields that change, and rows that
+    change nothing are reported as ``unchanged`` instead of being sent.
+    """
+    results = [None] * len(rows)
+    pending = []  # (row index, fields)
+    map_record = record_mapper(config, "lead")
+    status_field = get_field_name(config, "lead", "status")
+    validator = schema_validator("Lead")
+    operation = "upsert" if external_id_field else "create"
+    for i, row in enumerate(rows):
+        fields = map_record(row)
+        fields.setdefault(status_field, default_status)
+        missing = validate_required_fields(config, fields)
+        if external_id_field and not fields.get(external_id_field):
+            missing.append(external_id_field)
+        errors = record_errors(validator, missing, fields, operation, external_id_field)
+        if errors:
+            results[i] = {"row": i + 1, "action": "error", "error": "; ".join(errors)}
+        else:
+            pending.append((i, fields))
+
+    if dedupe_index is not None and not external_id_field:
+        pending = hold_probable_duplicates(config, dedupe_index, pending, results)
+
+    if dry_run:
+        for i, fields in pending:
+            results[i] = {"row": i + 1, "action": "would_upsert", "fields": fields}
+        return results
+
+    client = get_client()
+    entries = {}
+    if journal is not None:
+        entries = {i: journal_entry(config, fields, external_id_field) for i, fields in pending}
+        settled = journal.resolve(client, list(entries.values()))
+        for i, _ in pending:
+            if entries[i]["key"] in settled:
+                results[i] = {"row": i + 1, **settled[entries[i]["key"]]}
+        pending = [(i, fields) for i, fields in pending if results[i] is None]
+        journal.begin([entries[i] for i, _ in pending])
+
+    if external_id_field:
+        send = skip_unchanged_by_external_id(external_id_field, pending, results) if diff else pending
+        sent = collection_upsert(client, "Lead", external_id_field, [f for _, f in send])
+        _record_results(results, send, sent, "upserted")
+        if journal is not None:
+            journal.settle_results([(entries[i]["key"], results[i]) for i, _ in pending])
+        return results
+
+    creates, updates, duplicates, unchanged = split_by_email(config, pending, diff)
+    for i, first in duplicates:
+        results[i] = {"row": i + 1, "action": "error", "error": f"Duplicate email in input (row {first + 1})"}
+    for i, lead_id in unchanged:
+        results[i] = {"row": i + 1, "action": "unchanged", "id": lead_id}
+    _record_results(results, updates, collection_update(client, "Lead", [f for _, f in updates]), "updated")
+    _record_results(results, creates, collection_create(client, "Lead", [f for _, f in creates]), "created")
+    if journal is not None:
+        journal.settle_results([(entries[i]["key"], results[i]) for i, _ in pending])
+    if dedupe_index is not None:
+        for i, fields in creates:
+            if results[i]["action"] == "created":
+                dedupe_index.add(results[i]["id"], "Lead", dedupe_record(config, fields))
+        dedupe_index.commit()
+    return results
+
+
+def create_unless_duplicate(config: dict, index, matches: list, fields: dict, journal=None, e=None) -> None:
+    """Single-record create, held back (exit 1) when the dedupe index found probable matches."""
+    if matches:
+        print(json.dumps({"action": "probable_duplicate", "matches": matches}, indent=2))
+        sys.exit(1)
+    lead_id = journaled(journal, e, lambda: create_lead(fields))
+    if index is not None:
+        index.add(lead_id, "Lead", dedupe_record(config, fields))
+        index.commit()
+    print(json.dumps({"action": "created", "id": lead_id}, indent=2))
+
+
+def run_batch(config: dict, args) -> None:
+    """Handle --input mode: print one JSON result per row, then a summary on stderr."""
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.dry_run:
+        print("=== DRY RUN MODE ===")
+        if args.external_id:
+            print(f"Would upsert {len(rows)} Lead rows by {args.external_id}")
+        else:
+            print(f"Would upsert {len(rows)} Lead rows, matching existing Leads by email in chunked queries")
+    journal = None if args.dry_run else open_journal(args)
+    results = upsert_rows(config, rows, args.external_id, args.status, dry_run=args.dry_run,
+                          dedupe_index=open_dedupe_index(args), journal=journal, diff=args.diff)
+    if journal:
+        journal.close()
+    for res in results:
+        print(json.dumps(res))
+
+    counts = {}
+    for res in results:
+        counts[res["action"]] = counts.get(res["action"], 0) + 1
+    print(json.dumps({"summary": counts}), file=sys.stderr)
+    failed = counts.get("error") or counts.get("probable_duplicate")
+    if args.dry_run:
+        print("\nValidation: " + ("FAILED" if failed else "PASSED"))
+    if failed:
+        sys.exit(1)
 
-def main() -> None:
+
+def main(argv: list = None) -> None:
     p = argparse.ArgumentParser(description="Upsert a Salesforce Lead with config support and dry-run mode.")
     
     # Core fields
     p.add_argument("--email", help="Lead email address")
     p.add_argument("--first", help="First name")
-    p.add_argument("--last", required=True, help="Last name (required)")
-    p.add_argument("--company", required=True, help="Company name (required)")
+    p.add_argument("--last", help="Last name (required unless --input)")
+    p.add_argument("--company", help="Company name (required unless --input)")
     p.add_argument("--title", help="Job title")
     p.add_argument("--website", help="Company website")
     p.add_argument("--status", default="Open - Not Contacted", help="Lead status")
@@ -173,16 +347,50 @@ def main() -> None:
     p.add_argument("--external-id", help="External ID field name for upsert (e.g., External_ID__c)")
     p.add_argument("--external-id-value", help="External ID value for upsert")
     
+    # Bulk mode
+    p.add_argument("--input", help="CSV or JSONL file of leads to upsert in batches of 200 "
+                   "(by --external-id, or matched by email)")
+    
+    p.add_argument("--diff", action="store_true",
+                   help="Fetch existing Leads' current values; send only changed fields, skip unchanged Leads")
+
+    # Fuzzy duplicate check (creates only)
+    p.add_argument("--fuzzy-dedupe", action="store_true",
+                   help="Hold creates that probably duplicate an existing Lead/Account (local index, no API calls)")
+    p.add_argument("--dedupe-index", help="Dedupe index path (implies --fuzzy-dedupe; default: SF_DEDUPE_INDEX "
+                   "or the per-org index under SF_CACHE_DIR)")
+
     # Config and modes
     p.add_argument("--config", default="./config", help="Path to config directory")
     p.add_argument("--dry-run", action="store_true", help="Validate without executing")
+    p.add_argument("--no-journal", action="store_true",
+                   help="Do not record writes in the local journal (an interrupted run cannot be resumed)")
+    p.add_argument("--resume", action="store_true",
+                   help="Skip creates an earlier run of the same input already made "
+                        "(automatic when that run was interrupted)")
     p.add_argument("--verbose", action="store_true", help="Show detailed output")
     
-    args = p.parse_args()
+    p.add_argument("--trace", action="store_true", help="Record API call spans and print a timing summary")
+    args = p.parse_args(argv)
+    if args.trace:
+        from sf_trace import start_trace
+
+        start_trace()
     
     # Load config
     config = load_config(args.config)
     
+    if args.input:
+        run_batch(config, args)
+        return
+    
+    if not args.last:
+        print("Error: --last is required", file=sys.stderr)
+        sys.exit(2)
+    if not args.company:
+        print("Error: --company is required", file=sys.stderr)
+        sys.exit(2)
+    
     # Build fields dict using config mappings
     fields = {}
     
@@ -220,7 +428,16 @@ def main() -> None:
     if missing:
         print(f"Error: Missing required fields: {missing}", file=sys.stderr)
         sys.exit(2)
+    upsert = bool(args.external_id and args.external_id_value)
+    problems = schema_errors("Lead", fields, "upsert" if upsert else "create")
+    if problems:
+        print("Error: Schema validation failed:\n  " + "\n  ".join(problems), file=sys.stderr)
+        sys.exit(2)
     
+    # Probable duplicates only matter when this could create a Lead
+    index = None if upsert else open_dedupe_index(args)
+    matches = probable_duplicates(config, index, fields) if index else []
+
     # Dry run mode
     if args.dry_run:
         print("=== DRY RUN MODE ===")
@@ -230,32 +447,59 @@ def main() -> None:
             print(f"\nUsing external ID: {args.external_id} = {args.external_id_value}")
         elif args.email:
             print(f"\nWould query for existing Lead by email: {args.email}")
+        if matches:
+            print("\nProbable existing records:")
+            print(json.dumps(matches, indent=2))
+            print("\nValidation: FAILED")
+            sys.exit(1)
         print("\nValidation: PASSED")
         return
     
-    # Execute upsert
-    if args.external_id and args.external_id_value:
-        # Use native Salesforce external ID upsert
-        result = upsert_by_external_id(args.external_id, args.external_id_value, fields)
-        print(json.dumps(result, indent=2))
+    # Execute upsert (a create a resumed run already made is reported, not sent again)
+    if upsert:
+        e = journal_entry(config, fields, args.external_id, args.external_id_value)
+    else:
+        e = journal_entry(config, fields)
+    journal = open_journal(args)
+    settled = journal.resolve(get_client(), [e]) if journal else {}
+    if e["key"] in settled:
+        print(json.dumps(settled[e["key"]], indent=2))
+    elif upsert:
+        # Use native Salesforce external ID upsert (with --diff, only the fields that change)
+        changes = fields
+        if args.diff:
+            current = lookup_records(get_client(), "Lead", args.external_id, [args.external_id_value],
+                                     fields).get(str(args.external_id_value).lower())
+            changes = changed_fields(current, fields) if current else fields
+        if not changes:
+            print(json.dumps({"action": "unchanged", "id": current["Id"]}, indent=2))
+        else:
+            result = journaled(journal, e,
+                               lambda: upsert_by_external_id(args.external_id, args.external_id_value, changes),
+                               result_id=lambda r: r.get("id"))
+            print(json.dumps(result, indent=2))
     elif args.email:
         # Query by email and create/update
-        email = args.email.replace("'", "\\'")
-        result = soql_query(f"SELECT Id FROM Lead WHERE Email='{email}' LIMIT 1")
-        records = result.get("records", [])
+        email_field = get_field_name(config, "lead", "email")
+        current = lookup_records(get_client(), "Lead", email_field, [args.email],
+                                 fields if args.diff else ()).get(args.email.lower())
+        lead_id = current["Id"] if current else None
+        changes = changed_fields(current, fields) if lead_id and args.diff else fields
         
-        if records:
-            lead_id = records[0]["Id"]
-            update_lead(lead_id, fields)
+        if lead_id and not changes:
+            print(json.dumps({"action": "unchanged", "id": lead_id}, indent=2))
+        elif lead_id:
+            journaled(journal, e, lambda: update_lead(lead_id, changes), result_id=lambda _: lead_id)
             print(json.dumps({"action": "updated", "id": lead_id}, indent=2))
         else:
-            lead_id = create_lead(fields)
-            print(json.dumps({"action": "created", "id": lead_id}, indent=2))
+            create_unless_duplicate(config, index, matches, fields, journal, e)
     else:
         # No identifier - create new
-        lead_id = create_lead(fields)
-        print(json.dumps({"action": "created", "id": lead_id}, indent=2))
-
+        create_unless_duplicate(config, index, matches, fields, journal, e)
+    if journal:
+        journal.close()
 
 if __name__ == "__main__":
-    main()
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_upsert_lead", main)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Offline, schema-aware record validation.
+Compiles the cached describe of an object (see sf_describe.py) into per-field
+rules and checks records against them before anything is sent: unknown and
+read-only fields, types, string lengths and number precision, date formats,
+picklist membership (including inactive values), required-on-create fields
+and Salesforce ID formats for lookups. Every problem in a record is reported,
+so a whole import can be fixed in one pass instead of one API error at a time.
+
+Validation is skipped (no errors) when there is no cached describe for the
+object, when SF_BASE_URL is unset, or with SF_SCHEMA_CHECK=0.
+
+Usage:
+    # Validate an import file as the create scripts would (logical field names, mapped through config)
+    python3 sf_validate.py --object lead --input leads.csv
+    python3 sf_validate.py --object opportunity --input stage_updates.csv --operation update
+
+Library use (from another script in this directory):
+    from sf_validate import schema_validator
+
+    validator = schema_validator("Lead")
+    errors = validator.errors(fields, "create") if validator else []
+"""
+
+import os
+import sys
+import json
+import argparse
+import datetime
+
+# Salesforce object per config object name (as used in config/field_map.yaml)
+SOBJECTS = {"lead": "Lead", "account": "Account", "opportunity": "Opportunity", "task": "Task",
+            "contact": "Contact", "event": "Event"}
+
+# Key prefixes of standard objects, so lookups can be checked without their describes.
+KNOWN_PREFIXES = {
+    "Account": "001", "Contact": "003", "User": "005", "Opportunity": "006", "Lead": "00Q", "Task": "00T",
+    "Event": "00U", "Group": "00G", "Case": "500", "Campaign": "701", "Contract": "800",
+}
+
+# Standard picklists backed by setup tables: the API rejects values that are not active
+# even though the describe does not mark them restricted.
+VALIDATED_PICKLISTS = {("Lead", "Status"), ("Opportunity", "StageName"), ("Task", "Status"),
+                       ("Task", "Priority"), ("Case", "Status")}
+
+STRING_TYPES = {"string", "textarea", "email", "phone", "url", "encryptedstring", "combobox"}
+NUMBER_TYPES = {"double", "currency", "percent"}
+
+_CHECKSUM_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ012345"
+
+# Compiled validators by object, reused while the describe they were built from is unchanged
+# (sf_describe hands out the same parsed dict until the cache file changes).
+_validators = {}
+
+
+def id_checksum(record_id: str) -> str:
+    """The 3-character suffix that turns a 15-character ID into its 18-character form."""
+    suffix = ""
+    for start in (0, 5, 10):
+        bits = sum(1 << i for i, c in enumerate(record_id[start:start + 5]) if c.isupper())
+        suffix += _CHECKSUM_CHARS[bits]
+    return suffix
+
+
+def id_error(value, prefixes: set = None) -> str:
+    """Why ``value`` is not a valid ID (for one of ``prefixes``, if given), or ""."""
+    value = str(value)
+    if len(value) not in (15, 18) or not (value.isascii() and value.isalnum()):
+        return f"'{value}' is not a 15- or 18-character Salesforce ID"
+    if len(value) == 18 and value[15:] != id_checksum(value):
+        return f"'{value}' has an invalid ID checksum"
+    if prefixes and value[:3] not in prefixes:
+        return f"'{value}' is not an ID of {'/'.join(sorted(prefixes))} records"
+    return ""
+
+
+def _is_blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _digits(text: str) -> bool:
+    return text.isascii() and text.isdigit()
+
+
+def _is_email(text: str) -> bool:
+    local, _, domain = text.rpartition("@")
+    return bool(local) and "." in domain.strip(".") and not any(c.isspace() for c in text)
+
+
+def _split_number(text: str):
+    """(whole digits, fraction digits) of a plain decimal like ``-12.50``, or None."""
+    whole, _, fraction = text[1:].partition(".") if text[:1] in "+-" else text.partition(".")
+    if not (whole or fraction) or (whole and not _digits(whole)) or (fraction and not _digits(fraction)):
+        return None
+    return whole, fraction
+
+
+class Validator:
+    """Field rules for one object, compiled from its describe."""
+
+    def __init__(self, describe: dict, prefix_lookup=None):
+        self.object = describe["name"]
+        self.fields = {f["name"]: f for f in describe["fields"]}
+        self.by_lower = {name.lower(): name for name in self.fields}
+        self.required = [f["name"] for f in describe["fields"]
+                         if f.get("createable") and not f.get("nillable", True)
+                         and not f.get("defaultedOnCreate") and f.get("type") != "boolean"]
+        self.picklists = {}
+        for f in describe["fields"]:
+            if f.get("type") in ("picklist", "multipicklist") and f.get("picklistValues"):
+                values = {pv["value"]: pv.get("active", True) for pv in f["picklistValues"]}
+                enforced = f.get("restrictedPicklist") or (self.object, f["name"]) in VALIDATED_PICKLISTS
+                self.picklists[f["name"]] = (values, enforced)
+        self.prefix_lookup = prefix_lookup
+        self._prefixes = {}
+
+    def reference_prefixes(self, field: dict):
+        """Key prefixes a lookup may point at, or None when any target's prefix is unknown."""
+        name = field["name"]
+        if name not in self._prefixes:
+            prefixes = set()
+            for target in field.get("referenceTo") or []:
+                prefix = KNOWN_PREFIXES.get(target) or (self.prefix_lookup(target) if self.prefix_lookup else None)
+                if not prefix:
+                    prefixes = None
+                    break
+                prefixes.add(prefix)
+            self._prefixes[name] = prefixes or None
+        return self._prefixes[name]
+
+    def field_errors(self, field: dict, value) -> list:
+        name, ftype = field["name"], field.get("type")
+        if _is_blank(value):
+            return []
+        if isinstance(value, (dict, list)):
+            return [f"{name}: expected a single value, got {type(value).__name__}"]
+        errors = []
+        text = value if isinstance(value, str) else str(value)
+        if ftype in STRING_TYPES or ftype in ("picklist", "multipicklist"):
+            length = field.get("length") or 0
+            if length and len(text) > length:
+                errors.append(f"{name}: {len(text)} characters exceeds max length {length}")
+            if ftype == "email" and not _is_email(text):
+                errors.append(f"{name}: '{text}' is not an email address")
+        if name in self.picklists:
+            values, enforced = self.picklists[name]
+            for item in (text.split(";") if ftype == "multipicklist" else [text]):
+                if values.get(item) is False:
+                    errors.append(f"{name}: '{item}' is an inactive picklist value")
+                elif item not in values and enforced:
+                    active = [v for v, on in values.items() if on]
+                    errors.append(f"{name}: '{item}' is not a valid value (expected one of {active})")
+        elif ftype == "boolean":
+            if not isinstance(value, bool) and text.lower() not in ("true", "false"):
+                errors.append(f"{name}: '{text}' is not true/false")
+        elif ftype == "int":
+            if isinstance(value, bool) or not (isinstance(value, int) or _digits(text.lstrip("+-"))):
+                errors.append(f"{name}: '{text}' is not a whole number")
+            elif field.get("digits") and len(text.lstrip("+-")) > field["digits"]:
+                errors.append(f"{name}: '{text}' has more than {field['digits']} digits")
+        elif ftype in NUMBER_TYPES:
+            number = None if isinstance(value, bool) else _split_number(
+                format(value, "f") if isinstance(value, float) else text)
+            if number is None:
+                errors.append(f"{name}: '{text}' is not a number")
+            elif field.get("precision"):
+                whole = len(number[0].lstrip("0"))
+                allowed = field["precision"] - (field.get("scale") or 0)
+                if whole > allowed:
+                    errors.append(f"{name}: '{text}' has more than {allowed} digits before the decimal point")
+        elif ftype == "date":
+            try:
+                datetime.date.fromisoformat(text)
+            except ValueError:
+                errors.append(f"{name}: '{text}' is not a YYYY-MM-DD date")
+        elif ftype == "datetime":
+            try:
+                datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+            except ValueError:
+                errors.append(f"{name}: '{text}' is not an ISO 8601 date-time")
+        elif ftype in ("reference", "id"):
+            if text.startswith("@{"):
+                return errors  # Composite reference to a record created earlier in the same request
+            problem = id_error(text, self.reference_prefixes(field) if ftype == "reference" else None)
+            if problem:
+                errors.append(f"{name}: {problem}")
+        return errors
+
+    def errors(self, fields: dict, operation: str = "create", external_id: str = None) -> list:
+        """Every problem with ``fields`` (API field names) for ``operation``: create, update or upsert."""
+        errors = []
+        for key, value in fields.items():
+            if key.lower() == "id" and operation == "update":
+                problem = id_error(value, {KNOWN_PREFIXES[self.object]} if self.object in KNOWN_PREFIXES else None)
+                if problem:
+                    errors.append(f"{key}: {problem}")
+                continue
+            field = self.fields.get(key) or self.fields.get(self.by_lower.get(key.lower(), ""))
+            if field is None:
+                errors.append(f"{key}: no such field on {self.object}")
+                continue
+            if key == external_id:
+                continue
+            if operation == "update" and not field.get("updateable", True):
+                errors.append(f"{key}: field is not updateable")
+            elif operation != "update" and not field.get("createable", True):
+                errors.append(f"{key}: field is not createable")
+            errors += self.field_errors(field, value)
+        if operation == "create":
+            errors += [f"{name}: required on create" for name in self.required if _is_blank(fields.get(name))]
+        return errors
+
+    def validate_rows(self, records: list, operation: str = "create", external_id: str = None) -> list:
+        """Errors for each record, in input order."""
+        return [self.errors(fields, operation, external_id) for fields in records]
+
+
+def schema_validator(sobject: str):
+    """Validator compiled from the cached describe of ``sobject``, or None when it cannot be checked."""
+    if os.getenv("SF_SCHEMA_CHECK") == "0" or not os.getenv("SF_BASE_URL"):
+        return None
+    from sf_client import api_version, base_url
+    from sf_describe import DescribeCache
+
+    cache = DescribeCache(base_url=base_url(), api_version=api_version(), offline=True)
+    describe = cache.cached(sobject)
+    if not describe:
+        return None
+    hit = _validators.get(sobject)
+    if hit and hit[0] is describe:
+        return hit[1]
+
+    def prefix_lookup(target: str):
+        target_describe = cache.cached(target)
+        return target_describe.get("keyPrefix") if target_describe else None
+
+    validator = Validator(describe, prefix_lookup)
+    _validators[sobject] = (describe, validator)
+    return validator
+
+
+def schema_errors(sobject: str, fields: dict, operation: str = "create", external_id: str = None) -> list:
+    """Schema problems with one record ([] when there is no cached describe to check against)."""
+    validator = schema_validator(sobject)
+    return validator.errors(fields, operation, external_id) if validator else []
+
+
+def record_errors(validator, missing: list, fields: dict, operation: str = "create", external_id: str = None) -> list:
+    """Config required-field errors (``missing``) plus schema errors, without reporting a field twice."""
+    errors = [f"Missing required fields: {missing}"] if missing else []
+    if validator:
+        errors += [e for e in validator.errors(fields, operation, external_id)
+                   if not (e.endswith(": required on create") and e.split(":", 1)[0] in missing)]
+    return errors
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Validate records against cached Salesforce describes, offline.")
+    p.add_argument("--object", required=True, choices=sorted(SOBJECTS), help="Object (config name)")
+    p.add_argument("--input", required=True, help="CSV or JSONL file of records (logical field names)")
+    p.add_argument("--operation", choices=("create", "update", "upsert"), default="create",
+                   help="What the records will be used for (required fields are checked on create)")
+    p.add_argument("--external-id", help="External ID field for --operation upsert")
+    p.add_argument("--config", default="./config", help="Path to config directory")
+    args = p.parse_args(argv)
+
+    from sf_batch import read_rows
+    from sf_config import load_config, record_mapper
+
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    validator = schema_validator(SOBJECTS[args.object])
+    if validator is None:
+        print(f"Error: no cached describe for {SOBJECTS[args.object]}; run sf_describe.py {SOBJECTS[args.object]} "
+              "with SF_BASE_URL set (and SF_SCHEMA_CHECK not 0)", file=sys.stderr)
+        sys.exit(2)
+
+    map_record = record_mapper(load_config(args.config), args.object)
+    invalid = 0
+    for i, row in enumerate(rows):
+        if args.operation != "update":
+            fields = map_record(row)
+        else:
+            fields = {"Id": row.get("id") or row.get("Id"),
+                      **map_record({k: v for k, v in row.items() if k not in ("id", "Id")})}
+        errors = validator.errors(fields, args.operation, args.external_id)
+        if errors:
+            invalid += 1
+            print(json.dumps({"row": i + 1, "errors": errors}))
+    print(json.dumps({"summary": {"rows": len(rows), "invalid": invalid}}), file=sys.stderr)
+    if invalid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    from sfopsd import run_or_forward
+
+    run_or_forward("sf_validate", main)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the CRM scripts.
+Dispatches a subcommand to the matching script's main(), importing only that
+script (and, through it, only what the call needs: dry runs and --help never
+load requests or PyYAML). Forwards to a running sfopsd daemon first, like
+the individual scripts do.
+
+Usage:
+    python3 sfops.py --help
+    python3 sfops.py query "SELECT Id, Name FROM Lead LIMIT 5"
+    python3 sfops.py describe Lead Opportunity
+    python3 sfops.py upsert-lead --email ada@example.ai --last Lovelace --company ExampleAI --dry-run
+    python3 sfops.py opportunity --name "ExampleAI Seed" --stage sourced --close-date 2026-03-31 --dry-run
+    python3 sfops.py task --subject "Send follow-up" --due 2026-02-05 --what-id 006XXXX --dry-run
+    python3 sfops.py token
+
+    # Help for one subcommand
+    python3 sfops.py opportunity --help
+"""
+
+import sys
+
+# Subcommand -> (script module, summary)
+COMMANDS = {
+    "query": ("sf_query", "Run SOQL queries (REST paging or Bulk API 2.0)"),
+    "describe": ("sf_describe", "Describe objects: fields, required fields, picklists"),
+    "upsert-lead": ("sf_upsert_lead", "Create/update Leads, one or from a file"),
+    "opportunity": ("sf_create_opportunity", "Create/update Opportunities, one or from a file"),
+    "task": ("sf_create_task", "Create a next-step Task"),
+    "deal": ("sf_deal_intake", "Account/Lead + Opportunity + Task in one Composite call"),
+    "bulk-ingest": ("sf_bulk_ingest", "Bulk API 2.0 insert/upsert/update from a file"),
+    "token": ("sf_oauth_client_credentials", "Get (or refresh) an access token"),
+    "sync": ("sf_sync", "Mirror Leads/Accounts/Opportunities/Tasks into local SQLite"),
+    "dedupe": ("sf_dedupe_index", "Local fuzzy duplicate index for Leads/Accounts"),
+    "validate": ("sf_validate", "Check an import file against cached describes, offline"),
+    "trace": ("sf_trace", "Summarize a trace file written by --trace / SF_TRACE"),
+    "journal": ("sf_journal", "Inspect or reconcile the local write journal"),
+    "query-cache": ("sf_query_cache", "Query result cache stats, list, invalidate, clear"),
+    "orgs": ("sf_orgs", "List, check and switch between named org profiles (config/orgs.yaml)"),
+}
+
+
+def usage() -> str:
+    lines = ["usage: sfops <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<13} {summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ["", "Run 'sfops <command> --help' for a command's options."]
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"sfops: unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+    module = COMMANDS[command][0]
+
+    from sfopsd import forward
+
+    code = forward(module, rest)
+    if code is not None:
+        sys.exit(code)
+
+    import importlib
+
+    sys.argv = [f"sfops {command}"] + rest  # argparse uses argv[0] as the program name
+    importlib.import_module(module).main(rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Optional local daemon that keeps the CRM scripts warm between calls.
+Listens on a Unix socket and runs script entry points in a long-lived
+process, so the shared client's token and connection pool, the compiled
+config and parsed describes survive from one call to the next instead of
+being rebuilt by every CLI invocation.
+
+The scripts forward to the daemon automatically when it is running and was
+started with the same SF_* environment; otherwise (or with SF_DAEMON=0)
+they run in-process exactly as before, as do traced runs. Calls run one
+at a time, each in the caller's working directory, with stdout/stderr
+streamed back to the caller.
+
+Usage:
+    python3 sfopsd.py serve                    # foreground; exits after 30 idle minutes
+    python3 sfopsd.py serve --idle-timeout 0   # never exit on idle
+    python3 sfopsd.py status
+    python3 sfopsd.py stop
+
+    # Background it for a shell session
+    nohup python3 sfopsd.py serve >/dev/null 2>&1 &
+
+Settings (env):
+    SF_DAEMON_SOCKET    socket path (default: sfopsd.sock under SF_CACHE_DIR)
+    SF_DAEMON=0         never forward; always run in-process
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+from pathlib import Path
+
+# Frame: 1-byte kind + 4-byte big-endian length + payload.
+FRAME_HEADER = struct.Struct(">BI")
+STDOUT, STDERR, EXIT, FALLBACK = 1, 2, 3, 4
+
+DEFAULT_IDLE_TIMEOUT = 1800
+
+# Script modules the daemon will run (each exposes main(argv)).
+SCRIPTS = {
+    "sf_query", "sf_describe", "sf_upsert_lead", "sf_create_opportunity", "sf_create_task",
+    "sf_deal_intake", "sf_bulk_ingest", "sf_oauth_client_credentials", "sf_sync", "sf_dedupe_index",
+    "sf_validate", "sf_trace", "sf_journal", "sf_query_cache", "sf_orgs",
+}
+
+
+def socket_path() -> Path:
+    if os.getenv("SF_DAEMON_SOCKET"):
+        return Path(os.environ["SF_DAEMON_SOCKET"])
+    from sf_cache import cache_path
+
+    return cache_path("sfopsd.sock")
+
+
+def sf_environment() -> dict:
+    """The SF_* settings a call depends on; the daemon only serves callers with the same ones."""
+    return {k: v for k, v in os.environ.items() if k.startswith("SF_") and not k.startswith("SF_DAEMON")}
+
+
+def _send_frame(sock: socket.socket, kind: int, payload: bytes = b"") -> None:
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("daemon closed the connection")
+        buf += chunk
+    return buf
+
+
+def _recv_frame(sock: socket.socket) -> tuple:
+    kind, size = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+    return kind, _recv_exact(sock, size)
+
+
+# ---------------------------------------------------------------------------
+# Client side (used by the scripts' __main__ blocks)
+# ---------------------------------------------------------------------------
+
+def _connect(path: Path):
+    if os.getenv("SF_DAEMON") == "0" or not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:  # stale socket file or daemon shutting down
+        sock.close()
+        return None
+    return sock
+
+
+def _request(message: dict) -> dict:
+    """Send a control message (ping/stop) and return the daemon's JSON reply, or None."""
+    sock = _connect(socket_path())
+    if sock is None:
+        return None
+    with sock:
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        kind, payload = _recv_frame(sock)
+    return json.loads(payload)
+
+
+def forward(script: str, argv: list):
+    """Run ``script`` in the daemon, streaming its output here.
+
+    Returns the exit code, or None when there is no usable daemon and the
+    caller should run in-process (always the case for traced runs, so the
+    trace measures the call itself).
+    """
+    traced = any(a == "--trace" or a.startswith("--trace=") for a in argv)
+    if traced or os.getenv("SF_TRACE") not in (None, "", "0"):
+        return None
+    sock = _connect(socket_path())
+    if sock is None:
+        return None
+    message = {"op": "run", "script": script, "argv": argv, "cwd": os.getcwd(), "env": sf_environment()}
+    with sock:
+        try:
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            while True:
+                kind, payload = _recv_frame(sock)
+                if kind == FALLBACK:
+                    return None
+                if kind == EXIT:
+                    sys.stdout.flush()
+                    return struct.unpack(">i", payload)[0]
+                stream = sys.stdout if kind == STDOUT else sys.stderr
+                stream.buffer.write(payload)
+                stream.flush()
+        except BrokenPipeError:
+            # Our own stdout closed (e.g. piped into head); hanging up stops the daemon's run
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        except ConnectionError:
+            # Daemon went away mid-call; output may be partial, so do not silently re-run
+            print("Error: sfopsd connection lost", file=sys.stderr)
+            return 1
+
+
+def run_or_forward(script: str, main) -> None:
+    """Entry point for the scripts: forward to the daemon if one is serving, else call ``main``."""
+    code = forward(script, sys.argv[1:])
+    if code is None:
+        main()
+    else:
+        sys.exit(code)
+
+
+# ---------------------------------------------------------------------------
+# Daemon side
+# ---------------------------------------------------------------------------
+
+class _FrameWriter(io.RawIOBase):
+    """Raw binary stream that sends everything written as frames of one kind."""
+
+    def __init__(self, sock: socket.socket, kind: int):
+        self.sock = sock
+        self.kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        _send_frame(self.sock, self.kind, bytes(b))
+        return len(b)
+
+
+def _text_stream(sock: socket.socket, kind: int) -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BufferedWriter(_FrameWriter(sock, kind)), encoding="utf-8", line_buffering=True)
+
+
+class Daemon:
+    def __init__(self, path: Path, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.env = sf_environment()
+        self.started = time.time()
+        self.last_active = time.time()
+        self.served = 0
+        self.run_lock = threading.Lock()  # stdout, argv and cwd are process-wide
+        self.stopping = threading.Event()
+
+    def serve(self) -> None:
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)  # socket is owner-only
+        try:
+            server.bind(str(self.path))
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        server.settimeout(1.0)
+        print(f"sfopsd listening on {self.path} (pid {os.getpid()})", file=sys.stderr)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    idle = time.time() - self.last_active
+                    if self.idle_timeout and idle > self.idle_timeout and not self.run_lock.locked():
+                        break
+                    continue
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+    def handle(self, conn: socket.socket) -> None:
+        with conn:
+            try:
+                line = conn.makefile("rb").readline()
+                message = json.loads(line or b"{}")
+            except (OSError, ValueError):
+                return
+            op = message.get("op")
+            if op == "ping":
+                _send_frame(conn, EXIT, json.dumps(self.status()).encode("utf-8"))
+            elif op == "stop":
+                self.stopping.set()
+                _send_frame(conn, EXIT, json.dumps({"stopping": True}).encode("utf-8"))
+            elif op == "run":
+                if message.get("env") != self.env or message.get("script") not in SCRIPTS:
+                    _send_frame(conn, FALLBACK)
+                    return
+                try:
+                    self.run(conn, message)
+                except OSError:
+                    pass  # caller went away (e.g. piped into head)
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "socket": str(self.path),
+            "uptime": round(time.time() - self.started, 1),
+            "served": self.served,
+            "base_url": self.env.get("SF_BASE_URL"),
+        }
+
+    def run(self, conn: socket.socket, message: dict) -> None:
+        import importlib
+
+        with self.run_lock:
+            self.last_active = time.time()
+            out, err = _text_stream(conn, STDOUT), _text_stream(conn, STDERR)
+            saved = sys.stdout, sys.stderr, sys.argv, os.getcwd()
+            code = 0
+            try:
+                os.chdir(message["cwd"])
+                sys.stdout, sys.stderr = out, err
+                sys.argv = [f"{message['script']}.py"] + list(message["argv"])
+                importlib.import_module(message["script"]).main(message["argv"])
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    print(e.code, file=err)
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception as e:  # noqa: BLE001 - report to the caller, keep serving
+                print(f"Error: {type(e).__name__}: {e}", file=err)
+                code = 1
+            finally:
+                sys.stdout, sys.stderr, sys.argv = saved[:3]
+                os.chdir(saved[3])
+                self.served += 1
+                self.last_active = time.time()
+            out.flush()
+            err.flush()
+            _send_frame(conn, EXIT, struct.pack(">i", code))
+
+
+def _acquire_instance_lock(path: Path):
+    """Hold ``<socket>.lock`` for the daemon's lifetime; returns None if another daemon has it."""
+    import fcntl
+
+    f = open(f"{path}.lock", "a")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def main(argv: list = None) -> None:
+    p = argparse.ArgumentParser(description="Keep the CRM scripts warm in a local daemon.")
+    sub = p.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Run the daemon in the foreground")
+    serve.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                       help="Exit after this many idle seconds (0 = never)")
+    sub.add_parser("status", help="Show whether a daemon is serving")
+    sub.add_parser("stop", help="Stop the running daemon")
+    args = p.parse_args(argv)
+
+    path = socket_path()
+    if args.command == "status":
+        status = _request({"op": "ping"})
+        if status is None:
+            print("sfopsd is not running")
+            sys.exit(1)
+        print(json.dumps(status, indent=2))
+        return
+    if args.command == "stop":
+        if _request({"op": "stop"}) is None:
+            print("sfopsd is not running")
+            sys.exit(1)
+        print("sfopsd stopping")
+        return
+
+    lock = _acquire_instance_lock(path)
+    if lock is None:
+        print(f"Error: sfopsd is already running on {path}", file=sys.stderr)
+        sys.exit(2)
+    with lock:
+        if path.exists():
+            path.unlink()  # stale socket from a daemon that did not shut down cleanly
+        Daemon(path, args.idle_timeout).serve()
+
+
+if __name__ == "__main__":
+    main()